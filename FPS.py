@@ -2,7 +2,29 @@ import pygame
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
+import argparse
 import math
+import time
+
+from allocations import AllocationTracker, sections
+from camera import Camera
+from fps_world import FPSWorld
+from gc_policy import FrameGC
+from horde import PILLARS
+from hud import Hud
+from pvp_world import IDLE_INPUT, PlayerInput
+from sim_thread import InputMailbox, SimulationThread, SnapshotBuffer
+
+parser = argparse.ArgumentParser(description="3D third person shooter")
+parser.add_argument("--threaded", action="store_true",
+                    help="run the simulation on its own thread at a fixed 60 Hz")
+parser.add_argument("--horde", type=int, default=0, metavar="ZOMBIES",
+                    help="horde mode: this many zombies hunt the players instead of the fixed enemies")
+parser.add_argument("--gc-policy", action="store_true",
+                    help="freeze the loaded level and run the cyclic GC only in frame slack time")
+parser.add_argument("--alloc-diag", action="store_true",
+                    help="trace allocations per frame and subsystem (slow; prints a report at exit)")
+args = parser.parse_args()
 
 # Initialize Pygame
 pygame.init()
@@ -12,83 +34,25 @@ clock = pygame.time.Clock()
 pygame.mouse.set_visible(False)
 pygame.event.set_grab(True)
 
-# Player 1 variables
-player1_pos = [0, 0, -10]
-player1_rotation = 0
-player1_health = 100
-
-# Player 2 variables
-player2_pos = [0, 0, 10]
-player2_rotation = 180
-player2_health = 100
+# Game state lives in the world. With --threaded the simulation owns `world`
+# and the renderer draws `view_world`, a copy restored from published snapshots.
+world = FPSWorld(horde=args.horde)
+view_world = FPSWorld(horde=args.horde) if args.threaded else world
+player1, player2 = view_world.players
 
 # Camera settings
 camera_distance = 10
 camera_height = 3
 
-# Movement
-move_speed = 0.1
-
-# Bullets and Enemies
-bullets = []
-enemies = []
+# Split screen cameras - projection never changes, only the view is rebuilt
+player1_camera = Camera((0, 360, 1280, 360))
+player1_camera.set_perspective(30, (1280/360), 0.1, 100.0)
+player2_camera = Camera((0, 0, 1280, 360))
+player2_camera.set_perspective(30, (1280/360), 0.1, 100.0)
 
 # Animation variables
 walk_animation = 0
 
-class Bullet:
-    def __init__(self, pos, rotation, owner):
-        self.pos = list(pos)
-        self.rotation = rotation
-        self.speed = 0.5
-        self.lifetime = 300
-        self.radius = 0.2
-        self.owner = owner
-        
-    def update(self):
-        self.pos[0] += math.sin(math.radians(self.rotation)) * self.speed
-        self.pos[2] += math.cos(math.radians(self.rotation)) * self.speed
-        self.lifetime -= 1
-        
-    def is_alive(self):
-        return self.lifetime > 0
-    
-    def get_bbox(self):
-        return {
-            'x': self.pos[0],
-            'y': self.pos[1],
-            'z': self.pos[2],
-            'radius': self.radius
-        }
-
-class Enemy:
-    def __init__(self, x, z):
-        self.pos = [x, 1, z]
-        self.health = 100
-        self.size = 1
-        self.alive = True
-        
-    def take_damage(self, amount):
-        self.health -= amount
-        if self.health <= 0:
-            self.alive = False
-            
-    def get_bbox(self):
-        return {
-            'x': self.pos[0],
-            'y': self.pos[1],
-            'z': self.pos[2],
-            'size': self.size
-        }
-
-def check_collision_sphere_box(bullet_bbox, enemy_bbox):
-    """Check collision between bullet (sphere) and enemy (box)"""
-    dx = bullet_bbox['x'] - enemy_bbox['x']
-    dy = bullet_bbox['y'] - enemy_bbox['y']
-    dz = bullet_bbox['z'] - enemy_bbox['z']
-    distance = math.sqrt(dx*dx + dy*dy + dz*dz)
-    return distance < (bullet_bbox['radius'] + enemy_bbox['size'])
-
 def setup_lighting():
     """Setup OpenGL lighting"""
     glEnable(GL_LIGHTING)
@@ -144,6 +108,17 @@ def draw_minecraft_cube(x, y, z, width, height, depth, color):
     
     glPopMatrix()
 
+# Head and leg shades per body color, built once instead of every frame
+_player_shades = {}
+
+def player_shades(color):
+    shades = _player_shades.get(color)
+    if shades is None:
+        shades = ((color[0] * 0.8, color[1] * 0.8, color[2] * 0.8),
+                  (color[0] * 0.6, color[1] * 0.6, color[2] * 0.6))
+        _player_shades[color] = shades
+    return shades
+
 def draw_minecraft_player(pos, rotation, color, is_moving=False):
     """Draw a Minecraft-style player with head, body, arms, and legs"""
     glPushMatrix()
@@ -155,7 +130,7 @@ def draw_minecraft_player(pos, rotation, color, is_moving=False):
     leg_swing = math.sin(walk_animation) * 30 if is_moving else 0
     
     # HEAD (8x8x8 pixels in Minecraft = 0.5x0.5x0.5 units)
-    head_color = (color[0] * 0.8, color[1] * 0.8, color[2] * 0.8)
+    head_color, leg_color = player_shades(color)
     draw_minecraft_cube(0, 1.9, 0, 0.5, 0.5, 0.5, head_color)
     
     # Eyes (simple black cubes)
@@ -188,7 +163,6 @@ def draw_minecraft_player(pos, rotation, color, is_moving=False):
     glTranslatef(-0.125, 0.875, 0)
     glRotatef(-leg_swing, 1, 0, 0)
     glTranslatef(0, -0.375, 0)
-    leg_color = (color[0] * 0.6, color[1] * 0.6, color[2] * 0.6)
     draw_minecraft_cube(0, 0, 0, 0.25, 0.75, 0.25, leg_color)
     glPopMatrix()
     
@@ -285,125 +259,73 @@ def draw_enemy(enemy):
     glPopMatrix()
     glEnable(GL_LIGHTING)
 
-def set_camera(player_pos, player_rotation):
+def set_camera(camera, player_pos, player_rotation):
     """Set camera behind a specific player"""
     cam_x = player_pos[0] - math.sin(math.radians(player_rotation)) * camera_distance
     cam_y = player_pos[1] + camera_height
     cam_z = player_pos[2] - math.cos(math.radians(player_rotation)) * camera_distance
     
-    gluLookAt(
-        cam_x, cam_y, cam_z,
-        player_pos[0], player_pos[1] + 1.5, player_pos[2],
-        0, 1, 0
+    camera.look_at(
+        (cam_x, cam_y, cam_z),
+        (player_pos[0], player_pos[1] + 1.5, player_pos[2]),
+        (0, 1, 0)
     )
+    camera.load()
+
+def draw_horde(mesh):
+    """Every zombie in one draw call from the horde's vertex arrays"""
+    vertices, normals, colors = mesh
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, vertices)
+    glNormalPointer(GL_BYTE, 0, normals)
+    glColorPointer(3, GL_UNSIGNED_BYTE, 0, colors)
+    glDrawArrays(GL_QUADS, 0, len(vertices))
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
 
-def draw_scene(player1_moving, player2_moving):
+def draw_pillars():
+    """Stone pillars of the horde arena"""
+    for x, z, radius in PILLARS:
+        draw_minecraft_cube(x, 2, z, radius * 2, 4, radius * 2, (0.5, 0.5, 0.5))
+
+def draw_scene():
     """Draw the entire game scene"""
     draw_ground()
     
     # Draw both Minecraft-style players
-    draw_minecraft_player(player1_pos, player1_rotation, (0.3, 0.5, 0.9), player1_moving)
-    draw_minecraft_player(player2_pos, player2_rotation, (0.9, 0.3, 0.3), player2_moving)
+    draw_minecraft_player(player1.pos, player1.rotation, (0.3, 0.5, 0.9), player1.moving)
+    draw_minecraft_player(player2.pos, player2.rotation, (0.9, 0.3, 0.3), player2.moving)
     
     # Draw bullets
-    for bullet in bullets:
+    for bullet in view_world.bullets:
         draw_bullet(bullet)
     
     # Draw enemies
-    for enemy in enemies:
+    for enemy in view_world.enemies:
         draw_enemy(enemy)
+    
+    # Draw the horde, from the mesh built once for both views
+    if view_world.horde is not None:
+        draw_pillars()
+        draw_horde(horde_mesh)
 
-def handle_player1_movement(keys, dt):
-    """Handle Player 1 movement (WASD)"""
-    global player1_pos, player1_rotation
-    speed = move_speed * dt
-    is_moving = False
-    
-    # Rotation
-    if keys[K_q]:
-        player1_rotation += 2
-    if keys[K_e]:
-        player1_rotation -= 2
-    
-    # Movement
-    if keys[K_w]:
-        player1_pos[0] += math.sin(math.radians(player1_rotation)) * speed
-        player1_pos[2] += math.cos(math.radians(player1_rotation)) * speed
-        is_moving = True
-    if keys[K_s]:
-        player1_pos[0] -= math.sin(math.radians(player1_rotation)) * speed
-        player1_pos[2] -= math.cos(math.radians(player1_rotation)) * speed
-        is_moving = True
-    if keys[K_d]:
-        player1_pos[0] += math.sin(math.radians(player1_rotation - 90)) * speed
-        player1_pos[2] += math.cos(math.radians(player1_rotation - 90)) * speed
-        is_moving = True
-    if keys[K_a]:
-        player1_pos[0] += math.sin(math.radians(player1_rotation + 90)) * speed
-        player1_pos[2] += math.cos(math.radians(player1_rotation + 90)) * speed
-        is_moving = True
-    
-    return is_moving
-
-def handle_player2_movement(keys, dt):
-    """Handle Player 2 movement (Arrow keys)"""
-    global player2_pos, player2_rotation
-    speed = move_speed * dt
-    is_moving = False
-    
-    # Rotation
-    if keys[K_u]:
-        player2_rotation += 2
-    if keys[K_o]:
-        player2_rotation -= 2
-    
-    # Movement
-    if keys[K_i]:
-        player2_pos[0] += math.sin(math.radians(player2_rotation)) * speed
-        player2_pos[2] += math.cos(math.radians(player2_rotation)) * speed
-    if keys[K_k]:
-        player2_pos[0] -= math.sin(math.radians(player2_rotation)) * speed
-        player2_pos[2] -= math.cos(math.radians(player2_rotation)) * speed
-    if keys[K_l]:
-        player2_pos[0] += math.sin(math.radians(player2_rotation - 90)) * speed
-        player2_pos[2] += math.cos(math.radians(player2_rotation - 90)) * speed
-    if keys[K_j]:
-        player2_pos[0] += math.sin(math.radians(player2_rotation + 90)) * speed
-        player2_pos[2] += math.cos(math.radians(player2_rotation + 90)) * speed
-    
-    return is_moving
-
-def shoot_player1():
-    """Player 1 shoots"""
-    bullet = Bullet([player1_pos[0], player1_pos[1], player1_pos[2]], player1_rotation, 1)
-    bullets.append(bullet)
-
-def shoot_player2():
-    """Player 2 shoots"""
-    bullet = Bullet([player2_pos[0], player2_pos[1], player2_pos[2]], player2_rotation, 2)
-    bullets.append(bullet)
-
-def spawn_enemies():
-    """Spawn enemies around the map"""
-    for i in range(8):
-        angle = i * 45
-        x = math.sin(math.radians(angle)) * 20
-        z = math.cos(math.radians(angle)) * 20
-        enemies.append(Enemy(x, z))
+# Keyboard layout per player: forward, back, right, left, turn left, turn right
+PLAYER1_KEYS = (K_w, K_s, K_d, K_a, K_q, K_e)
+PLAYER2_KEYS = (K_i, K_k, K_l, K_j, K_u, K_o)
 
-def draw_split_screen_hud():
-    """Draw HUD for split screen"""
-    glDisable(GL_LIGHTING)
-    glDisable(GL_DEPTH_TEST)
-    glMatrixMode(GL_PROJECTION)
-    glPushMatrix()
-    glLoadIdentity()
-    glOrtho(0, 1280, 0, 720, -1, 1)
-    glMatrixMode(GL_MODELVIEW)
-    glPushMatrix()
-    glLoadIdentity()
-    
-    # Player 1 health bar (top screen)
+def read_keyboard_input(keys, bindings, shoot):
+    forward, back, right, left, turn_left, turn_right = bindings
+    return PlayerInput(forward=keys[forward] - keys[back],
+                       strafe=keys[right] - keys[left],
+                       turn=keys[turn_left] - keys[turn_right],
+                       shoot=shoot)
+
+def draw_hud_static():
+    """Health bar backgrounds, divider and crosshairs - compiled once"""
+    # Player 1 health bar background (top screen)
     glColor3f(0.5, 0, 0)
     glBegin(GL_QUADS)
     glVertex2f(10, 720 - 30)
@@ -412,17 +334,7 @@ def draw_split_screen_hud():
     glVertex2f(10, 720 - 10)
     glEnd()
     
-    glColor3f(0, 1, 0)
-    health_width = (player1_health / 100.0) * 200
-    glBegin(GL_QUADS)
-    glVertex2f(10, 720 - 30)
-    glVertex2f(10 + health_width, 720 - 30)
-    glVertex2f(10 + health_width, 720 - 10)
-    glVertex2f(10, 720 - 10)
-    glEnd()
-    
-    # Player 2 health bar (bottom screen)
-    glColor3f(0.5, 0, 0)
+    # Player 2 health bar background (bottom screen)
     glBegin(GL_QUADS)
     glVertex2f(10, 30)
     glVertex2f(210, 30)
@@ -430,15 +342,6 @@ def draw_split_screen_hud():
     glVertex2f(10, 10)
     glEnd()
     
-    glColor3f(0, 1, 0)
-    health_width = (player2_health / 100.0) * 200
-    glBegin(GL_QUADS)
-    glVertex2f(10, 30)
-    glVertex2f(10 + health_width, 30)
-    glVertex2f(10 + health_width, 10)
-    glVertex2f(10, 10)
-    glEnd()
-    
     # Divider line
     glColor3f(1, 1, 1)
     glLineWidth(2)
@@ -465,24 +368,68 @@ def draw_split_screen_hud():
     glVertex2f(640, 180 - 15)
     glVertex2f(640, 180 + 15)
     glEnd()
-    
-    glPopMatrix()
-    glMatrixMode(GL_PROJECTION)
-    glPopMatrix()
-    glMatrixMode(GL_MODELVIEW)
-    glEnable(GL_DEPTH_TEST)
-    glEnable(GL_LIGHTING)
+
+def draw_health_bar(y_bottom, y_top, health):
+    """Green part of a health bar"""
+    glColor3f(0, 1, 0)
+    health_width = (health / 100.0) * 200
+    glBegin(GL_QUADS)
+    glVertex2f(10, y_bottom)
+    glVertex2f(10 + health_width, y_bottom)
+    glVertex2f(10 + health_width, y_top)
+    glVertex2f(10, y_top)
+    glEnd()
+
+def create_split_screen_hud():
+    """Build the HUD: static geometry plus widgets bound to player health"""
+    hud = Hud(1280, 720)
+    hud.add_static(draw_hud_static)
+    hud.add_widget(lambda: player1.health, lambda health: draw_health_bar(720 - 30, 720 - 10, health))
+    hud.add_widget(lambda: player2.health, lambda health: draw_health_bar(30, 10, health))
+    return hud
+
+def draw_split_screen_hud():
+    """Draw HUD for split screen"""
+    split_screen_hud.draw()
 
 # Initialize
 glEnable(GL_DEPTH_TEST)
 setup_lighting()
-spawn_enemies()
+split_screen_hud = create_split_screen_hud()
+
+# Threaded mode: the render loop posts input, the simulation thread consumes
+# it every tick and publishes the packed world for the next frame to draw
+TICK_MS = 17
+mailbox = InputMailbox((IDLE_INPUT, IDLE_INPUT))
+snapshots = SnapshotBuffer()
+
+def tick_inputs():
+    """Held input plus every shot posted since the last tick"""
+    shots = mailbox.take_events()
+    return [PlayerInput(held.forward, held.strafe, held.turn, shoot=number in shots)
+            for number, held in enumerate(mailbox.held, 1)]
+
+sim = None
+if args.threaded:
+    sim = SimulationThread(lambda: world.step(tick_inputs(), TICK_MS / 10.0), world.pack_state, snapshots)
+    sim.start()
+last_snapshot = None
+horde_mesh = None
 
 # Main loop
 running = True
 last_time = pygame.time.get_ticks()
 
+FRAME_BUDGET = 1.0 / 60
+allocations = AllocationTracker() if args.alloc_diag else None
+section = sections(allocations)
+frame_gc = None
+if args.gc_policy:
+    frame_gc = FrameGC()
+    frame_gc.after_load()
+
 while running:
+    frame_began = time.perf_counter()
     current_time = pygame.time.get_ticks()
     dt = (current_time - last_time) / 10.0
     last_time = current_time
@@ -491,62 +438,75 @@ while running:
     walk_animation += 0.2
     
     # Events
-    for event in pygame.event.get():
+    shoot1 = False
+    shoot2 = False
+    with section("events"):
+        events = pygame.event.get()
+    for event in events:
         if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
             running = False
         if event.type == KEYDOWN:
             if event.key == K_SPACE:
-                shoot_player1()
+                shoot1 = True
             if event.key == K_SEMICOLON:
-                shoot_player2()
+                shoot2 = True
     
     # Input
     keys = pygame.key.get_pressed()
-    player1_moving = handle_player1_movement(keys, dt)
-    player2_moving = handle_player2_movement(keys, dt)
-    
-    # Update bullets
-    bullets = [b for b in bullets if b.is_alive()]
-    for bullet in bullets:
-        bullet.update()
-    
-    # Collision detection
-    for bullet in bullets[:]:
-        for enemy in enemies:
-            if enemy.alive and check_collision_sphere_box(bullet.get_bbox(), enemy.get_bbox()):
-                enemy.take_damage(34)
-                if bullet in bullets:
-                    bullets.remove(bullet)
-                break
-    
-    # Clear screen
-    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    
-    # ===== PLAYER 1 VIEW (Top Half) =====
-    glViewport(0, 360, 1280, 360)
-    glMatrixMode(GL_PROJECTION)
-    glLoadIdentity()
-    gluPerspective(30, (1280/360), 0.1, 100.0)
-    glMatrixMode(GL_MODELVIEW)
-    glLoadIdentity()
-    set_camera(player1_pos, player1_rotation)
-    draw_scene(player1_moving, player2_moving)
-    
-    # ===== PLAYER 2 VIEW (Bottom Half) =====
-    glViewport(0, 0, 1280, 360)
-    glMatrixMode(GL_PROJECTION)
-    glLoadIdentity()
-    gluPerspective(30, (1280/360), 0.1, 100.0)
-    glMatrixMode(GL_MODELVIEW)
-    glLoadIdentity()
-    set_camera(player2_pos, player2_rotation)
-    draw_scene(player1_moving, player2_moving)
-    
-    # Draw HUD (full screen)
-    glViewport(0, 0, 1280, 720)
-    draw_split_screen_hud()
-    
-    pygame.display.flip()
+    input1 = read_keyboard_input(keys, PLAYER1_KEYS, shoot1)
+    input2 = read_keyboard_input(keys, PLAYER2_KEYS, shoot2)
+    
+    with section("simulation"):
+        if sim is None:
+            world.step((input1, input2), dt)
+        else:
+            mailbox.set_held((input1, input2))
+            if shoot1:
+                mailbox.post(1)
+            if shoot2:
+                mailbox.post(2)
+            snapshot = snapshots.latest()
+            if snapshot is not None and snapshot is not last_snapshot:
+                view_world.unpack_state(snapshot)
+                last_snapshot = snapshot
+            if sim.error is not None:
+                raise sim.error
+    
+    with section("render"):
+        if view_world.horde is not None:
+            horde_mesh = view_world.horde.mesh()
+        
+        # Clear screen
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        
+        # ===== PLAYER 1 VIEW (Top Half) =====
+        glViewport(*player1_camera.viewport)
+        set_camera(player1_camera, player1.pos, player1.rotation)
+        draw_scene()
+        
+        # ===== PLAYER 2 VIEW (Bottom Half) =====
+        glViewport(*player2_camera.viewport)
+        set_camera(player2_camera, player2.pos, player2.rotation)
+        draw_scene()
+        
+        # Draw HUD (full screen)
+        glViewport(0, 0, 1280, 720)
+        draw_split_screen_hud()
+    
+    with section("present"):
+        pygame.display.flip()
+    if allocations is not None:
+        allocations.end_frame()
+    if frame_gc is not None:
+        frame_gc.idle(frame_began + FRAME_BUDGET)
     clock.tick(60)
 
+if sim is not None:
+    sim.stop()
+    print(sim.report())
+if frame_gc is not None:
+    print(frame_gc.report())
+if allocations is not None:
+    allocations.stop()
+    print(allocations.report())
 pygame.quit()
@@ -2,13 +2,52 @@ import pygame
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
+import argparse
 import math
+import time
+
+from allocations import AllocationTracker, sections
+from camera import Camera
+from capture import FrameCapture
+from gc_policy import FrameGC
+from hud import Hud, HudLayer
+from input_queue import InputEvent, InputQueue
+from latency import LatencyRecorder, histogram
+from metrics import PvPMetrics, serve
+from pvp_replay import ReplayPlayer, ReplayRecorder
+from pvp_bots import BotPlayers
+from pvp_snapshots import SnapshotRing
+from pvp_world import MAP_SIZE, RESPAWN_DELAY, PlayerInput, PvPWorld
+from sim_thread import SimulationThread, SnapshotBuffer
+
+parser = argparse.ArgumentParser(description="PvP split screen")
+parser.add_argument("--capture", metavar="PATH",
+                    help="record every frame to a .y4m, .rgb or PNG directory")
+parser.add_argument("--record", metavar="PATH", help="record the match inputs to a replay file")
+parser.add_argument("--replay", metavar="PATH",
+                    help="watch a replay; LEFT/RIGHT seek 10 seconds back/forward")
+parser.add_argument("--threaded", action="store_true",
+                    help="run the simulation on its own thread at a fixed 60 Hz (not for replays)")
+parser.add_argument("--bot", action="store_true", help="practice mode: player 2 is a bot")
+parser.add_argument("--vsync", action="store_true", help="ask the driver for vsync")
+parser.add_argument("--fps-cap", type=int, default=60, metavar="FPS", help="frame cap, 0 for none")
+parser.add_argument("--latency-sync", choices=("finish", "fence"),
+                    help="bound GPU completion: glFinish after every flip (no render-ahead) "
+                         "or a fence waited on next frame (one frame ahead)")
+parser.add_argument("--latency-csv", metavar="PATH", help="write every input's latency to a CSV file")
+parser.add_argument("--metrics", type=int, metavar="PORT",
+                    help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+parser.add_argument("--gc-policy", action="store_true",
+                    help="freeze the loaded level and run the cyclic GC only in frame slack time")
+parser.add_argument("--alloc-diag", action="store_true",
+                    help="trace allocations per frame and subsystem (slow; prints a report at exit)")
+args = parser.parse_args()
 
 # Initialize Pygame
 pygame.display.init()
 pygame.font.init()
 pygame.joystick.init()
-screen = pygame.display.set_mode((1920, 1080), DOUBLEBUF | OPENGL)
+screen = pygame.display.set_mode((1920, 1080), DOUBLEBUF | OPENGL, vsync=int(args.vsync))
 pygame.display.set_caption("PvP Split Screen - 1080p")
 clock = pygame.time.Clock()
 pygame.mouse.set_visible(False)
@@ -17,43 +56,27 @@ pygame.event.set_grab(True)
 # Font for score numbers
 score_font = pygame.font.Font(None, 120)
 
-# Map dimensions
-MAP_SIZE = 60
-SPAWN_DISTANCE = 25
-
-# Player 1 variables
-player1_pos = [-SPAWN_DISTANCE, 0, 0]
-player1_rotation = 0
-player1_health = 100
-player1_score = 0
-player1_alive = True
-
-# Player 2 variables
-player2_pos = [SPAWN_DISTANCE, 0, 0]
-player2_rotation = 180
-player2_health = 100
-player2_score = 0
-player2_alive = True
-
-# Portal cooldowns
-portal_cooldown1 = 0
-portal_cooldown2 = 0
+# Match state lives in the world, this script only renders it and feeds it input.
+# With --threaded the simulation thread owns `world` and the renderer draws
+# `view_world`, a copy restored from the snapshots it publishes.
+replay = ReplayPlayer(args.replay) if args.replay else None
+world = replay.world if replay else PvPWorld()
+threaded = args.threaded and replay is None
+view_world = PvPWorld() if threaded else world
+player1, player2 = view_world.players
+PLAYER_COLORS = [(0.3, 0.5, 0.9), (0.9, 0.3, 0.3)]
+obstacles = world.obstacles
+portals = world.portals
 
 # Camera settings
 camera_distance = 10
 camera_height = 3
 
-# Movement
-move_speed = 0.1
-
-# Bullets
-bullets = []
-
-# Obstacles list
-obstacles = []
-
-# Portals list - each portal has position and destination
-portals = []
+# Split screen cameras - projection never changes, only the view is rebuilt
+player1_camera = Camera((0, 540, 1920, 540))
+player1_camera.set_perspective(30, (1920/540), 0.1, 150.0)
+player2_camera = Camera((0, 0, 1920, 540))
+player2_camera.set_perspective(30, (1920/540), 0.1, 150.0)
 
 # Animation
 walk_animation = 0
@@ -65,31 +88,6 @@ cube_display_list = None
 
 # Controllers
 controllers = []
-controller1_last_shoot = False
-controller2_last_shoot = False
-
-class Portal:
-    def __init__(self, x, z, dest_x, dest_z, color=(0.5, 0, 1)):
-        self.x = x
-        self.y = 2.5
-        self.z = z
-        self.dest_x = dest_x
-        self.dest_z = dest_z
-        self.color = color
-        self.radius = 1.5
-        self.height = 5
-    
-    def check_teleport(self, player_pos):
-        """Check if player is in portal"""
-        dx = player_pos[0] - self.x
-        dz = player_pos[2] - self.z
-        distance = math.sqrt(dx*dx + dz*dz)
-        return distance < self.radius
-
-def add_portal_pair(x1, z1, x2, z2):
-    """Add two linked portals (bidirectional teleport)"""
-    portals.append(Portal(x1, z1, x2, z2, (0.5, 0, 1)))
-    portals.append(Portal(x2, z2, x1, z1, (1, 0.5, 0)))
 
 def init_controllers():
     global controllers
@@ -108,79 +106,6 @@ def init_controllers():
     
     return count
 
-class Bullet:
-    def __init__(self, pos, rotation, owner):
-        self.pos = list(pos)
-        self.rotation = rotation
-        self.speed = 0.5
-        self.lifetime = 300
-        self.radius = 0.3
-        self.owner = owner
-        
-    def update(self):
-        self.pos[0] += math.sin(math.radians(self.rotation)) * self.speed
-        self.pos[2] += math.cos(math.radians(self.rotation)) * self.speed
-        self.lifetime -= 1
-        
-    def is_alive(self):
-        return self.lifetime > 0
-    
-    def check_hit_player(self, player_pos, player_size=1.0):
-        dx = self.pos[0] - player_pos[0]
-        dy = self.pos[1] - player_pos[1] - 1
-        dz = self.pos[2] - player_pos[2]
-        distance = math.sqrt(dx*dx + dy*dy + dz*dz)
-        return distance < (self.radius + player_size)
-    
-    def check_hit_obstacle(self, obstacle):
-        dx = self.pos[0] - obstacle['x']
-        dy = self.pos[1] - obstacle['y']
-        dz = self.pos[2] - obstacle['z']
-        distance = math.sqrt(dx*dx + dy*dy + dz*dz)
-        return distance < (self.radius + obstacle['size'])
-
-class Obstacle:
-    def __init__(self, x, y, z, width, height, depth, color):
-        self.x = x
-        self.y = y
-        self.z = z
-        self.width = width
-        self.height = height
-        self.depth = depth
-        self.color = color
-        self.size = max(width, height, depth) / 2
-    
-    def to_dict(self):
-        return {
-            'x': self.x,
-            'y': self.y,
-            'z': self.z,
-            'width': self.width,
-            'height': self.height,
-            'depth': self.depth,
-            'color': self.color,
-            'size': self.size
-        }
-
-def add_obstacle(x, y, z, width, height, depth, color):
-    obstacles.append(Obstacle(x, y, z, width, height, depth, color))
-
-def add_wall(x1, z1, x2, z2, height=3, thickness=1):
-    center_x = (x1 + x2) / 2
-    center_z = (z1 + z2) / 2
-    length = math.sqrt((x2-x1)**2 + (z2-z1)**2)
-    
-    if abs(x2 - x1) > abs(z2 - z1):
-        add_obstacle(center_x, height/2, center_z, length, height, thickness, (0.5, 0.3, 0.2))
-    else:
-        add_obstacle(center_x, height/2, center_z, thickness, height, length, (0.5, 0.3, 0.2))
-
-def add_box_obstacle(x, z, size=3):
-    add_obstacle(x, size/2, z, size, size, size, (0.6, 0.4, 0.2))
-
-def add_pillar(x, z, height=5, radius=1.5):
-    add_obstacle(x, height/2, z, radius*2, height, radius*2, (0.4, 0.4, 0.4))
-
 def setup_lighting():
     glEnable(GL_LIGHTING)
     glEnable(GL_LIGHT0)
@@ -327,6 +252,17 @@ def draw_portal(portal):
     
     glPopMatrix()
 
+# Head and leg shades per body color, built once instead of every frame
+_player_shades = {}
+
+def player_shades(color):
+    shades = _player_shades.get(color)
+    if shades is None:
+        shades = ((color[0] * 0.8, color[1] * 0.8, color[2] * 0.8),
+                  (color[0] * 0.6, color[1] * 0.6, color[2] * 0.6))
+        _player_shades[color] = shades
+    return shades
+
 def draw_minecraft_player(pos, rotation, color, is_moving=False, is_alive=True):
     if not is_alive:
         return
@@ -338,7 +274,7 @@ def draw_minecraft_player(pos, rotation, color, is_moving=False, is_alive=True):
     arm_swing = math.sin(walk_animation) * 30 if is_moving else 0
     leg_swing = math.sin(walk_animation) * 30 if is_moving else 0
     
-    head_color = (color[0] * 0.8, color[1] * 0.8, color[2] * 0.8)
+    head_color, leg_color = player_shades(color)
     draw_minecraft_cube(0, 1.9, 0, 0.5, 0.5, 0.5, head_color)
     
     glDisable(GL_LIGHTING)
@@ -366,7 +302,6 @@ def draw_minecraft_player(pos, rotation, color, is_moving=False, is_alive=True):
     glTranslatef(-0.125, 0.875, 0)
     glRotatef(-leg_swing, 1, 0, 0)
     glTranslatef(0, -0.375, 0)
-    leg_color = (color[0] * 0.6, color[1] * 0.6, color[2] * 0.6)
     draw_minecraft_cube(0, 0, 0, 0.25, 0.75, 0.25, leg_color)
     glPopMatrix()
     
@@ -460,11 +395,8 @@ def draw_text_2d(x, y, text, font, color=(255, 255, 255)):
     glDrawPixels(text_surface.get_width(), text_surface.get_height(), 
                  GL_RGBA, GL_UNSIGNED_BYTE, text_data)
 
-def draw_minimap(x, y, size, player_pos, player_rotation, other_pos, player_num):
-    """Draw rotating minimap that follows player"""
-    glDisable(GL_LIGHTING)
-    glDisable(GL_DEPTH_TEST)
-    
+def draw_minimap_frame(x, y, size):
+    """Minimap background and border - static part of the HUD"""
     # Background
     glColor3f(0.1, 0.1, 0.1)
     glBegin(GL_QUADS)
@@ -483,97 +415,77 @@ def draw_minimap(x, y, size, player_pos, player_rotation, other_pos, player_num)
     glVertex2f(x + size, y + size)
     glVertex2f(x, y + size)
     glEnd()
-    
-    center_x = x + size / 2
-    center_y = y + size / 2
-    scale = size / (MAP_SIZE * 2)
-    
-    rotation = math.radians(player_rotation + 180)
-    
-    def rotate_point(px, pz, angle):
-        """Rotate a point around origin"""
-        cos_a = math.cos(angle)
-        sin_a = math.sin(angle)
-        return (px * cos_a - pz * sin_a, px * sin_a + pz * cos_a)
-    
-    # Draw map bounds (rotated)
+
+MINIMAP_SCALE = 200 / (MAP_SIZE * 2)   # Minimap pixels per world unit
+
+def draw_minimap_world():
+    """Map bounds, obstacles and portals in world coordinates (x, z) - compiled once"""
     glColor3f(0.3, 0.3, 0.3)
     glBegin(GL_LINE_LOOP)
-    corners = [(-MAP_SIZE, -MAP_SIZE), (MAP_SIZE, -MAP_SIZE), 
-               (MAP_SIZE, MAP_SIZE), (-MAP_SIZE, MAP_SIZE)]
-    for corner_x, corner_z in corners:
-        # Relative to player
-        rel_x = corner_x - player_pos[0]
-        rel_z = corner_z - player_pos[2]
-        # Rotate
-        rot_x, rot_z = rotate_point(rel_x, rel_z, rotation)
-        # Clamp to minimap bounds
-        screen_x = center_x + rot_x * scale
-        screen_y = center_y - rot_z * scale
-        glVertex2f(screen_x, screen_y)
+    glVertex2f(-MAP_SIZE, -MAP_SIZE)
+    glVertex2f(MAP_SIZE, -MAP_SIZE)
+    glVertex2f(MAP_SIZE, MAP_SIZE)
+    glVertex2f(-MAP_SIZE, MAP_SIZE)
     glEnd()
     
-    # Draw obstacles (rotated)
     glColor3f(0.6, 0.4, 0.2)
+    glBegin(GL_QUADS)
     for obs in obstacles:
-        rel_x = obs.x - player_pos[0]
-        rel_z = obs.z - player_pos[2]
-        
-        # Only draw if in range
-        if abs(rel_x) < MAP_SIZE and abs(rel_z) < MAP_SIZE:
-            rot_x, rot_z = rotate_point(rel_x, rel_z, rotation)
-            
-            ox = center_x + rot_x * scale
-            oz = center_y - rot_z * scale
-            obs_size = obs.width * scale * 0.5
-            
-            # Check if in minimap bounds
-            if (x < ox < x + size) and (y < oz < y + size):
-                glBegin(GL_QUADS)
-                glVertex2f(ox - obs_size, oz - obs_size)
-                glVertex2f(ox + obs_size, oz - obs_size)
-                glVertex2f(ox + obs_size, oz + obs_size)
-                glVertex2f(ox - obs_size, oz + obs_size)
-                glEnd()
-    
-    # Draw portals (rotated)
+        half = obs.width * 0.5
+        glVertex2f(obs.x - half, obs.z - half)
+        glVertex2f(obs.x + half, obs.z - half)
+        glVertex2f(obs.x + half, obs.z + half)
+        glVertex2f(obs.x - half, obs.z + half)
+    glEnd()
+    
+    # Portals keep their 3 pixel dots at MINIMAP_SCALE
+    radius = 3 / MINIMAP_SCALE
     for portal in portals:
-        rel_x = portal.x - player_pos[0]
-        rel_z = portal.z - player_pos[2]
-        
-        if abs(rel_x) < MAP_SIZE and abs(rel_z) < MAP_SIZE:
-            rot_x, rot_z = rotate_point(rel_x, rel_z, rotation)
-            
-            px = center_x + rot_x * scale
-            pz = center_y - rot_z * scale
-            
-            if (x < px < x + size) and (y < pz < y + size):
-                glColor3f(*portal.color)
-                glBegin(GL_TRIANGLE_FAN)
-                glVertex2f(px, pz)
-                for i in range(9):
-                    angle = (i / 8) * 2 * math.pi
-                    glVertex2f(px + math.cos(angle) * 3, pz + math.sin(angle) * 3)
-                glEnd()
+        glColor3f(*portal.color)
+        glBegin(GL_TRIANGLE_FAN)
+        glVertex2f(portal.x, portal.z)
+        for i in range(9):
+            angle = (i / 8) * 2 * math.pi
+            glVertex2f(portal.x + math.cos(angle) * radius, portal.z + math.sin(angle) * radius)
+        glEnd()
+
+minimap_world = HudLayer(draw_minimap_world)
+
+def draw_minimap(x, y, size, player, other, player_num):
+    """Rotating minimap that follows player: the cached map moved under the markers"""
+    center_x = x + size / 2
+    center_y = y + size / 2
     
-    # Draw other player (rotated)
-    rel_x = other_pos[0] - player_pos[0]
-    rel_z = other_pos[2] - player_pos[2]
+    # Same mapping as world to minimap: relative to the player, rotated by
+    # rotation + 180, z pointing down the screen
+    glEnable(GL_SCISSOR_TEST)
+    glScissor(x, y, size, size)
+    glPushMatrix()
+    glTranslatef(center_x, center_y, 0)
+    glScalef(MINIMAP_SCALE, -MINIMAP_SCALE, 1)
+    glRotatef(player.rotation + 180, 0, 0, 1)
+    glTranslatef(-player.pos[0], -player.pos[2], 0)
+    minimap_world.draw()
+    glPopMatrix()
+    glDisable(GL_SCISSOR_TEST)
     
-    if abs(rel_x) < MAP_SIZE and abs(rel_z) < MAP_SIZE:
-        rot_x, rot_z = rotate_point(rel_x, rel_z, rotation)
-        
-        ox = center_x + rot_x * scale
-        oz = center_y - rot_z * scale
-        
-        if (x < ox < x + size) and (y < oz < y + size):
-            other_color = (0.9, 0.3, 0.3) if player_num == 1 else (0.3, 0.5, 0.9)
-            glColor3f(*other_color)
-            glBegin(GL_TRIANGLES)
-            glVertex2f(ox, oz - 5)
-            glVertex2f(ox - 4, oz + 4)
-            glVertex2f(ox + 4, oz + 4)
-            glEnd()
+    # Draw other player (rotated)
+    rotation = math.radians(player.rotation + 180)
+    rel_x = other.pos[0] - player.pos[0]
+    rel_z = other.pos[2] - player.pos[2]
+    rot_x = rel_x * math.cos(rotation) - rel_z * math.sin(rotation)
+    rot_z = rel_x * math.sin(rotation) + rel_z * math.cos(rotation)
+    ox = center_x + rot_x * MINIMAP_SCALE
+    oz = center_y - rot_z * MINIMAP_SCALE
+    
+    if (x < ox < x + size) and (y < oz < y + size):
+        other_color = (0.9, 0.3, 0.3) if player_num == 1 else (0.3, 0.5, 0.9)
+        glColor3f(*other_color)
+        glBegin(GL_TRIANGLES)
+        glVertex2f(ox, oz - 5)
+        glVertex2f(ox - 4, oz + 4)
+        glVertex2f(ox + 4, oz + 4)
+        glEnd()
     
     # Draw current player (center - always visible)
     player_color = (0.3, 0.5, 0.9) if player_num == 1 else (0.9, 0.3, 0.3)
@@ -600,257 +512,113 @@ def draw_minimap(x, y, size, player_pos, player_rotation, other_pos, player_num)
     glVertex2f(center_x - 3, center_y + arrow_len - 5)
     glVertex2f(center_x + 3, center_y + arrow_len - 5)
     glEnd()
-    
-    glEnable(GL_DEPTH_TEST)
-    glEnable(GL_LIGHTING)
 
-
-def set_camera(player_pos, player_rotation):
+def set_camera(camera, player_pos, player_rotation):
     cam_x = player_pos[0] - math.sin(math.radians(player_rotation)) * camera_distance
     cam_y = player_pos[1] + camera_height
     cam_z = player_pos[2] - math.cos(math.radians(player_rotation)) * camera_distance
     
-    gluLookAt(
-        cam_x, cam_y, cam_z,
-        player_pos[0], player_pos[1] + 1.5, player_pos[2],
-        0, 1, 0
+    camera.look_at(
+        (cam_x, cam_y, cam_z),
+        (player_pos[0], player_pos[1] + 1.5, player_pos[2]),
+        (0, 1, 0)
     )
+    camera.load()
 
-def draw_scene(player1_moving, player2_moving):
+def draw_scene(view_world):
     draw_ground()
     draw_obstacles()
     
     for portal in portals:
         draw_portal(portal)
     
-    draw_minecraft_player(player1_pos, player1_rotation, (0.3, 0.5, 0.9), player1_moving, player1_alive)
-    draw_minecraft_player(player2_pos, player2_rotation, (0.9, 0.3, 0.3), player2_moving, player2_alive)
+    for player, color in zip(view_world.players, PLAYER_COLORS):
+        draw_minecraft_player(player.pos, player.rotation, color, player.moving, player.alive)
     
-    for bullet in bullets:
+    for bullet in view_world.bullets:
         draw_bullet(bullet)
 
-def handle_controller_input():
-    """Handle both controllers"""
-    global player1_pos, player1_rotation, player1_alive
-    global player2_pos, player2_rotation, player2_alive
-    global controller1_last_shoot, controller2_last_shoot
-    
-    p1_moving = False
-    p2_moving = False
-    
-    # Player 1 Controller
-    if len(controllers) >= 1 and player1_alive:
-        c = controllers[0]
-        speed = move_speed * 3
-        
-        left_x = c.get_axis(0)
-        left_y = c.get_axis(1)
-        right_x = c.get_axis(2)
-        
-        if abs(left_x) < 0.15: left_x = 0
-        if abs(left_y) < 0.15: left_y = 0
-        if abs(right_x) < 0.15: right_x = 0
-        
-        player1_rotation -= right_x * 2
-        
-        if abs(left_x) > 0 or abs(left_y) > 0:
-            new_x = player1_pos[0] - math.sin(math.radians(player1_rotation)) * left_y * speed
-            new_z = player1_pos[2] - math.cos(math.radians(player1_rotation)) * left_y * speed
-            new_x += math.sin(math.radians(player1_rotation - 90)) * left_x * speed
-            new_z += math.cos(math.radians(player1_rotation - 90)) * left_x * speed
-            
-            collision = False
-            for obs in obstacles:
-                if abs(new_x - obs.x) < obs.width/2 + 0.5 and abs(new_z - obs.z) < obs.depth/2 + 0.5:
-                    collision = True
-                    break
-            
-            if not collision:
-                player1_pos[0] = max(-MAP_SIZE+1, min(MAP_SIZE-1, new_x))
-                player1_pos[2] = max(-MAP_SIZE+1, min(MAP_SIZE-1, new_z))
-            
-            p1_moving = True
-        
-        shoot = c.get_button(7)
-        if c.get_numaxes() > 5:
-            shoot = shoot or c.get_axis(5) > 0.5
-        
-        if shoot and not controller1_last_shoot:
-            shoot_player1()
-        controller1_last_shoot = shoot
-    
-    # Player 2 Controller
-    if len(controllers) >= 2 and player2_alive:
-        c = controllers[1]
-        speed = move_speed * 3
-        
-        left_x = c.get_axis(0)
-        left_y = c.get_axis(1)
-        right_x = c.get_axis(2)
-        
-        if abs(left_x) < 0.15: left_x = 0
-        if abs(left_y) < 0.15: left_y = 0
-        if abs(right_x) < 0.15: right_x = 0
-        
-        player2_rotation -= right_x * 2
-        
-        if abs(left_x) > 0 or abs(left_y) > 0:
-            new_x = player2_pos[0] - math.sin(math.radians(player2_rotation)) * left_y * speed
-            new_z = player2_pos[2] - math.cos(math.radians(player2_rotation)) * left_y * speed
-            new_x += math.sin(math.radians(player2_rotation - 90)) * left_x * speed
-            new_z += math.cos(math.radians(player2_rotation - 90)) * left_x * speed
-            
-            collision = False
-            for obs in obstacles:
-                if abs(new_x - obs.x) < obs.width/2 + 0.5 and abs(new_z - obs.z) < obs.depth/2 + 0.5:
-                    collision = True
-                    break
-            
-            if not collision:
-                player2_pos[0] = max(-MAP_SIZE+1, min(MAP_SIZE-1, new_x))
-                player2_pos[2] = max(-MAP_SIZE+1, min(MAP_SIZE-1, new_z))
-            
-            p2_moving = True
-        
-        shoot = c.get_button(0)
-        if c.get_numaxes() > 5:
-            shoot = shoot or c.get_axis(5) > 0.5
-        
-        if shoot and not controller2_last_shoot:
-            shoot_player2()
-        controller2_last_shoot = shoot
-    
-    return p1_moving, p2_moving
-
-def handle_player1_movement(keys, dt):
-    global player1_pos, player1_rotation
-    if not player1_alive:
-        return False
-    
-    speed = move_speed * dt
-    is_moving = False
-    
-    if keys[K_q]:
-        player1_rotation += 2
-    if keys[K_e]:
-        player1_rotation -= 2
-    
-    new_x, new_z = player1_pos[0], player1_pos[2]
-    
-    if keys[K_w]:
-        new_x += math.sin(math.radians(player1_rotation)) * speed
-        new_z += math.cos(math.radians(player1_rotation)) * speed
-        is_moving = True
-    if keys[K_s]:
-        new_x -= math.sin(math.radians(player1_rotation)) * speed
-        new_z -= math.cos(math.radians(player1_rotation)) * speed
-        is_moving = True
-    if keys[K_d]:
-        new_x += math.sin(math.radians(player1_rotation - 90)) * speed
-        new_z += math.cos(math.radians(player1_rotation - 90)) * speed
-        is_moving = True
-    if keys[K_a]:
-        new_x += math.sin(math.radians(player1_rotation + 90)) * speed
-        new_z += math.cos(math.radians(player1_rotation + 90)) * speed
-        is_moving = True
-    
-    collision = False
-    for obs in obstacles:
-        dx = new_x - obs.x
-        dz = new_z - obs.z
-        if (abs(dx) < obs.width / 2 + 0.5 and abs(dz) < obs.depth / 2 + 0.5):
-            collision = True
-            break
-    
-    if not collision:
-        player1_pos[0] = max(-MAP_SIZE + 1, min(MAP_SIZE - 1, new_x))
-        player1_pos[2] = max(-MAP_SIZE + 1, min(MAP_SIZE - 1, new_z))
-    
-    return is_moving
-
-def handle_player2_movement(keys, dt):
-    global player2_pos, player2_rotation
-    if not player2_alive:
-        return False
-    
-    speed = move_speed * dt
-    is_moving = False
-    
-    if keys[K_u]:
-        player2_rotation += 2
-    if keys[K_o]:
-        player2_rotation -= 2
-    
-    new_x, new_z = player2_pos[0], player2_pos[2]
-    
-    if keys[K_i]:
-        new_x += math.sin(math.radians(player2_rotation)) * speed
-        new_z += math.cos(math.radians(player2_rotation)) * speed
-        is_moving = True
-    if keys[K_k]:
-        new_x -= math.sin(math.radians(player2_rotation)) * speed
-        new_z -= math.cos(math.radians(player2_rotation)) * speed
-        is_moving = True
-    if keys[K_j]:
-        new_x += math.sin(math.radians(player2_rotation - 90)) * speed
-        new_z += math.cos(math.radians(player2_rotation - 90)) * speed
-        is_moving = True
-    if keys[K_l]:
-        new_x += math.sin(math.radians(player2_rotation + 90)) * speed
-        new_z += math.cos(math.radians(player2_rotation + 90)) * speed
-        is_moving = True
-    
-    collision = False
-    for obs in obstacles:
-        dx = new_x - obs.x
-        dz = new_z - obs.z
-        if (abs(dx) < obs.width / 2 + 0.5 and abs(dz) < obs.depth / 2 + 0.5):
-            collision = True
-            break
-    
-    if not collision:
-        player2_pos[0] = max(-MAP_SIZE + 1, min(MAP_SIZE - 1, new_x))
-        player2_pos[2] = max(-MAP_SIZE + 1, min(MAP_SIZE - 1, new_z))
-    
-    return is_moving
-
-def shoot_player1():
-    if player1_alive:
-        bullet = Bullet([player1_pos[0], player1_pos[1] + 1, player1_pos[2]], player1_rotation, 1)
-        bullets.append(bullet)
-
-def shoot_player2():
-    if player2_alive:
-        bullet = Bullet([player2_pos[0], player2_pos[1] + 1, player2_pos[2]], player2_rotation, 2)
-        bullets.append(bullet)
-
-def respawn_player(player_num):
-    global player1_pos, player1_health, player1_alive, player1_rotation
-    global player2_pos, player2_health, player2_alive, player2_rotation
-    
-    if player_num == 1:
-        player1_pos = [-SPAWN_DISTANCE, 0, 0]
-        player1_rotation = 0
-        player1_health = 100
-        player1_alive = True
-    else:
-        player2_pos = [SPAWN_DISTANCE, 0, 0]
-        player2_rotation = 180
-        player2_health = 100
-        player2_alive = True
-
-def draw_split_screen_hud():
-    glDisable(GL_LIGHTING)
-    glDisable(GL_DEPTH_TEST)
-    
-    glMatrixMode(GL_PROJECTION)
-    glPushMatrix()
-    glLoadIdentity()
-    glOrtho(0, 1920, 0, 1080, -1, 1)
-    glMatrixMode(GL_MODELVIEW)
-    glPushMatrix()
-    glLoadIdentity()
-    
+def draw_view(camera, player):
+    """A player's half of the screen, or the kill-cam while they wait to respawn"""
+    glViewport(*camera.viewport)
+    if killcam is not None and killcam.victim == player.number and not player.alive:
+        tick = min(killcam.start + view_world.tick - killcam.kill_tick, killcam.kill_tick)
+        if snapshots.try_restore(tick, killcam_world):
+            killer = killcam_world.players[killcam.killer - 1]
+            set_camera(camera, killer.pos, killer.rotation)
+            draw_scene(killcam_world)
+            return
+    set_camera(camera, player.pos, player.rotation)
+    draw_scene(view_world)
+
+# Keyboard layout per player: forward, back, right, left, turn left, turn right.
+# L strafes player 2 right, as D does for player 1, the sticks do and FPS.py does;
+# the old inline handling had J and L mirrored for player 2 only.
+PLAYER1_KEYS = (K_w, K_s, K_d, K_a, K_q, K_e)
+PLAYER2_KEYS = (K_i, K_k, K_l, K_j, K_u, K_o)
+
+def read_keyboard_input(keys, bindings):
+    forward, back, right, left, turn_left, turn_right = bindings
+    return PlayerInput(forward=keys[forward] - keys[back],
+                       strafe=keys[right] - keys[left],
+                       turn=keys[turn_left] - keys[turn_right])
+
+def read_controller_input(c):
+    """Stick input for one controller"""
+    left_x = c.get_axis(0)
+    left_y = c.get_axis(1)
+    right_x = c.get_axis(2)
+    
+    if abs(left_x) < 0.15: left_x = 0
+    if abs(left_y) < 0.15: left_y = 0
+    if abs(right_x) < 0.15: right_x = 0
+    
+    return PlayerInput(forward=-left_y, strafe=left_x, turn=-right_x, pad=True)
+
+# Per player: fire key and controller shoot button
+FIRE_KEYS = {K_SPACE: 1, K_SEMICOLON: 2}
+SHOOT_BUTTONS = (7, 0)
+TRIGGER_AXIS = 5
+trigger_down = [False, False]
+
+def trigger_player(event):
+    """Player whose trigger this queued event presses, or None.
+
+    Shots come from the event queue rather than from polled state: the queue
+    keeps every press, however short, and is read on the main thread, which
+    is the only one SDL lets pump events.
+    """
+    if event.type == KEYDOWN:
+        return FIRE_KEYS.get(event.key)
+    pad_players = min(len(controllers), 2)
+    if event.type == JOYBUTTONDOWN and event.joy < pad_players:
+        return event.joy + 1 if event.button == SHOOT_BUTTONS[event.joy] else None
+    if event.type == JOYAXISMOTION and event.axis == TRIGGER_AXIS and event.joy < pad_players:
+        # Analog trigger: a press is the value crossing half way
+        was_down = trigger_down[event.joy]
+        trigger_down[event.joy] = event.value > 0.5
+        return event.joy + 1 if trigger_down[event.joy] and not was_down else None
+    return None
+
+def poll_input():
+    """Held input for both players as of the last event pump. Shots come from trigger_player()."""
+    keys = pygame.key.get_pressed()
+    polled = []
+    for number, bindings in ((1, PLAYER1_KEYS), (2, PLAYER2_KEYS)):
+        if len(controllers) < number:
+            polled.append(read_keyboard_input(keys, bindings))
+        else:
+            polled.append(read_controller_input(controllers[number - 1]))
+    return polled
+
+def with_shots(held, shots):
+    """One tick of input: the held input plus a shot for every player that pressed the trigger"""
+    players = {event.player for event in shots if event.kind == "shoot"}
+    return [PlayerInput(h.forward, h.strafe, h.turn, shoot=number in players, pad=h.pad)
+            for number, h in enumerate(held, 1)]
+
+def draw_hud_static():
+    """Scoreboard panel, swatches, bar backgrounds, divider, crosshairs and minimap frames"""
     # SCOREBOARD
     glColor3f(0.1, 0.1, 0.1)
     glBegin(GL_QUADS)
@@ -885,7 +653,7 @@ def draw_split_screen_hud():
     glVertex2f(20, 1080 - 170)
     glEnd()
     
-    # Health bars
+    # Health bar backgrounds
     glColor3f(0.5, 0, 0)
     glBegin(GL_QUADS)
     glVertex2f(1920 - 310, 1080 - 40)
@@ -894,16 +662,6 @@ def draw_split_screen_hud():
     glVertex2f(1920 - 310, 1080 - 10)
     glEnd()
     
-    glColor3f(0, 1, 0)
-    health_width = (player1_health / 100.0) * 300
-    glBegin(GL_QUADS)
-    glVertex2f(1920 - 310, 1080 - 40)
-    glVertex2f(1920 - 310 + health_width, 1080 - 40)
-    glVertex2f(1920 - 310 + health_width, 1080 - 10)
-    glVertex2f(1920 - 310, 1080 - 10)
-    glEnd()
-    
-    glColor3f(0.5, 0, 0)
     glBegin(GL_QUADS)
     glVertex2f(1920 - 310, 40)
     glVertex2f(1920 - 10, 40)
@@ -911,15 +669,6 @@ def draw_split_screen_hud():
     glVertex2f(1920 - 310, 10)
     glEnd()
     
-    glColor3f(0, 1, 0)
-    health_width = (player2_health / 100.0) * 300
-    glBegin(GL_QUADS)
-    glVertex2f(1920 - 310, 40)
-    glVertex2f(1920 - 310 + health_width, 40)
-    glVertex2f(1920 - 310 + health_width, 10)
-    glVertex2f(1920 - 310, 10)
-    glEnd()
-    
     # Divider
     glColor3f(1, 1, 1)
     glLineWidth(3)
@@ -945,20 +694,45 @@ def draw_split_screen_hud():
     glVertex2f(960, 270 + 20)
     glEnd()
     
-    # Minimaps
-    draw_minimap(1920 - 210, 1080 - 260, 200, player1_pos, player1_rotation, player2_pos, 1)
-    draw_minimap(1920 - 210, 50, 200, player2_pos, player2_rotation, player1_pos, 2)
+    # Minimap frames
+    draw_minimap_frame(1920 - 210, 1080 - 260, 200)
+    draw_minimap_frame(1920 - 210, 50, 200)
+
+def draw_health_bar(y_bottom, y_top, health):
+    """Green part of a health bar"""
+    glColor3f(0, 1, 0)
+    health_width = (health / 100.0) * 300
+    glBegin(GL_QUADS)
+    glVertex2f(1920 - 310, y_bottom)
+    glVertex2f(1920 - 310 + health_width, y_bottom)
+    glVertex2f(1920 - 310 + health_width, y_top)
+    glVertex2f(1920 - 310, y_top)
+    glEnd()
+
+def create_split_screen_hud():
+    """Build the HUD: static geometry plus widgets bound to health, minimap state and scores"""
+    hud = Hud(1920, 1080)
+    hud.add_static(draw_hud_static)
     
-    glPopMatrix()
-    glMatrixMode(GL_PROJECTION)
-    glPopMatrix()
-    glMatrixMode(GL_MODELVIEW)
+    hud.add_widget(lambda: player1.health,
+                   lambda health: draw_health_bar(1080 - 40, 1080 - 10, health))
+    hud.add_widget(lambda: player2.health,
+                   lambda health: draw_health_bar(40, 10, health))
     
-    draw_text_2d(80, 1080 - 70, player1_score, score_font, (100, 150, 255))
-    draw_text_2d(80, 1080 - 220, player2_score, score_font, (255, 100, 100))
+    # Players move nearly every frame, so the minimaps are drawn every frame
+    # from the cached map contents plus immediate-mode markers
+    hud.add_dynamic(lambda: draw_minimap(1920 - 210, 1080 - 260, 200, player1, player2, 1))
+    hud.add_dynamic(lambda: draw_minimap(1920 - 210, 50, 200, player2, player1, 2))
     
-    glEnable(GL_DEPTH_TEST)
-    glEnable(GL_LIGHTING)
+    # Score text is rendered by pygame only when the score changes
+    hud.add_widget(lambda: player1.score,
+                   lambda score: draw_text_2d(80, 1080 - 70, score, score_font, (100, 150, 255)))
+    hud.add_widget(lambda: player2.score,
+                   lambda score: draw_text_2d(80, 1080 - 220, score, score_font, (255, 100, 100)))
+    return hud
+
+def draw_split_screen_hud():
+    split_screen_hud.draw()
 
 # Initialize
 glEnable(GL_DEPTH_TEST)
@@ -967,153 +741,186 @@ setup_lighting()
 
 create_cube_display_list()
 create_ground_display_list()
-
-# Add obstacles
-add_box_obstacle(0, 0, 4)
-add_pillar(-10, -10, 6, 1.5)
-add_pillar(10, 10, 6, 1.5)
-add_pillar(-10, 10, 6, 1.5)
-add_pillar(10, -10, 6, 1.5)
-
-add_wall(-20, -15, -10, -15, 3, 1)
-add_wall(10, 15, 20, 15, 3, 1)
-add_wall(-15, -20, -15, -10, 3, 1)
-add_wall(15, 10, 15, 20, 3, 1)
-
-add_box_obstacle(-15, 0, 3)
-add_box_obstacle(15, 0, 3)
-add_box_obstacle(0, -15, 3)
-add_box_obstacle(0, 15, 3)
-
-add_portal_pair(-40, 0, 40, 0)
-add_portal_pair(40, 0, -40, 0)   
+split_screen_hud = create_split_screen_hud()
 
 init_controllers()
 
 # Main loop
 running = True
 last_time = pygame.time.get_ticks()
-respawn_delay = 0
+capture = FrameCapture(1920, 1080, args.capture) if args.capture else None
+recorder = ReplayRecorder(args.record, world) if args.record else None
+REPLAY_SEEK_TICKS = 600
+
+# Kill-cam: the victim watches the last seconds before the kill from the
+# killer's view, played back out of a ring of world snapshots
+class KillCam:
+    def __init__(self, killer, victim, start, kill_tick):
+        self.killer = killer
+        self.victim = victim
+        self.start = start
+        self.kill_tick = kill_tick
+
+KILLCAM_TICKS = 120
+snapshots = SnapshotRing(world, capacity=KILLCAM_TICKS + RESPAWN_DELAY)
+killcam_world = PvPWorld(len(world.players))
+killcam = None
+
+def after_tick():
+    """Snapshot history and kill-cam bookkeeping, right after every world step"""
+    global killcam
+    snapshots.push(world)
+    for killer, victim in world.kills:
+        killcam = KillCam(killer, victim, max(snapshots.oldest(), world.tick - KILLCAM_TICKS), world.tick)
+
+metrics = None
+if args.metrics:
+    metrics = PvPMetrics(world)
+    serve(metrics.registry, args.metrics)
+
+def simulate(inputs, frame_ms):
+    if recorder:
+        recorder.record(frame_ms, inputs)
+    start = time.perf_counter()
+    world.step(inputs, frame_ms / 10.0)
+    if metrics:
+        metrics.tick(time.perf_counter() - start)
+    after_tick()
+
+# Events are only pumped by the render loop (SDL requires the window's
+# thread). Every frame it queues the held input and every trigger press from
+# the event queue, stamped with the pump time, so taps shorter than a frame
+# are not lost; every tick consumes the shots queued since the previous one.
+input_queue = None
+latency = LatencyRecorder(args.latency_sync,
+                          f"vsync={int(args.vsync)} cap={args.fps_cap} sync={args.latency_sync or 'none'} "
+                          f"threaded={int(threaded)}")
+if replay is None:
+    input_queue = InputQueue()
+    input_queue.set_held(poll_input(), time.perf_counter())
+
+bots = BotPlayers(world, numbers=[2]) if args.bot and replay is None else None
+
+def input_tick(frame_ms):
+    """Simulate one tick with the latest queued input"""
+    held, events = input_queue.take()
+    inputs = with_shots(held, events)
+    if bots is not None:
+        inputs = bots(world, inputs)
+    simulate(inputs, frame_ms)
+    latency.consumed(world.tick, events)
+    latency.simulated(world.tick)
+
+# Threaded mode: the simulation thread takes input straight from the queue
+# every tick and publishes the packed world for the next frame to draw
+TICK_MS = 17
+published = SnapshotBuffer()
+
+sim = None
+if threaded:
+    def sim_tick():
+        input_tick(TICK_MS)
+    sim = SimulationThread(sim_tick, world.pack_state, published)
+    sim.start()
+last_snapshot = None
+
+FRAME_BUDGET = 1.0 / (args.fps_cap or 60)
+allocations = AllocationTracker() if args.alloc_diag else None
+section = sections(allocations)
+frame_gc = None
+if args.gc_policy:
+    frame_gc = FrameGC()
+    frame_gc.after_load()
 
 while running:
+    frame_began = time.perf_counter()
     current_time = pygame.time.get_ticks()
-    dt = (current_time - last_time) / 10.0
+    frame_ms = current_time - last_time
     last_time = current_time
     
     walk_animation += 0.1
     portal_animation += 1
     
-    for event in pygame.event.get():
+    latency.frame_start()
+    with section("events"):
+        events = pygame.event.get()
+    pumped = time.perf_counter()
+    for event in events:
         if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
             running = False
+        # Stamped at the pump; the next tick to be simulated is the first that can see it
+        if input_queue is not None and event.type in (KEYDOWN, JOYBUTTONDOWN):
+            latency.stamp("event", event.joy + 1 if event.type == JOYBUTTONDOWN else 0, world.tick + 1, pumped)
+        if input_queue is not None:
+            shooter = trigger_player(event)
+            if shooter is not None:
+                input_queue.post(InputEvent(pumped, shooter, "shoot"))
         if event.type == KEYDOWN:
-            if event.key == K_SPACE:
-                shoot_player1()
-            if event.key == K_SEMICOLON:
-                shoot_player2()
-    
-    keys = pygame.key.get_pressed()
-    
-    controller1_moving, controller2_moving = handle_controller_input()
-    
-    if len(controllers) < 1:
-        player1_moving = handle_player1_movement(keys, dt)
-    else:
-        player1_moving = controller1_moving
-    
-    if len(controllers) < 2:
-        player2_moving = handle_player2_movement(keys, dt)
-    else:
-        player2_moving = controller2_moving
-    
-    # Check portal teleportation with cooldown
-    if portal_cooldown1 > 0:
-        portal_cooldown1 -= 1
-    if portal_cooldown2 > 0:
-        portal_cooldown2 -= 1
-
-    for portal in portals:
-        if player1_alive and portal.check_teleport(player1_pos) and portal_cooldown1 == 0:
-            player1_pos[0] = portal.dest_x
-            player1_pos[2] = portal.dest_z
-            portal_cooldown1 = 60  # 1 second cooldown at 60fps
-        if player2_alive and portal.check_teleport(player2_pos) and portal_cooldown2 == 0:
-            player2_pos[0] = portal.dest_x
-            player2_pos[2] = portal.dest_z
-            portal_cooldown2 = 60
-
-    
-    # Update bullets
-    bullets = [b for b in bullets if b.is_alive()]
-    for bullet in bullets:
-        bullet.update()
-    
-    # Collision detection
-    for bullet in bullets[:]:
-        for obs in obstacles:
-            if bullet.check_hit_obstacle(obs.to_dict()):
-                if bullet in bullets:
-                    bullets.remove(bullet)
-                break
+            if replay and event.key in (K_LEFT, K_RIGHT):
+                offset = REPLAY_SEEK_TICKS if event.key == K_RIGHT else -REPLAY_SEEK_TICKS
+                replay.seek(world.tick + offset)
+                snapshots.clear()
+                killcam = None
+    if input_queue is not None:
+        input_queue.set_held(poll_input(), pumped)
+    
+    with section("simulation"):
+        if replay:
+            replay.step()
+            after_tick()
+        else:
+            if sim is None:
+                input_tick(frame_ms)
+            else:
+                snapshot = published.latest()
+                if snapshot is not None and snapshot is not last_snapshot:
+                    view_world.unpack_from(snapshot)
+                    last_snapshot = snapshot
+                if sim.error is not None:
+                    raise sim.error
+    
+    with section("render"):
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         
-        if bullet not in bullets:
-            continue
+        # PLAYER 1 VIEW
+        draw_view(player1_camera, player1)
         
-        if bullet.owner == 2 and player1_alive:
-            if bullet.check_hit_player(player1_pos):
-                player1_health -= 34
-                if bullet in bullets:
-                    bullets.remove(bullet)
-                if player1_health <= 0:
-                    player1_alive = False
-                    player2_score += 1
-                    respawn_delay = 180
-                    
-        if bullet.owner == 1 and player2_alive:
-            if bullet.check_hit_player(player2_pos):
-                player2_health -= 34
-                if bullet in bullets:
-                    bullets.remove(bullet)
-                if player2_health <= 0:
-                    player2_alive = False
-                    player1_score += 1
-                    respawn_delay = 180
-    
-    if respawn_delay > 0:
-        respawn_delay -= 1
-        if respawn_delay == 0:
-            if not player1_alive:
-                respawn_player(1)
-            if not player2_alive:
-                respawn_player(2)
-    
-    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    
-    # PLAYER 1 VIEW
-    glViewport(0, 540, 1920, 540)
-    glMatrixMode(GL_PROJECTION)
-    glLoadIdentity()
-    gluPerspective(30, (1920/540), 0.1, 150.0)
-    glMatrixMode(GL_MODELVIEW)
-    glLoadIdentity()
-    set_camera(player1_pos, player1_rotation)
-    draw_scene(player1_moving, player2_moving)
-    
-    # PLAYER 2 VIEW
-    glViewport(0, 0, 1920, 540)
-    glMatrixMode(GL_PROJECTION)
-    glLoadIdentity()
-    gluPerspective(30, (1920/540), 0.1, 150.0)
-    glMatrixMode(GL_MODELVIEW)
-    glLoadIdentity()
-    set_camera(player2_pos, player2_rotation)
-    draw_scene(player1_moving, player2_moving)
-    
-    # HUD
-    glViewport(0, 0, 1920, 1080)
-    draw_split_screen_hud()
-    
-    pygame.display.flip()
-    clock.tick(60)
-
+        # PLAYER 2 VIEW
+        draw_view(player2_camera, player2)
+        
+        # HUD
+        glViewport(0, 0, 1920, 1080)
+        draw_split_screen_hud()
+    
+    with section("present"):
+        if capture is not None:
+            capture.capture()
+        pygame.display.flip()
+    latency.after_flip(view_world.tick)
+    if allocations is not None:
+        allocations.end_frame()
+    if frame_gc is not None:
+        frame_gc.idle(frame_began + FRAME_BUDGET)
+    clock.tick(args.fps_cap)
+
+if sim is not None:
+    sim.stop()
+    print(sim.report())
+if input_queue is not None:
+    print(input_queue.report())
+    print(latency.report())
+    for line in histogram(latency.latencies()):
+        print("  " + line)
+    if args.latency_csv:
+        latency.write_csv(args.latency_csv)
+if capture is not None:
+    capture.close()
+    print(capture.report())
+if frame_gc is not None:
+    print(frame_gc.report())
+if allocations is not None:
+    allocations.stop()
+    print(allocations.report())
+if recorder:
+    recorder.close()
 pygame.quit()
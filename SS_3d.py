@@ -2,7 +2,38 @@ import pygame
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
+from OpenGL.error import GLError
+import argparse
 import math
+import sys
+import time
+
+from allocations import AllocationTracker, sections
+from camera import Camera
+from capture import FrameCapture
+from gc_policy import FrameGC
+from ss_net import LockstepPeer, check_shot, valid_disc
+from ss_physics import (FIELD_LENGTH, FIELD_WIDTH, GOAL_WIDTH, MAX_POWER,
+                        Match, Pitch, shot_velocity)
+from ss_preview import TrajectoryPreview
+from sim_thread import InputMailbox, SimulationThread, SnapshotBuffer
+
+parser = argparse.ArgumentParser(description="Soccer Stars 3D")
+parser.add_argument("--continuous", action="store_true",
+                    help="redraw at 60 fps even when nothing on screen changes")
+parser.add_argument("--host", type=int, metavar="PORT",
+                    help="host a network game and play as player 1")
+parser.add_argument("--connect", metavar="HOST:PORT",
+                    help="join a network game and play as player 2")
+parser.add_argument("--threaded", action="store_true",
+                    help="run physics and networking on their own thread at a fixed 60 Hz")
+parser.add_argument("--capture", metavar="PATH",
+                    help="record every frame to a .y4m, .rgb or PNG directory")
+parser.add_argument("--gc-policy", action="store_true",
+                    help="freeze the loaded level and run the cyclic GC only in frame slack time")
+parser.add_argument("--alloc-diag", action="store_true",
+                    help="trace allocations per frame and subsystem (slow; prints a report at exit)")
+args = parser.parse_args()
 
 # Initialize Pygame
 pygame.init()
@@ -14,19 +45,13 @@ screen = pygame.display.set_mode((WIDTH, HEIGHT), DOUBLEBUF | OPENGL | FULLSCREE
 pygame.display.set_caption("Soccer Stars 3D")
 clock = pygame.time.Clock()
 
-# Field dimensions: 22:15 ratio (similar to 110m x 75m)
-FIELD_LENGTH = 11.0  # Half-length (22 units total)
-FIELD_WIDTH = 7.5    # Half-width (15 units total)
-
 # Setup orthographic top-down view with 22:15 ratio
-glMatrixMode(GL_PROJECTION)
-glLoadIdentity()
-glOrtho(-FIELD_LENGTH - 1, FIELD_LENGTH + 1, -FIELD_WIDTH - 1, FIELD_WIDTH + 1, -10, 10)
-glMatrixMode(GL_MODELVIEW)
-glLoadIdentity()
-gluLookAt(0, 10, 0,      # Camera above
-          0, 0, 0,        # Looking at center
-          0, 0, -1)       # Up vector
+field_camera = Camera((0, 0, WIDTH, HEIGHT))
+field_camera.set_ortho(-FIELD_LENGTH - 1, FIELD_LENGTH + 1, -FIELD_WIDTH - 1, FIELD_WIDTH + 1, -10, 10)
+field_camera.look_at((0, 10, 0),     # Camera above
+                     (0, 0, 0),      # Looking at center
+                     (0, 0, -1))     # Up vector
+field_camera.load()
 #glRotatef(90, 0, 1, 0)    # Rotate 90 degrees
 
 # Set background color
@@ -63,13 +88,7 @@ glLight(GL_LIGHT2, GL_SPECULAR, (0.3, 0.3, 0.3, 1))
 glMaterialfv(GL_FRONT_AND_BACK, GL_SPECULAR, (1, 1, 1, 1))
 glMaterialf(GL_FRONT_AND_BACK, GL_SHININESS, 50)
 
-# Physics constants
-FRICTION = 0.96
-BOUNCE = 0.8
-MIN_VELOCITY = 0.05
-
 # Scaled measurements (based on standard pitch proportions)
-GOAL_WIDTH = 2.4  # Goal width (scaled from 7.32m)
 PENALTY_AREA_WIDTH = 5.5  # Penalty area width (scaled from 40.3m)
 PENALTY_AREA_LENGTH = 5.5  # Penalty area length (scaled from 16.5m)
 GOAL_AREA_WIDTH = 3.0  # Goal area width (scaled from 18.32m)
@@ -77,122 +96,16 @@ GOAL_AREA_LENGTH = 1.8  # Goal area length (scaled from 5.5m)
 CENTER_CIRCLE_RADIUS = 3.0  # Center circle radius (scaled from 9.15m)
 CORNER_RADIUS = 0.3  # Corner arc radius
 
-class Disc3D:
-    def __init__(self, x, z, radius, color, is_ball=False):
-        self.x = x
-        self.y = 0.3 if is_ball else 0.4
-        self.z = z
-        self.radius = radius
-        self.vx = 0
-        self.vz = 0
-        self.color = color
-        self.is_ball = is_ball
-        self.mass = 2 if is_ball else 1
-        
-    def update(self):
-        self.vx *= FRICTION
-        self.vz *= FRICTION
-        
-        if abs(self.vx) < MIN_VELOCITY:
-            self.vx = 0
-        if abs(self.vz) < MIN_VELOCITY:
-            self.vz = 0
-            
-        self.x += self.vx
-        self.z += self.vz
-        
-        # Wall collisions (touchlines - sides)
-        if self.z - self.radius <= -FIELD_WIDTH:
-            self.z = -FIELD_WIDTH + self.radius
-            self.vz = -self.vz * BOUNCE
-        elif self.z + self.radius >= FIELD_WIDTH:
-            self.z = FIELD_WIDTH - self.radius
-            self.vz = -self.vz * BOUNCE
-            
-        # Goal lines (ends)
-        goal_left = -GOAL_WIDTH / 2
-        goal_right = GOAL_WIDTH / 2
-        
-        if self.x - self.radius <= -FIELD_LENGTH:
-            if self.is_ball and goal_left <= self.z <= goal_right:
-                return "player2_scores"
-            else:
-                self.x = -FIELD_LENGTH + self.radius
-                self.vx = -self.vx * BOUNCE
-                
-        elif self.x + self.radius >= FIELD_LENGTH:
-            if self.is_ball and goal_left <= self.z <= goal_right:
-                return "player1_scores"
-            else:
-                self.x = FIELD_LENGTH - self.radius
-                self.vx = -self.vx * BOUNCE
-        
-        return None
-        
-    def draw(self):
-        glPushMatrix()
-        glTranslatef(self.x, self.y, self.z)
-        glColor3f(*self.color)
-        
-        quadric = gluNewQuadric()
-        gluQuadricNormals(quadric, GLU_SMOOTH)
-        gluSphere(quadric, self.radius, 32, 32)
-        gluDeleteQuadric(quadric)
-        
-        glPopMatrix()
-    
-    def is_moving(self):
-        return abs(self.vx) > MIN_VELOCITY or abs(self.vz) > MIN_VELOCITY
-
-def check_collision(disc1, disc2):
-    dx = disc1.x - disc2.x
-    dz = disc1.z - disc2.z
-    distance = math.sqrt(dx * dx + dz * dz)
-    return distance <= (disc1.radius + disc2.radius)
+# One quadric for every disc, created with the GL context instead of per draw
+disc_quadric = gluNewQuadric()
+gluQuadricNormals(disc_quadric, GLU_SMOOTH)
 
-def resolve_collision(disc1, disc2):
-    dx = disc1.x - disc2.x
-    dz = disc1.z - disc2.z
-    distance = math.sqrt(dx * dx + dz * dz)
-    
-    if distance == 0:
-        distance = 0.1
-        dx = 0.1
-    
-    overlap = (disc1.radius + disc2.radius) - distance
-    if overlap > 0:
-        nx = dx / distance
-        nz = dz / distance
-        
-        separation = overlap / 2
-        disc1.x += nx * separation
-        disc1.z += nz * separation
-        disc2.x -= nx * separation
-        disc2.z -= nz * separation
-    
-    collision_angle = math.atan2(dz, dx)
-    
-    v1 = math.sqrt(disc1.vx**2 + disc1.vz**2)
-    v2 = math.sqrt(disc2.vx**2 + disc2.vz**2)
-    
-    angle1 = math.atan2(disc1.vz, disc1.vx) if v1 > 0 else 0
-    angle2 = math.atan2(disc2.vz, disc2.vx) if v2 > 0 else 0
-    
-    m1 = disc1.mass
-    m2 = disc2.mass
-    
-    v1x = v1 * math.cos(angle1 - collision_angle)
-    v1z = v1 * math.sin(angle1 - collision_angle)
-    v2x = v2 * math.cos(angle2 - collision_angle)
-    v2z = v2 * math.sin(angle2 - collision_angle)
-    
-    final_v1x = ((m1 - m2) * v1x + 2 * m2 * v2x) / (m1 + m2)
-    final_v2x = ((m2 - m1) * v2x + 2 * m1 * v1x) / (m1 + m2)
-    
-    disc1.vx = final_v1x * math.cos(collision_angle) - v1z * math.sin(collision_angle)
-    disc1.vz = final_v1x * math.sin(collision_angle) + v1z * math.cos(collision_angle)
-    disc2.vx = final_v2x * math.cos(collision_angle) - v2z * math.sin(collision_angle)
-    disc2.vz = final_v2x * math.sin(collision_angle) + v2z * math.cos(collision_angle)
+def draw_disc(disc):
+    glPushMatrix()
+    glTranslatef(disc.x, disc.y, disc.z)
+    glColor3f(*disc.color)
+    gluSphere(disc_quadric, disc.radius, 32, 32)
+    glPopMatrix()
 
 def draw_arrow(x1, z1, x2, z2, color):
     glDisable(GL_LIGHTING)
@@ -226,6 +139,23 @@ def draw_arrow(x1, z1, x2, z2, color):
     
     glEnable(GL_LIGHTING)
 
+def draw_trajectory(paths, selected_index):
+    """Predicted paths: the flicked disc in white, discs it hits in yellow"""
+    glDisable(GL_LIGHTING)
+    glLineWidth(3)
+    for index, path in paths.items():
+        if len(path) < 2:
+            continue
+        if index == selected_index:
+            glColor4f(1, 1, 1, 0.7)
+        else:
+            glColor4f(1, 1, 0.3, 0.7)
+        glBegin(GL_LINE_STRIP)
+        for x, z in path:
+            glVertex3f(x, 0.45, z)
+        glEnd()
+    glEnable(GL_LIGHTING)
+
 def draw_power_meter(x, y, power, max_power):
     glDisable(GL_DEPTH_TEST)
     glDisable(GL_LIGHTING)
@@ -386,88 +316,252 @@ def draw_field():
     glVertex3f(-FIELD_LENGTH - 0.5, 0, -GOAL_WIDTH / 2)
     glEnd()
 
+class FieldCache:
+    """Pitch rendered once into color+depth textures and blitted back every frame.
+    
+    The camera is fixed, so the pitch never changes on screen. Falls back to a
+    display list when framebuffer objects are not available.
+    """
+    def __init__(self, width, height, draw):
+        self.width = width
+        self.height = height
+        self.fbo = None
+        self.color_tex = None
+        self.depth_tex = None
+        self.display_list = None
+        self.blit_depth = True
+        
+        if bool(glGenFramebuffers) and bool(glBlitFramebuffer):
+            try:
+                self.create_framebuffer(draw)
+            except GLError:
+                self.release()
+        
+        if self.fbo is None:
+            self.display_list = glGenLists(1)
+            glNewList(self.display_list, GL_COMPILE)
+            draw()
+            glEndList()
+    
+    def create_framebuffer(self, draw):
+        self.color_tex = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.color_tex)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, self.width, self.height, 0,
+                     GL_RGBA, GL_UNSIGNED_BYTE, None)
+        
+        # Same layout as the usual default framebuffer so depth can be blitted
+        self.depth_tex = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.depth_tex)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_DEPTH24_STENCIL8, self.width, self.height, 0,
+                     GL_DEPTH_STENCIL, GL_UNSIGNED_INT_24_8, None)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.color_tex, 0)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_TEXTURE_2D, self.depth_tex, 0)
+        
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            glBindFramebuffer(GL_FRAMEBUFFER, 0)
+            raise GLError(err=0, description=b"incomplete field cache framebuffer")
+        
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        draw()
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+    
+    def release(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if self.fbo is not None:
+            glDeleteFramebuffers(1, [self.fbo])
+        for tex in (self.color_tex, self.depth_tex):
+            if tex is not None:
+                glDeleteTextures([tex])
+        self.fbo = self.color_tex = self.depth_tex = None
+    
+    def draw(self):
+        """Replaces glClear + draw_field()"""
+        if self.fbo is None:
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            glCallList(self.display_list)
+            return
+        
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+        w, h = self.width, self.height
+        if self.blit_depth:
+            try:
+                glBlitFramebuffer(0, 0, w, h, 0, 0, w, h,
+                                  GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT, GL_NEAREST)
+            except GLError:
+                # Window depth format differs from the cache, copy color only
+                self.blit_depth = False
+        if not self.blit_depth:
+            glClear(GL_DEPTH_BUFFER_BIT)
+            glBlitFramebuffer(0, 0, w, h, 0, 0, w, h, GL_COLOR_BUFFER_BIT, GL_NEAREST)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+# The HUD font is loaded once and rendered strings are kept until the HUD
+# changes, so redraws do not rasterize text or allocate surfaces
+hud_font = pygame.font.Font(None, 72)
+text_cache = {}
+TEXT_CACHE_SIZE = 32
+
 def draw_text(x, y, text, color=(255, 255, 255)):
-    font = pygame.font.Font(None, 72)
-    text_surface = font.render(text, True, color).convert_alpha()
-    text_data = pygame.image.tostring(text_surface, "RGBA", True)
+    key = (text, color)
+    cached = text_cache.get(key)
+    if cached is None:
+        if len(text_cache) >= TEXT_CACHE_SIZE:
+            text_cache.clear()
+        text_surface = hud_font.render(text, True, color).convert_alpha()
+        cached = (text_surface.get_width(), text_surface.get_height(),
+                  pygame.image.tostring(text_surface, "RGBA", True))
+        text_cache[key] = cached
+    width, height, text_data = cached
     
     glWindowPos2d(int(x), int(y))
-    glDrawPixels(text_surface.get_width(), text_surface.get_height(), 
-                 GL_RGBA, GL_UNSIGNED_BYTE, text_data)
+    glDrawPixels(width, height, GL_RGBA, GL_UNSIGNED_BYTE, text_data)
 
 # Initialize game objects
-ball = Disc3D(0, 0, 0.35, (1, 0.84, 0), is_ball=True)
-
-player1_discs = [
-    Disc3D(6, -2, 0.45, (0.12, 0.56, 1)),
-    Disc3D(6, 0, 0.45, (0.12, 0.56, 1)),
-    Disc3D(6, 2, 0.45, (0.12, 0.56, 1)),
-]
-
-player2_discs = [
-    Disc3D(-6, -2, 0.45, (0.86, 0.08, 0.24)),
-    Disc3D(-6, 0, 0.45, (0.86, 0.08, 0.24)),
-    Disc3D(-6, 2, 0.45, (0.86, 0.08, 0.24)),
-]
+pitch = Pitch()
+match = Match(pitch)
+# With --threaded the simulation thread owns `match`; the renderer and input
+# handling read `view`, a copy restored from the snapshots it publishes
+view = Match(Pitch()) if args.threaded else match
+all_discs = view.pitch.all_discs
 
-all_discs = player1_discs + player2_discs + [ball]
-
-current_player = 1
 selected_disc = None
 aiming = False
 aim_start = None
-MAX_POWER = 2.5
-MIN_DRAG = 0.5
-
-score_p1 = 0
-score_p2 = 0
-turn_taken = False
-
-def reset_positions():
-    ball.x, ball.z = 0, 0
-    ball.vx, ball.vz = 0, 0
-    
-    positions_p1 = [(6, -2), (6, 0), (6, 2)]
-    positions_p2 = [(-6, -2), (-6, 0), (-6, 2)]
-    
-    for i, disc in enumerate(player1_discs):
-        disc.x, disc.z = positions_p1[i]
-        disc.vx, disc.vz = 0, 0
-    
-    for i, disc in enumerate(player2_discs):
-        disc.x, disc.z = positions_p2[i]
-        disc.vx, disc.vz = 0, 0
+trajectory_preview = TrajectoryPreview()
+
+# Network play: only shots are exchanged, both sides simulate them
+peer = None
+desync = False
+if args.host is not None:
+    peer = LockstepPeer()
+    peer.host(args.host)
+    print(f"Waiting for player 2 on port {args.host}...")
+elif args.connect:
+    address, port = args.connect.rsplit(":", 1)
+    peer = LockstepPeer()
+    peer.connect(address, int(port))
+
+def wait_for_peer(peer):
+    """Block until the other player is connected; False if the user quit or connecting failed"""
+    while not peer.wait_connected(0.1):
+        for event in pygame.event.get():
+            if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+                return False
+        if peer.error is not None:
+            if peer.local_player != 1:
+                print(f"Could not connect: {peer.error}")
+                return False
+            # Whoever failed the handshake is gone; keep listening for player 2
+            print(f"Handshake failed ({peer.error}), still waiting for player 2...")
+            peer.error = None
+    return True
+
+if peer is not None and not wait_for_peer(peer):
+    peer.close()
+    pygame.quit()
+    sys.exit()
+
+def is_local_turn(state):
+    return peer is None or state.current_player == peer.local_player
 
 def all_stopped():
-    return all(not disc.is_moving() for disc in all_discs)
+    return view.pitch.all_stopped()
+
+# Shots are posted here by the input code and applied by simulate(), which
+# runs inline or on the simulation thread
+mailbox = InputMailbox()
+published = SnapshotBuffer()
+
+def simulate():
+    """Apply queued local shots and network input, then one physics frame. Returns the goal result."""
+    global desync
+    for turn, disc_index, vx, vz in mailbox.take_events():
+        # Ignore clicks made on a view of the board that is already out of date
+        if turn != match.turn or match.turn_taken or not is_local_turn(match):
+            continue
+        if peer is not None:
+            vx, vz = peer.send_shot(match.turn, disc_index, vx, vz, match.state_hash())
+        match.shoot(disc_index, vx, vz)
+    
+    if peer is not None and not desync and not match.turn_taken and not is_local_turn(match):
+        shot = peer.poll_shot()
+        if shot is not None:
+            if not valid_disc(match, shot):
+                # Corrupt or hostile peer: nothing it sends can be trusted any more
+                desync = True
+                peer.disconnect(ConnectionError("shot for disc %d, which does not exist" % shot.disc_index))
+            else:
+                if not check_shot(match, shot):
+                    desync = True
+                match.shoot(shot.disc_index, shot.vx, shot.vz)
+    
+    return match.update()
 
 def screen_to_field(screen_x, screen_y):
-    modelview = glGetDoublev(GL_MODELVIEW_MATRIX)
-    projection = glGetDoublev(GL_PROJECTION_MATRIX)
-    viewport = glGetIntegerv(GL_VIEWPORT)
-    
-    win_x = float(screen_x)
-    win_y = float(viewport[3] - screen_y)
-    
-    pos = gluUnProject(win_x, win_y, 0.5, modelview, projection, viewport)
-    return pos[0], pos[2]
+    # CPU-side unprojection, no matrix readback from the driver
+    return field_camera.pick_plane(screen_x, screen_y, HEIGHT)
+
+# Event-driven rendering: only present a frame when something on screen changed.
+# Pass --continuous to redraw at a fixed 60 fps instead; capturing always does.
+EVENT_DRIVEN = not args.continuous and not args.capture
+IDLE_WAIT_MS = 250 if peer is None and not args.threaded else 50
+EXPOSE_EVENTS = (VIDEOEXPOSE, getattr(pygame, "WINDOWEXPOSED", VIDEOEXPOSE))
+
+field_cache = FieldCache(WIDTH, HEIGHT, draw_field)
+capture = FrameCapture(WIDTH, HEIGHT, args.capture) if args.capture else None
+needs_redraw = True
+last_hud_state = None
+last_aim_pos = None
+
+sim = None
+if args.threaded:
+    sim = SimulationThread(simulate, match.snapshot, published)
+    sim.start()
+last_snapshot = None
 
 running = True
 
+FRAME_BUDGET = 1.0 / 60
+allocations = AllocationTracker() if args.alloc_diag else None
+section = sections(allocations)
+frame_gc = None
+if args.gc_policy:
+    frame_gc = FrameGC()
+    frame_gc.after_load()
+
 while running:
-    for event in pygame.event.get():
+    if EVENT_DRIVEN and not needs_redraw and all_stopped() and not trajectory_preview.pending:
+        # Nothing is moving: sleep until input arrives instead of spinning
+        events = [pygame.event.wait(IDLE_WAIT_MS)] + pygame.event.get()
+    else:
+        events = pygame.event.get()
+    frame_began = time.perf_counter()
+    
+    for event in events:
         if event.type == QUIT:
             running = False
         
+        if event.type in EXPOSE_EVENTS or event.type in (MOUSEBUTTONDOWN, MOUSEBUTTONUP):
+            needs_redraw = True
+        
         if event.type == KEYDOWN:
             if event.key == K_ESCAPE:
                 running = False
         
-        if event.type == MOUSEBUTTONDOWN and all_stopped() and not turn_taken:
+        if event.type == MOUSEBUTTONDOWN and all_stopped() and not view.turn_taken and is_local_turn(view):
             mouse_x, mouse_y = event.pos
             field_x, field_z = screen_to_field(mouse_x, mouse_y)
             
-            current_discs = player1_discs if current_player == 1 else player2_discs
+            current_discs = view.discs_for(view.current_player)
             for disc in current_discs:
                 dx = field_x - disc.x
                 dz = field_z - disc.z
@@ -475,114 +569,157 @@ while running:
                     selected_disc = disc
                     aiming = True
                     aim_start = (field_x, field_z)
+                    trajectory_preview.begin(view.pitch, disc)
                     break
                     
         if event.type == MOUSEBUTTONUP and aiming and selected_disc:
             mouse_x, mouse_y = event.pos
             field_x, field_z = screen_to_field(mouse_x, mouse_y)
             
-            dx = aim_start[0] - field_x
-            dz = aim_start[1] - field_z
-            distance = math.sqrt(dx*dx + dz*dz)
-            
-            if distance > MIN_DRAG:
-                power = min(distance * 0.8, MAX_POWER)
-                selected_disc.vx = (dx / distance) * power
-                selected_disc.vz = (dz / distance) * power
-                turn_taken = True
+            velocity = shot_velocity(aim_start[0] - field_x, aim_start[1] - field_z)
+            if velocity:
+                disc_index = view.discs_for(view.current_player).index(selected_disc)
+                mailbox.post((view.turn, disc_index) + velocity)
             
             aiming = False
             selected_disc = None
             aim_start = None
+            trajectory_preview.end()
+    
+    with section("simulation"):
+        if sim is None:
+            goal_scored = simulate()
+        else:
+            goal_scored = None
+            snapshot = published.latest()
+            if snapshot is not None and snapshot != last_snapshot:
+                view.load_snapshot(snapshot)
+                needs_redraw = True
+            last_snapshot = snapshot
+            if sim.error is not None:
+                raise sim.error
+    
+    stopped = all_stopped()
+    hud_state = (view.score_p1, view.score_p2, view.current_player, view.turn_taken,
+                 stopped, desync, peer is not None and peer.error is not None)
+    if not stopped or goal_scored or hud_state != last_hud_state:
+        needs_redraw = True
+    last_hud_state = hud_state
     
-    goal_scored = None
-    for disc in all_discs:
-        result = disc.update()
-        if result:
-            goal_scored = result
-    
-    for i in range(len(all_discs)):
-        for j in range(i + 1, len(all_discs)):
-            if check_collision(all_discs[i], all_discs[j]):
-                resolve_collision(all_discs[i], all_discs[j])
-    
-    if goal_scored:
-        if goal_scored == "player1_scores":
-            score_p1 += 1
-        elif goal_scored == "player2_scores":
-            score_p2 += 1
-        reset_positions()
-        turn_taken = False
-    
-    if all_stopped() and turn_taken and not aiming:
-        current_player = 2 if current_player == 1 else 1
-        turn_taken = False
-    
-    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    
-    draw_field()
-    
-    current_power = 0
-    if aiming and aim_start and selected_disc:
-        mouse_x, mouse_y = pygame.mouse.get_pos()
-        field_x, field_z = screen_to_field(mouse_x, mouse_y)
-        
-        dx = aim_start[0] - field_x
-        dz = aim_start[1] - field_z
-        distance = math.sqrt(dx*dx + dz*dz)
+    if aiming:
+        aim_pos = pygame.mouse.get_pos()
+        if aim_pos != last_aim_pos or trajectory_preview.pending:
+            needs_redraw = True
+        last_aim_pos = aim_pos
+    
+    if EVENT_DRIVEN and not needs_redraw:
+        # Idle frames are the GC's best chance, so collect before going back to sleep
+        if allocations is not None:
+            allocations.end_frame()
+        if frame_gc is not None:
+            frame_gc.idle(frame_began + FRAME_BUDGET)
+        continue
+    
+    with section("render"):
+        field_cache.draw()
         
-        if distance > 0.1:
-            current_power = min(distance * 0.8, MAX_POWER)
-            arrow_length = min(distance * 2, 5)
-            end_x = selected_disc.x + (dx / distance) * arrow_length
-            end_z = selected_disc.z + (dz / distance) * arrow_length
+        current_power = 0
+        if aiming and aim_start and selected_disc:
+            mouse_x, mouse_y = pygame.mouse.get_pos()
+            field_x, field_z = screen_to_field(mouse_x, mouse_y)
             
-            draw_arrow(selected_disc.x, selected_disc.z, end_x, end_z, (1, 0.2, 0.2))
-    
-    for disc in all_discs:
-        disc.draw()
-    
-    glMatrixMode(GL_PROJECTION)
-    glPushMatrix()
-    glLoadIdentity()
-    glOrtho(0, WIDTH, 0, HEIGHT, -1, 1)
-    glMatrixMode(GL_MODELVIEW)
-    glPushMatrix()
-    glLoadIdentity()
-    
-    glDisable(GL_DEPTH_TEST)
-    glDisable(GL_LIGHTING)
-    
-    if aiming:
-        draw_power_meter(WIDTH // 2 - 150, HEIGHT - 100, current_power, MAX_POWER)
-    
-    glEnable(GL_DEPTH_TEST)
-    glEnable(GL_LIGHTING)
-    
-    glPopMatrix()
-    glMatrixMode(GL_PROJECTION)
-    glPopMatrix()
-    glMatrixMode(GL_MODELVIEW)
-    
-    glDisable(GL_DEPTH_TEST)
-    glDisable(GL_LIGHTING)
-    
-    draw_text(20, HEIGHT - 80, f"Player 1: {score_p1}", (30, 144, 255))
-    draw_text(20, HEIGHT - 150, f"Player 2: {score_p2}", (220, 20, 60))
-    
-    turn_color = (30, 144, 255) if current_player == 1 else (220, 20, 60)
-    status = "WAIT..." if turn_taken else "YOUR TURN"
-    draw_text(WIDTH - 550, HEIGHT - 80, f"Player {current_player}: {status}", turn_color)
-    
-    draw_text(20, 40, "Press ESC to exit", (255, 255, 255))
-    
-    if not all_stopped():
-        draw_text(WIDTH // 2 - 200, HEIGHT // 2, "Wait for discs to stop...", (255, 255, 100))
-    
-    glEnable(GL_DEPTH_TEST)
-    glEnable(GL_LIGHTING)
-    
-    pygame.display.flip()
+            dx = aim_start[0] - field_x
+            dz = aim_start[1] - field_z
+            distance = math.sqrt(dx*dx + dz*dz)
+            
+            if distance > 0.1:
+                current_power = min(distance * 0.8, MAX_POWER)
+                arrow_length = min(distance * 2, 5)
+                end_x = selected_disc.x + (dx / distance) * arrow_length
+                end_z = selected_disc.z + (dz / distance) * arrow_length
+                
+                velocity = shot_velocity(dx, dz)
+                if velocity:
+                    paths = trajectory_preview.update(*velocity)
+                    draw_trajectory(paths, trajectory_preview.disc_index)
+                
+                draw_arrow(selected_disc.x, selected_disc.z, end_x, end_z, (1, 0.2, 0.2))
+        
+        for disc in all_discs:
+            draw_disc(disc)
+        
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glOrtho(0, WIDTH, 0, HEIGHT, -1, 1)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+        
+        glDisable(GL_DEPTH_TEST)
+        glDisable(GL_LIGHTING)
+        
+        if aiming:
+            draw_power_meter(WIDTH // 2 - 150, HEIGHT - 100, current_power, MAX_POWER)
+        
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_LIGHTING)
+        
+        glPopMatrix()
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        
+        glDisable(GL_DEPTH_TEST)
+        glDisable(GL_LIGHTING)
+        
+        draw_text(20, HEIGHT - 80, f"Player 1: {view.score_p1}", (30, 144, 255))
+        draw_text(20, HEIGHT - 150, f"Player 2: {view.score_p2}", (220, 20, 60))
+        
+        turn_color = (30, 144, 255) if view.current_player == 1 else (220, 20, 60)
+        if view.turn_taken:
+            status = "WAIT..."
+        elif is_local_turn(view):
+            status = "YOUR TURN"
+        else:
+            status = "OPPONENT..."
+        draw_text(WIDTH - 550, HEIGHT - 80, f"Player {view.current_player}: {status}", turn_color)
+        
+        if desync:
+            draw_text(WIDTH // 2 - 150, HEIGHT - 80, "DESYNC", (255, 60, 60))
+        elif peer is not None and peer.error is not None:
+            draw_text(WIDTH // 2 - 250, HEIGHT - 80, "Opponent left", (255, 60, 60))
+        
+        draw_text(20, 40, "Press ESC to exit", (255, 255, 255))
+        
+        if not all_stopped():
+            draw_text(WIDTH // 2 - 200, HEIGHT // 2, "Wait for discs to stop...", (255, 255, 100))
+        
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_LIGHTING)
+    
+    with section("present"):
+        if capture is not None:
+            capture.capture()
+        pygame.display.flip()
+    needs_redraw = False
+    if allocations is not None:
+        allocations.end_frame()
+    if frame_gc is not None:
+        frame_gc.idle(frame_began + FRAME_BUDGET)
     clock.tick(60)
 
+if sim is not None:
+    sim.stop()
+    print(sim.report())
+if peer is not None:
+    peer.close()
+if capture is not None:
+    capture.close()
+    print(capture.report())
+if frame_gc is not None:
+    print(frame_gc.report())
+if allocations is not None:
+    allocations.stop()
+    print(allocations.report())
 pygame.quit()
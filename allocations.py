@@ -0,0 +1,182 @@
+import argparse
+import os
+import sys
+import tracemalloc
+
+# Diagnostics only: tracemalloc hooks every allocation and slows the game
+# down several times, so this is behind --alloc-diag and never on by default.
+
+class Section:
+    """One subsystem's slice of the frame.
+
+    Bracket it with begin()/end() or use it as a context manager. Every
+    frame records the traced memory high-water mark above where the section
+    started (how much it churned through, even if it freed it all again)
+    and the net change in allocated blocks (what it kept). On the tracker's
+    sampled frames it also diffs tracemalloc snapshots taken at begin and
+    end, counting the blocks each source line allocated in the section.
+    A block allocated and freed inside the section shows in the churn only.
+    """
+    def __init__(self, name, tracker):
+        self.name = name
+        self.tracker = tracker
+        self.churn = []
+        self.blocks = []
+        self.counts = []
+        self.lines = []
+        self.before = None
+        self.start_bytes = 0
+        self.start_blocks = 0
+
+    def begin(self):
+        # Snapshot first so its own memory is not counted as the section's churn
+        if self.tracker.sampling():
+            self.before = self.tracker.take_snapshot()
+        self.start_blocks = sys.getallocatedblocks()
+        self.start_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def end(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        self.churn.append(peak - self.start_bytes)
+        self.blocks.append(sys.getallocatedblocks() - self.start_blocks)
+        if self.before is not None:
+            diff = self.tracker.take_snapshot().compare_to(self.before, "lineno")
+            allocated = [stat for stat in diff if stat.count_diff > 0]
+            allocated.sort(key=lambda stat: stat.count_diff, reverse=True)
+            self.counts.append(sum(stat.count_diff for stat in allocated))
+            self.lines = allocated[:self.tracker.top]
+            self.before = None
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, *exc):
+        self.end()
+        return False
+
+class AllocationTracker:
+    """Per-frame, per-subsystem allocation numbers from tracemalloc.
+
+    Wrap each subsystem in `with tracker.section("render"):` (or its
+    begin()/end()) and call end_frame() once per frame. Every sample_every
+    frames the sections count their allocations from tracemalloc snapshots
+    of the game's own source files, and a whole-frame snapshot is compared
+    with the previous sample to find the lines whose live blocks grew.
+    """
+    def __init__(self, sample_every=300, top=10):
+        self.sample_every = sample_every
+        self.top = top
+        self.sections = {}
+        self.frames = 0
+        self.growth = []
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.filters = [tracemalloc.Filter(True, os.path.join(here, "*")),
+                        tracemalloc.Filter(False, __file__)]
+        tracemalloc.start()
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(self.filters)
+
+    def section(self, name):
+        section = self.sections.get(name)
+        if section is None:
+            self.sections[name] = section = Section(name, self)
+        return section
+
+    def sampling(self):
+        """True during the frames whose sections count allocations"""
+        return self.frames % self.sample_every == 0
+
+    def end_frame(self):
+        self.frames += 1
+        if self.frames % self.sample_every:
+            return
+        snapshot = self.take_snapshot()
+        diff = snapshot.compare_to(self.snapshot, "lineno")
+        diff.sort(key=lambda stat: stat.count_diff, reverse=True)
+        self.growth.append((self.frames, [stat for stat in diff[:self.top] if stat.count_diff > 0]))
+        self.snapshot = snapshot
+
+    def sampled_frames(self):
+        return (self.frames + self.sample_every - 1) // self.sample_every
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def report(self):
+        lines = [f"allocations over {self.frames} frames:",
+                 f"  {'section':12} {'allocs/frame':>12} {'churn KiB/frame':>15} {'max KiB':>8} "
+                 f"{'net blocks/frame':>16}"]
+        for name, section in self.sections.items():
+            if not section.churn:
+                continue
+            count = len(section.churn)
+            allocs = sum(section.counts) / len(section.counts) if section.counts else 0
+            lines.append(f"  {name:12} {allocs:12.1f} {sum(section.churn) / count / 1024:15.1f} "
+                         f"{max(section.churn) / 1024:8.1f} {sum(section.blocks) / count:16.1f}")
+        lines.append(f"  (allocs/frame averaged over {self.sampled_frames()} sampled frames)")
+        for name, section in self.sections.items():
+            if not section.lines:
+                continue
+            lines.append(f"  most allocating lines in {name}, last sampled frame:")
+            for stat in section.lines:
+                where = stat.traceback[0]
+                lines.append(f"    {where.filename}:{where.lineno}  {stat.count_diff} blocks, "
+                             f"{stat.size_diff / 1024:+.1f} KiB")
+        for frame, stats in self.growth[-1:]:
+            lines.append(f"  most grown lines, {self.sample_every} frames up to frame {frame}:")
+            for stat in stats:
+                where = stat.traceback[0]
+                lines.append(f"    {where.filename}:{where.lineno}  +{stat.count_diff} blocks, "
+                             f"{stat.size_diff / 1024:+.1f} KiB")
+        return "\n".join(lines)
+
+class NullSection:
+    """Stand-in section that does nothing when diagnostics are off"""
+    def begin(self):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NO_SECTION = NullSection()
+
+def sections(tracker):
+    """tracker.section, or a stand-in that does nothing when diagnostics are off"""
+    if tracker is None:
+        return lambda name: NO_SECTION
+    return tracker.section
+
+def benchmark(frames=600, players=8):
+    """Allocation profile of the headless PvP tick, split into step and packing"""
+    from pvp_server import RandomInput
+    from pvp_world import PvPWorld
+    world = PvPWorld(players)
+    inputs = RandomInput(players, 1)
+    tracker = AllocationTracker(sample_every=frames // 2)
+    for _ in range(frames):
+        with tracker.section("input"):
+            frame_inputs = inputs(world)
+        with tracker.section("step"):
+            world.step(frame_inputs)
+        with tracker.section("pack"):
+            world.pack_state()
+        tracker.end_frame()
+    tracker.stop()
+    print(tracker.report())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-frame allocation profile of the PvP simulation")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--players", type=int, default=8)
+    args = parser.parse_args()
+    benchmark(args.frames, args.players)
@@ -0,0 +1,325 @@
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import timeit
+
+from fps_world import Bullet as FPSBullet, Enemy, FPSWorld, check_collision_sphere_box
+from pvp_world import Bullet, Player, PlayerInput, PvPWorld
+from ss_physics import BALL_RADIUS, DISC_RADIUS, Disc3D, resolve_collision
+
+# Micro-benchmarks of the simulation kernels of all three games, headless.
+#
+# Each kernel is set up for a range of entity counts and timed with timeit:
+# the loop count is calibrated so one repeat takes at least min_time, and the
+# fastest repeat is kept, since noise on a shared machine only ever adds
+# time. Results are in nanoseconds per entity so counts compare directly.
+#
+# Clock speed on shared and laptop machines drifts by tens of percent between
+# runs, so every repeat also times a fixed pure-Python reference loop right
+# after the kernel. Baselines are compared on kernel time relative to that
+# reference, which cancels most of the drift; raw nanoseconds are reported
+# alongside. A kernel over the threshold is measured again (--retries) and
+# only counts as a regression if it stays over, since a single stall can
+# still slow one kernel alone.
+#
+# Even relative times of the smallest kernels vary by up to half between
+# whole runs, so a baseline should keep each kernel's median of several runs
+# (--runs), along with the spread between them: a kernel is only flagged
+# once it is slower than both the threshold and its own spread allow.
+# tests/test_bench.py runs the same kernels under pytest-benchmark
+# and checks them against the committed baseline.
+#
+#   python bench.py --runs 5 --save tests/benchmarks/baseline.json
+#                                              record the baseline
+#   python bench.py --compare tests/benchmarks/baseline.json
+#                                              exit 1 if any kernel is more
+#                                              than --threshold slower
+
+SWEEP = (1, 16, 256)
+
+def scatter(rng, extent=30.0):
+    return rng.uniform(-extent, extent), rng.uniform(-extent, extent)
+
+# Kernel setups: each takes an entity count and returns a zero-argument
+# callable doing one round of work over that many entities. State a call
+# changes is reset inside it, so every round does the same work.
+
+def pvp_bullet_update(count):
+    rng = random.Random(1)
+    bullets = [Bullet([x, 1, z], rng.uniform(0, 360), 1) for x, z in (scatter(rng) for _ in range(count))]
+    def run():
+        for bullet in bullets:
+            bullet.update()
+            bullet.lifetime = 300
+    return run
+
+def pvp_bullet_hit(count):
+    """World.bullet_hit: every obstacle, then every player, for bullets that miss"""
+    world = PvPWorld(8)
+    rng = random.Random(2)
+    bullets = []
+    while len(bullets) < count:
+        x, z = scatter(rng, 50)
+        bullet = Bullet([x, 1, z], 0, 1)
+        if not world.bullet_hit(bullet):
+            bullets.append(bullet)
+    def run():
+        for bullet in bullets:
+            world.bullet_hit(bullet)
+    return run
+
+def pvp_blocked(count):
+    """Obstacle test in the movement handler, against count obstacles"""
+    world = PvPWorld(2)
+    world.obstacles = []
+    rng = random.Random(3)
+    for _ in range(count):
+        world.add_box_obstacle(*scatter(rng, 55))
+    points = [scatter(rng, 55) for _ in range(64)]
+    def run():
+        for x, z in points:
+            world.blocked(x, z)
+    return run
+
+def pvp_move_player(count):
+    """move_player with obstacle checks in the standard arena, for count players"""
+    world = PvPWorld(count)
+    moving = PlayerInput(1, 0.5, 0.2)
+    starts = [(player.pos[0], player.pos[2], player.rotation) for player in world.players]
+    def run():
+        for player, (x, z, rotation) in zip(world.players, starts):
+            player.pos[0], player.pos[2], player.rotation = x, z, rotation
+            world.move_player(player, moving, 1.0)
+    return run
+
+def pvp_check_teleport(count):
+    """Every portal against count players, as in PvPWorld.step"""
+    world = PvPWorld(count)
+    portals = world.portals
+    players = world.players
+    def run():
+        for portal in portals:
+            for player in players:
+                portal.check_teleport(player.pos)
+    return run
+
+def pvp_respawn(count):
+    players = [Player(i + 1, (i, 0, -i), i * 10) for i in range(count)]
+    def run():
+        for player in players:
+            player.alive = False
+            player.respawn()
+    return run
+
+def fps_check_collision(count):
+    """check_collision_sphere_box for count bullets against the eight enemies"""
+    rng = random.Random(4)
+    enemies = FPSWorld().enemies
+    bullets = [FPSBullet((x, 1, z), 0, 1) for x, z in (scatter(rng) for _ in range(count))]
+    def run():
+        for bullet in bullets:
+            for enemy in enemies:
+                check_collision_sphere_box(bullet, enemy)
+    return run
+
+def fps_step(count):
+    """FPSWorld.step with count live bullets and one enemy per eight bullets"""
+    rng = random.Random(5)
+    world = FPSWorld()
+    world.enemies = [Enemy(*scatter(rng)) for _ in range(max(1, count // 8))]
+    bullets = [FPSBullet((x, 1, z), rng.uniform(0, 360), 1) for x, z in (scatter(rng) for _ in range(count))]
+    idle = [PlayerInput()] * 2
+    def run():
+        for bullet in bullets:
+            bullet.lifetime = 300
+        for enemy in world.enemies:
+            enemy.health = 100
+            enemy.alive = True
+        world.bullets = list(bullets)
+        world.step(idle)
+    return run
+
+def ss_disc_update(count):
+    rng = random.Random(6)
+    discs = [Disc3D(*scatter(rng, 5), DISC_RADIUS, (1, 1, 1)) for _ in range(count)]
+    velocities = [(rng.uniform(-1, 1), rng.uniform(-1, 1)) for _ in discs]
+    starts = [(disc.x, disc.z) for disc in discs]
+    def run():
+        for disc, (vx, vz), (x, z) in zip(discs, velocities, starts):
+            disc.x, disc.z, disc.vx, disc.vz = x, z, vx, vz
+            disc.update()
+    return run
+
+def ss_resolve_collision(count):
+    """count overlapping disc/ball pairs"""
+    rng = random.Random(7)
+    pairs = []
+    for _ in range(count):
+        angle = rng.uniform(0, 2 * math.pi)
+        gap = rng.uniform(0.5, 1.0) * (DISC_RADIUS + BALL_RADIUS)
+        pairs.append((rng.uniform(-1, 1), rng.uniform(-1, 1), math.cos(angle) * gap, math.sin(angle) * gap))
+    disc = Disc3D(0, 0, DISC_RADIUS, (1, 1, 1))
+    ball = Disc3D(0, 0, BALL_RADIUS, (1, 1, 1), is_ball=True)
+    def run():
+        for vx, vz, x, z in pairs:
+            disc.x, disc.z, disc.vx, disc.vz = 0.0, 0.0, vx, vz
+            ball.x, ball.z, ball.vx, ball.vz = x, z, 0.0, 0.0
+            resolve_collision(disc, ball)
+    return run
+
+KERNELS = {
+    "pvp.bullet_update": pvp_bullet_update,
+    "pvp.bullet_hit": pvp_bullet_hit,
+    "pvp.blocked": pvp_blocked,
+    "pvp.move_player": pvp_move_player,
+    "pvp.check_teleport": pvp_check_teleport,
+    "pvp.respawn": pvp_respawn,
+    "fps.check_collision_sphere_box": fps_check_collision,
+    "fps.step": fps_step,
+    "ss.disc_update": ss_disc_update,
+    "ss.resolve_collision": ss_resolve_collision,
+}
+
+def reference():
+    """Fixed interpreter work: attribute access, float math and a list, like the kernels"""
+    point = Player(1, (0.0, 0.0, 0.0), 0)
+    total = 0.0
+    for i in range(100):
+        point.pos[0] += 0.5
+        total += math.sqrt(point.pos[0] * point.pos[0] + i)
+    return total
+
+def calibrated(function, min_time):
+    """(timer, loop count) so one repeat of function takes about min_time"""
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time / 5:
+            return timer, max(1, int(number * min_time / elapsed))
+        number *= 10
+
+def measure(run, repeats=5, min_time=0.05):
+    """(seconds per call, same relative to the reference loop), fastest of repeats each.
+
+    Kernel and reference repeats are interleaved so both see the same
+    machine state.
+    """
+    timer, number = calibrated(run, min_time)
+    reference_timer, reference_number = calibrated(reference, min_time)
+    best = best_reference = math.inf
+    for _ in range(repeats):
+        best = min(best, timer.timeit(number) / number)
+        best_reference = min(best_reference, reference_timer.timeit(reference_number) / reference_number)
+    return best, best / best_reference
+
+def run_suite(counts=SWEEP, only=None, repeats=5, min_time=0.05):
+    """{"kernel[count]": {"ns": ns per entity, "relative": reference loops per entity}}"""
+    results = {}
+    print(f"  {'kernel':40} {'ns/entity':>10} {'us/call':>10} {'relative':>9}")
+    for name, setup in KERNELS.items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        for count in counts:
+            key = f"{name}[{count}]"
+            results[key] = run_kernel(setup, count, repeats, min_time)
+            print(f"  {key:40} {results[key]['ns']:10.1f} {results[key]['ns'] * count / 1000:10.2f} "
+                  f"{results[key]['relative']:9.4f}")
+    return results
+
+def median_results(runs):
+    """Per kernel, the result of the run with the median relative time.
+
+    "spread" is how much slower the slowest run was than the fastest, the
+    noise that kernel showed between runs; compare() never flags less.
+    """
+    results = {}
+    for key in runs[0]:
+        ordered = sorted((run[key] for run in runs), key=lambda result: result["relative"])
+        results[key] = dict(ordered[len(runs) // 2], spread=ordered[-1]["relative"] / ordered[0]["relative"] - 1)
+    return results
+
+def run_kernel(setup, count, repeats, min_time):
+    seconds, relative = measure(setup(count), repeats, min_time)
+    return {"ns": seconds / count * 1e9, "relative": relative / count}
+
+def parse_key(key):
+    name, count = key[:-1].split("[")
+    return KERNELS[name], int(count)
+
+def environment():
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "machine": platform.machine(), "processor": platform.processor()}
+
+def save(path, results):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+
+def compare(results, baseline, threshold, retries=2, repeats=5, min_time=0.05):
+    """Print the change of every kernel against the baseline; returns the regressed keys.
+
+    A kernel may slow down by the threshold or by the spread the baseline
+    recorded for it, whichever is larger. Kernels over that are re-measured
+    up to retries times, keeping the fastest result.
+    """
+    regressions = []
+    print(f"  {'kernel':40} {'baseline':>9} {'now':>9} {'change':>8} {'allowed':>8}   "
+          f"(relative to the reference loop)")
+    for key, result in results.items():
+        value = result["relative"]
+        before = baseline.get(key, {}).get("relative")
+        if before is None:
+            print(f"  {key:40} {'-':>9} {value:9.4f}      new")
+            continue
+        allowed = max(threshold, baseline[key].get("spread", 0.0))
+        change = value / before - 1
+        for _ in range(retries):
+            if change <= allowed:
+                break
+            value = min(value, run_kernel(*parse_key(key), repeats, min_time)["relative"])
+            result["relative"] = value
+            change = value / before - 1
+        flag = ""
+        if change > allowed:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"  {key:40} {before:9.4f} {value:9.4f} {change:+8.1%} {allowed:8.0%}{flag}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulation kernel benchmarks with baseline regression checks")
+    parser.add_argument("only", nargs="*", help="only kernels whose name contains one of these")
+    parser.add_argument("--counts", default=",".join(map(str, SWEEP)), help="entity counts to sweep")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per timed repeat")
+    parser.add_argument("--runs", type=int, default=1,
+                        help="whole suite runs; each kernel keeps its median run (use 5 for a baseline)")
+    parser.add_argument("--save", metavar="JSON", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="baseline to check the results against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="fractional slowdown against the baseline that counts as a regression")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="re-measurements of a kernel over the threshold before it counts")
+    args = parser.parse_args()
+
+    counts = [int(count) for count in args.counts.split(",")]
+    print(f"Python {platform.python_version()}, {len(counts)} entity counts, fastest of {args.repeats}")
+    results = median_results([run_suite(counts, args.only, args.repeats, args.min_time)
+                              for _ in range(args.runs)])
+    if args.save:
+        save(args.save, results)
+        print(f"baseline written to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["environment"] != environment():
+            print(f"warning: baseline was recorded on {baseline['environment']}")
+        regressions = compare(results, baseline["results"], args.threshold, args.retries,
+                              args.repeats, args.min_time)
+        if regressions:
+            print(f"{len(regressions)} kernels regressed by more than {args.threshold:.0%} or their spread")
+            sys.exit(1)
+        print(f"no kernel regressed by more than {args.threshold:.0%} or its spread")
@@ -0,0 +1,150 @@
+import math
+
+import numpy as np
+from OpenGL.GL import *
+
+def perspective(fovy, aspect, near, far):
+    """Same matrix as gluPerspective"""
+    f = 1.0 / math.tan(math.radians(fovy) / 2)
+    return np.array([
+        [f / aspect, 0, 0, 0],
+        [0, f, 0, 0],
+        [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+        [0, 0, -1, 0]
+    ], dtype=np.float64)
+
+def ortho(left, right, bottom, top, near, far):
+    """Same matrix as glOrtho"""
+    return np.array([
+        [2 / (right - left), 0, 0, -(right + left) / (right - left)],
+        [0, 2 / (top - bottom), 0, -(top + bottom) / (top - bottom)],
+        [0, 0, -2 / (far - near), -(far + near) / (far - near)],
+        [0, 0, 0, 1]
+    ], dtype=np.float64)
+
+def look_at(eye, target, up):
+    """Same matrix as gluLookAt"""
+    eye = np.asarray(eye, dtype=np.float64)
+    f = np.asarray(target, dtype=np.float64) - eye
+    f /= np.linalg.norm(f)
+    s = np.cross(f, up)
+    s /= np.linalg.norm(s)
+    u = np.cross(s, f)
+
+    m = np.identity(4)
+    m[0, :3] = s
+    m[1, :3] = u
+    m[2, :3] = -f
+    m[:3, 3] = -m[:3, :3] @ eye
+    return m
+
+class Camera:
+    """View and projection matrices kept on the CPU.
+
+    Matrices are uploaded with glLoadMatrixf and never read back, so picking
+    and culling need no glGet* round trip to the driver and work without a
+    GL context.
+    """
+    def __init__(self, viewport):
+        self.viewport = tuple(viewport)
+        self.view = np.identity(4)
+        self.projection = np.identity(4)
+        self._inverse = None
+        self._planes = None
+
+    def set_perspective(self, fovy, aspect, near, far):
+        self.projection = perspective(fovy, aspect, near, far)
+        self._changed()
+
+    def set_ortho(self, left, right, bottom, top, near, far):
+        self.projection = ortho(left, right, bottom, top, near, far)
+        self._changed()
+
+    def look_at(self, eye, target, up=(0, 1, 0)):
+        self.view = look_at(eye, target, up)
+        self._changed()
+
+    def _changed(self):
+        self._inverse = None
+        self._planes = None
+
+    @property
+    def view_projection(self):
+        return self.projection @ self.view
+
+    def load(self):
+        """Upload both matrices (GL expects column-major, hence the transpose)"""
+        glMatrixMode(GL_PROJECTION)
+        glLoadMatrixf(self.projection.T.astype(np.float32))
+        glMatrixMode(GL_MODELVIEW)
+        glLoadMatrixf(self.view.T.astype(np.float32))
+
+    def project(self, point):
+        """World point to window coordinates (x, y, depth), like gluProject"""
+        clip = self.view_projection @ np.array([point[0], point[1], point[2], 1.0])
+        ndc = clip[:3] / clip[3]
+        vx, vy, vw, vh = self.viewport
+        return (vx + (ndc[0] + 1) * vw / 2,
+                vy + (ndc[1] + 1) * vh / 2,
+                (ndc[2] + 1) / 2)
+
+    def unproject(self, win_x, win_y, win_z):
+        """Window coordinates back to a world point, like gluUnProject"""
+        if self._inverse is None:
+            self._inverse = np.linalg.inv(self.view_projection)
+        vx, vy, vw, vh = self.viewport
+        ndc = np.array([
+            2 * (win_x - vx) / vw - 1,
+            2 * (win_y - vy) / vh - 1,
+            2 * win_z - 1,
+            1.0
+        ])
+        world = self._inverse @ ndc
+        return world[:3] / world[3]
+
+    def screen_ray(self, screen_x, screen_y, window_height):
+        """Ray through a pygame mouse position (origin top-left)"""
+        win_y = window_height - screen_y
+        near = self.unproject(screen_x, win_y, 0.0)
+        far = self.unproject(screen_x, win_y, 1.0)
+        direction = far - near
+        return near, direction / np.linalg.norm(direction)
+
+    def pick_plane(self, screen_x, screen_y, window_height, plane_y=0.0):
+        """World (x, z) where the mouse ray crosses the horizontal plane y = plane_y, or None"""
+        origin, direction = self.screen_ray(screen_x, screen_y, window_height)
+        if abs(direction[1]) < 1e-9:
+            return None
+        t = (plane_y - origin[1]) / direction[1]
+        if t < 0:
+            # The plane is behind the ray, e.g. the mouse is above the horizon
+            return None
+        hit = origin + direction * t
+        return float(hit[0]), float(hit[2])
+
+    def frustum_planes(self):
+        """Six planes (a, b, c, d), normals pointing inwards, normalized"""
+        if self._planes is None:
+            m = self.view_projection
+            planes = np.array([
+                m[3] + m[0],  # left
+                m[3] - m[0],  # right
+                m[3] + m[1],  # bottom
+                m[3] - m[1],  # top
+                m[3] + m[2],  # near
+                m[3] - m[2],  # far
+            ])
+            planes /= np.linalg.norm(planes[:, :3], axis=1)[:, None]
+            self._planes = planes
+        return self._planes
+
+    def sphere_visible(self, center, radius):
+        planes = self.frustum_planes()
+        distances = planes[:, :3] @ np.asarray(center, dtype=np.float64) + planes[:, 3]
+        return bool(np.all(distances > -radius))
+
+    def spheres_visible(self, centers, radii):
+        """Vectorized sphere_visible for an (N, 3) array of centers"""
+        planes = self.frustum_planes()
+        distances = np.asarray(centers, dtype=np.float64) @ planes[:, :3].T + planes[:, 3]
+        return np.all(distances > -np.asarray(radii, dtype=np.float64)[:, None], axis=1)
@@ -0,0 +1,269 @@
+import argparse
+import ctypes
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.error import GLError
+
+def png_bytes(rgb):
+    """Encode an (h, w, 3) uint8 array as PNG with only the stdlib"""
+    height, width, _ = rgb.shape
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    # Filter type 0 (none) in front of every row; level 1 keeps the writer fast
+    rows = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 0] = 0
+    rows[:, 1:] = rgb.reshape(height, width * 3)
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows.tobytes(), 1))
+            + chunk(b"IEND", b""))
+
+def rgb_to_yuv444(rgb):
+    """BT.601 limited range planes, as Y4M C444 expects"""
+    rgb = rgb.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    y = 16 + 0.257 * r + 0.504 * g + 0.098 * b
+    u = 128 - 0.148 * r - 0.291 * g + 0.439 * b
+    v = 128 + 0.439 * r - 0.368 * g - 0.071 * b
+    return np.stack([y, u, v]).round().clip(0, 255).astype(np.uint8)
+
+class FrameWriter(threading.Thread):
+    """Encodes and writes frames off the render thread.
+
+    The format comes from the path: .y4m for a Y4M video, .rgb/.raw for bare
+    RGB24 frames, and a directory or a %d pattern for a PNG sequence. zlib,
+    numpy and file writes release the GIL, so the game loop keeps running
+    while a frame is encoded. Output files are opened by the constructor, so
+    a bad path fails before the game starts; an error while writing is kept
+    and raised by the next put() or by close().
+    """
+    def __init__(self, path, width, height, fps=60, queue_size=8):
+        threading.Thread.__init__(self, daemon=True)
+        self.path = path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frames = queue.Queue(queue_size)
+        self.written = 0
+        self.error = None
+        self.out = None
+
+        if path.endswith(".y4m"):
+            self.format = "y4m"
+            self.out = open(path, "wb")
+            self.out.write(f"YUV4MPEG2 W{width} H{height} F{fps}:1 Ip A1:1 C444\n".encode())
+        elif path.endswith((".rgb", ".raw")):
+            self.format = "raw"
+            self.out = open(path, "wb")
+        else:
+            self.format = "png"
+            if "%" not in path:
+                os.makedirs(path, exist_ok=True)
+                self.path = os.path.join(path, "frame_%06d.png")
+
+    def put(self, data):
+        """Queue a bottom-up RGB frame; False if it was dropped because the queue is full"""
+        if not self.is_alive():
+            self.check()
+            return False
+        try:
+            self.frames.put_nowait(data)
+            return True
+        except queue.Full:
+            return False
+
+    def check(self):
+        """Raise the error that stopped the writer, if any"""
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        out = self.out
+        try:
+            while True:
+                data = self.frames.get()
+                if data is None:
+                    break
+                # glReadPixels rows start at the bottom of the window
+                rgb = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)[::-1]
+                if self.format == "y4m":
+                    out.write(b"FRAME\n")
+                    out.write(rgb_to_yuv444(rgb).tobytes())
+                elif self.format == "raw":
+                    out.write(rgb.tobytes())
+                else:
+                    with open(self.path % self.written, "wb") as f:
+                        f.write(png_bytes(rgb))
+                self.written += 1
+        except Exception as e:
+            # Kept for the game's thread; a dead writer must not go unnoticed
+            self.error = e
+        finally:
+            if out is not None:
+                out.close()
+
+    def close(self):
+        """Wait for the queued frames to be written; raises the writer's error if it failed"""
+        # A writer that died stops emptying the queue, so never block on it
+        while self.is_alive():
+            try:
+                self.frames.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self.join()
+        self.check()
+
+class FrameCapture:
+    """Asynchronous readback of presented frames through a ring of PBOs.
+
+    capture() is called just before pygame.display.flip(). It starts a
+    glReadPixels into the next pixel pack buffer, which returns at once, and
+    maps the buffer filled ring_size - 1 frames earlier, whose transfer has
+    long finished, so the render thread never waits on the GPU. Without PBO
+    support it falls back to a synchronous glReadPixels. Frames the writer
+    cannot keep up with are dropped and counted instead of stalling the game.
+    """
+    def __init__(self, width, height, path, fps=60, ring_size=3, queue_size=8):
+        self.width = width
+        self.height = height
+        self.size = width * height * 3
+        self.writer = FrameWriter(path, width, height, fps, queue_size)
+        self.writer.start()
+
+        self.ring_size = ring_size
+        self.pbos = []
+        self.filled = [False] * ring_size
+        self.index = 0
+        self.captured = 0
+        self.dropped = 0
+        self.readback_time = 0.0
+        self.mode = "synchronous"
+
+        if bool(glGenBuffers) and bool(glMapBuffer):
+            try:
+                self.pbos = list(glGenBuffers(ring_size))
+                for pbo in self.pbos:
+                    glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+                    glBufferData(GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ)
+                glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+                self.mode = "PBO ring"
+            except GLError:
+                self.release_buffers()
+
+    def release_buffers(self):
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        if self.pbos:
+            glDeleteBuffers(len(self.pbos), self.pbos)
+        self.pbos = []
+
+    def capture(self):
+        start = time.perf_counter()
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glReadBuffer(GL_BACK)
+
+        if not self.pbos:
+            data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+            self.submit(bytes(data))
+        else:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[self.index])
+            glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+            self.filled[self.index] = True
+            self.index = (self.index + 1) % self.ring_size
+            # The next slot is the oldest readback in flight
+            if self.filled[self.index]:
+                self.collect(self.index)
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.readback_time += time.perf_counter() - start
+
+    def collect(self, index):
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[index])
+        pointer = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        if pointer:
+            self.submit(ctypes.string_at(pointer, self.size))
+            glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        self.filled[index] = False
+
+    def submit(self, data):
+        self.captured += 1
+        if not self.writer.put(data):
+            self.dropped += 1
+
+    def close(self):
+        """Flush the frames still in the ring and wait for the writer; raises its error if it failed"""
+        for i in range(self.ring_size):
+            index = (self.index + i) % self.ring_size
+            if self.pbos and self.filled[index]:
+                self.collect(index)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.release_buffers()
+        self.writer.close()
+
+    def report(self):
+        per_frame = self.readback_time / self.captured * 1000 if self.captured else 0.0
+        failed = f", writer failed: {self.writer.error}" if self.writer.error is not None else ""
+        return (f"captured {self.captured} frames, wrote {self.writer.written}, dropped {self.dropped}, "
+                f"{per_frame:.2f} ms readback per frame ({self.mode}){failed}")
+
+def benchmark(path, frames=300, width=1280, height=720):
+    """fps of a busy fixed-function scene with capture off and on.
+
+    Run with LIBGL_ALWAYS_SOFTWARE=1 to measure under Mesa software rendering.
+    """
+    import pygame
+    from pygame.locals import DOUBLEBUF, OPENGL
+
+    pygame.display.init()
+    pygame.display.set_mode((width, height), DOUBLEBUF | OPENGL)
+    print(glGetString(GL_RENDERER).decode())
+
+    def draw(frame):
+        glClearColor(0.1, 0.1, 0.15, 1)
+        glClear(GL_COLOR_BUFFER_BIT)
+        glBegin(GL_QUADS)
+        for i in range(400):
+            x = ((i * 37 + frame * 3) % width) / width * 2 - 1
+            y = ((i * 91 + frame) % height) / height * 2 - 1
+            glColor3f((i % 7) / 7, (i % 5) / 5, (i % 3) / 3)
+            glVertex2f(x, y)
+            glVertex2f(x + 0.05, y)
+            glVertex2f(x + 0.05, y + 0.05)
+            glVertex2f(x, y + 0.05)
+        glEnd()
+
+    results = {}
+    for label in ("capture off", "capture on"):
+        capture = FrameCapture(width, height, path) if label == "capture on" else None
+        start = time.perf_counter()
+        for frame in range(frames):
+            pygame.event.pump()
+            draw(frame)
+            if capture is not None:
+                capture.capture()
+            pygame.display.flip()
+        glFinish()
+        elapsed = time.perf_counter() - start
+        results[label] = frames / elapsed
+        print(f"{label:>12}: {frames / elapsed:7.1f} fps")
+        if capture is not None:
+            capture.close()
+            print("  " + capture.report())
+
+    pygame.quit()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frame capture fps benchmark")
+    parser.add_argument("--out", default="capture_bench.y4m", help=".y4m, .rgb or a PNG directory")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", default="1280x720")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split("x"))
+    benchmark(args.out, args.frames, width, height)
@@ -0,0 +1,203 @@
+import math
+import struct
+
+import numpy as np
+
+from horde import HORDE_HEADER, Horde
+from pvp_world import MOVE_SPEED, TURN_SPEED
+
+# Game state for FPS.py (two players against static enemies, or a zombie
+# horde in horde mode), kept free of pygame and OpenGL like pvp_world.
+
+BULLET_DAMAGE = 34
+
+class Bullet:
+    def __init__(self, pos, rotation, owner):
+        self.pos = list(pos)
+        self.speed = 0.5
+        self.lifetime = 300
+        self.radius = 0.2
+        self.owner = owner
+        self.aim(rotation)
+
+    def aim(self, rotation):
+        """Set the direction; the per-tick step is computed once here, not in update()"""
+        self.rotation = rotation
+        self.dx = math.sin(math.radians(rotation)) * self.speed
+        self.dz = math.cos(math.radians(rotation)) * self.speed
+
+    def update(self):
+        pos = self.pos
+        pos[0] += self.dx
+        pos[2] += self.dz
+        self.lifetime -= 1
+
+    def is_alive(self):
+        return self.lifetime > 0
+
+class Enemy:
+    def __init__(self, x, z):
+        self.pos = [x, 1, z]
+        self.health = 100
+        self.size = 1
+        self.alive = True
+
+    def take_damage(self, amount):
+        self.health -= amount
+        if self.health <= 0:
+            self.alive = False
+
+def check_collision_sphere_box(bullet, enemy):
+    """Check collision between bullet (sphere) and enemy (box)"""
+    dx = bullet.pos[0] - enemy.pos[0]
+    dy = bullet.pos[1] - enemy.pos[1]
+    dz = bullet.pos[2] - enemy.pos[2]
+    distance = math.sqrt(dx*dx + dy*dy + dz*dz)
+    return distance < (bullet.radius + enemy.size)
+
+class Player:
+    def __init__(self, number, pos, rotation):
+        self.number = number
+        self.pos = list(pos)
+        self.rotation = rotation
+        self.health = 100
+        self.moving = False
+
+# Packed state, for handing snapshots from the simulation thread to the renderer
+STATE_HEADER = struct.Struct("<IHH")       # tick, bullets, enemies
+PLAYER_STATE = struct.Struct("<4dhB")      # pos, rotation, health, moving
+BULLET_STATE = struct.Struct("<4dHB")      # pos, rotation, lifetime, owner
+ENEMY_STATE = struct.Struct("<3dhB")       # pos, health, alive
+# then the horde: HORDE_HEADER with the zombie count (0 without a horde) and its arrays
+
+class FPSWorld:
+    """Two players, their bullets and the enemies, advanced one tick at a time.
+
+    With horde set, that many pursuing zombies replace the static enemies.
+    """
+    def __init__(self, horde=0):
+        self.players = [Player(1, (0, 0, -10), 0), Player(2, (0, 0, 10), 180)]
+        self.bullets = []
+        self.enemies = []
+        self.horde = Horde(horde) if horde else None
+        self.tick = 0
+        if self.horde is None:
+            self.spawn_enemies()
+
+    def spawn_enemies(self):
+        """Spawn enemies around the map"""
+        for i in range(8):
+            angle = i * 45
+            x = math.sin(math.radians(angle)) * 20
+            z = math.cos(math.radians(angle)) * 20
+            self.enemies.append(Enemy(x, z))
+
+    def move_player(self, player, player_input, dt):
+        """Free movement, no obstacles in this map"""
+        player.rotation += player_input.turn * TURN_SPEED
+        player.moving = player_input.is_moving()
+        speed = MOVE_SPEED * dt
+        forward = player_input.forward * speed
+        strafe = player_input.strafe * speed
+        player.pos[0] += math.sin(math.radians(player.rotation)) * forward
+        player.pos[2] += math.cos(math.radians(player.rotation)) * forward
+        player.pos[0] += math.sin(math.radians(player.rotation - 90)) * strafe
+        player.pos[2] += math.cos(math.radians(player.rotation - 90)) * strafe
+
+    def shoot(self, player):
+        self.bullets.append(Bullet(player.pos, player.rotation, player.number))
+
+    def step(self, inputs, dt=1.0):
+        """Advance one tick with one PlayerInput per player"""
+        for player, player_input in zip(self.players, inputs):
+            if player_input.shoot:
+                self.shoot(player)
+            self.move_player(player, player_input, dt)
+
+        if self.horde is not None:
+            self.horde.step(np.array([(player.pos[0], player.pos[2]) for player in self.players]), dt)
+
+        # Move bullets and resolve their hits in one pass, keeping the survivors
+        survivors = []
+        for bullet in self.bullets:
+            if bullet.lifetime <= 0:
+                continue
+            bullet.update()
+            for enemy in self.enemies:
+                if enemy.alive and check_collision_sphere_box(bullet, enemy):
+                    enemy.take_damage(BULLET_DAMAGE)
+                    break
+            else:
+                survivors.append(bullet)
+        if self.horde is not None and survivors:
+            hit = self.horde.hit(np.array([(bullet.pos[0], bullet.pos[2]) for bullet in survivors]), BULLET_DAMAGE)
+            survivors = [bullet for bullet, used in zip(survivors, hit) if not used]
+        self.bullets = survivors
+
+        self.tick += 1
+
+    def state_size(self):
+        return (STATE_HEADER.size + PLAYER_STATE.size * len(self.players)
+                + BULLET_STATE.size * len(self.bullets) + ENEMY_STATE.size * len(self.enemies)
+                + (self.horde.state_size() if self.horde is not None else HORDE_HEADER.size))
+
+    def pack_state(self):
+        buffer = bytearray(self.state_size())
+        STATE_HEADER.pack_into(buffer, 0, self.tick, len(self.bullets), len(self.enemies))
+        offset = STATE_HEADER.size
+        for player in self.players:
+            PLAYER_STATE.pack_into(buffer, offset, player.pos[0], player.pos[1], player.pos[2],
+                                   player.rotation, player.health, player.moving)
+            offset += PLAYER_STATE.size
+        for bullet in self.bullets:
+            BULLET_STATE.pack_into(buffer, offset, bullet.pos[0], bullet.pos[1], bullet.pos[2],
+                                   bullet.rotation, bullet.lifetime, bullet.owner)
+            offset += BULLET_STATE.size
+        for enemy in self.enemies:
+            ENEMY_STATE.pack_into(buffer, offset, enemy.pos[0], enemy.pos[1], enemy.pos[2],
+                                  enemy.health, enemy.alive)
+            offset += ENEMY_STATE.size
+        if self.horde is not None:
+            self.horde.pack_into(buffer, offset)
+        else:
+            HORDE_HEADER.pack_into(buffer, offset, 0)
+        return bytes(buffer)
+
+    def unpack_state(self, buffer):
+        """Restore pack_state() output, reusing the existing objects where possible"""
+        self.tick, bullet_count, enemy_count = STATE_HEADER.unpack_from(buffer, 0)
+        offset = STATE_HEADER.size
+        for player in self.players:
+            pos = player.pos
+            pos[0], pos[1], pos[2], player.rotation, player.health, moving = PLAYER_STATE.unpack_from(buffer, offset)
+            player.moving = bool(moving)
+            offset += PLAYER_STATE.size
+
+        bullets = self.bullets
+        while len(bullets) < bullet_count:
+            bullets.append(Bullet((0, 0, 0), 0, 0))
+        del bullets[bullet_count:]
+        for bullet in bullets:
+            pos = bullet.pos
+            pos[0], pos[1], pos[2], rotation, bullet.lifetime, bullet.owner = \
+                BULLET_STATE.unpack_from(buffer, offset)
+            bullet.aim(rotation)
+            offset += BULLET_STATE.size
+
+        enemies = self.enemies
+        while len(enemies) < enemy_count:
+            enemies.append(Enemy(0, 0))
+        del enemies[enemy_count:]
+        for enemy in enemies:
+            pos = enemy.pos
+            pos[0], pos[1], pos[2], enemy.health, alive = ENEMY_STATE.unpack_from(buffer, offset)
+            enemy.alive = bool(alive)
+            offset += ENEMY_STATE.size
+
+        horde_count, = HORDE_HEADER.unpack_from(buffer, offset)
+        if not horde_count:
+            self.horde = None
+        else:
+            if self.horde is None or self.horde.count != horde_count:
+                self.horde = Horde(horde_count)
+            self.horde.unpack_from(buffer, offset)
@@ -0,0 +1,150 @@
+import argparse
+import gc
+import time
+
+from pvp_server import sleep_until
+from pvp_world import PvPWorld, PlayerInput
+
+class FrameGC:
+    """Runs the cyclic GC in frame slack time instead of wherever an allocation trips it.
+
+    after_load() collects once, moves everything still alive (the level,
+    fonts, display list bookkeeping) into the permanent generation with
+    gc.freeze() so later full collections skip it, and disables automatic
+    collection. idle(deadline) is then called after each frame is presented:
+    it collects the oldest generation whose count is due, falling back to a
+    younger one if the last measured cost of that generation would overrun
+    the deadline. If frames never leave slack, a young collection is forced
+    once pending allocations reach hard_limit times the threshold, so memory
+    stays bounded.
+    """
+    def __init__(self, hard_limit=20):
+        self.thresholds = gc.get_threshold()
+        self.hard_limit = hard_limit
+        # Last measured pause per generation, seeded with rough guesses
+        self.cost = [0.0002, 0.001, 0.005]
+        self.pauses = []
+        self.forced = 0
+        self.deferred = 0
+        self.enabled = False
+
+    def after_load(self):
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+        self.enabled = True
+
+    def due_generation(self):
+        counts = gc.get_count()
+        for generation in (2, 1, 0):
+            if counts[generation] >= self.thresholds[generation]:
+                return generation
+        return -1
+
+    def collect(self, generation):
+        start = time.perf_counter()
+        gc.collect(generation)
+        pause = time.perf_counter() - start
+        self.cost[generation] = pause
+        self.pauses.append(pause)
+
+    def idle(self, deadline):
+        if not self.enabled:
+            return
+        generation = self.due_generation()
+        if generation < 0:
+            return
+        remaining = deadline - time.perf_counter()
+        while generation >= 0 and self.cost[generation] > remaining:
+            generation -= 1
+        if generation >= 0:
+            self.collect(generation)
+        elif gc.get_count()[0] >= self.thresholds[0] * self.hard_limit:
+            self.forced += 1
+            self.collect(0)
+        else:
+            self.deferred += 1
+
+    def report(self):
+        return f"gc policy: {pause_summary(self.pauses)}, {self.deferred} deferred, {self.forced} forced"
+
+def pause_summary(pauses):
+    if not pauses:
+        return "no collections"
+    ordered = sorted(pauses)
+    def ms(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+    return (f"{len(ordered)} collections, pause p50 {ms(0.5):.3f} ms, p99 {ms(0.99):.3f} ms, "
+            f"max {ordered[-1] * 1000:.3f} ms")
+
+def benchmark(frames=600, rate=60, assets=100000):
+    """GC pauses and frame work time with automatic collection vs FrameGC"""
+    period = 1.0 / rate
+    results = {}
+    for mode in ("automatic", "policy"):
+        gc.enable()
+        gc.unfreeze()
+        gc.collect()
+        # A level's worth of long-lived containers, which full collections have to traverse
+        level = [[i, str(i)] for i in range(assets)]
+        world = PvPWorld(8)
+        inputs = [PlayerInput(1, 0, 0.5)] * 8
+        shooting = [PlayerInput(1, 0, 0.5, shoot=True)] * 8
+        policy = FrameGC()
+        if mode == "policy":
+            policy.after_load()
+
+        in_frame = []
+        state = {"start": None, "working": False}
+        def callback(phase, info):
+            if phase == "start":
+                state["start"] = time.perf_counter()
+            elif state["working"]:
+                in_frame.append(time.perf_counter() - state["start"])
+        gc.callbacks.append(callback)
+
+        work = []
+        garbage = []
+        history = []
+        next_frame = time.perf_counter()
+        for frame in range(frames):
+            sleep_until(next_frame, 0)
+            start = time.perf_counter()
+            state["working"] = True
+            world.step(shooting if frame % 8 == 0 else inputs)
+            # Stand-ins for render and UI code: reference cycles, short-lived
+            # containers, and a history that only grows (kill feed, replay index)
+            for _ in range(200):
+                cycle = []
+                cycle.append(cycle)
+            garbage.append([(frame, i) for i in range(50)])
+            if len(garbage) > 120:
+                garbage.pop(0)
+            history.extend([frame, i] for i in range(100))
+            state["working"] = False
+            work.append(time.perf_counter() - start)
+            next_frame += period
+            policy.idle(next_frame)
+
+        gc.callbacks.remove(callback)
+        del level, history
+        work.sort()
+        over = sum(1 for w in work if w > period)
+        results[mode] = (in_frame, policy.pauses, work[int(len(work) * 0.99)], work[-1], over, policy)
+
+    gc.enable()
+    gc.unfreeze()
+    for mode, (in_frame, idle_pauses, p99, worst, over, policy) in results.items():
+        print(f"{mode}:")
+        print(f"  pauses inside frame work: {pause_summary(in_frame)}")
+        if mode == "policy":
+            print(f"  pauses in slack time:     {pause_summary(idle_pauses)}, "
+                  f"{policy.deferred} deferred, {policy.forced} forced")
+        print(f"  frame work p99 {p99 * 1000:.3f} ms, max {worst * 1000:.3f} ms, {over} frames over budget")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GC pause placement benchmark")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--assets", type=int, default=100000, help="long-lived containers in the fake level")
+    args = parser.parse_args()
+    benchmark(args.frames, assets=args.assets)
@@ -0,0 +1,398 @@
+import argparse
+import math
+import struct
+import time
+
+import numpy as np
+
+# Zombie horde for FPS.py's horde mode. Every zombie is a row in a few NumPy
+# arrays, so steering, neighbour search and bullet hits are array operations
+# over the whole horde instead of Python loops over Enemy objects.
+#
+# Steering per tick, like boids: seek the nearest player, separate from
+# zombies that are too close, align with the velocity of nearby ones, and
+# avoid the pillars ahead. Neighbours come from a spatial hash built with one
+# argsort per tick (SpatialHash below).
+
+ZOMBIE_SPEED = 0.06        # Players walk at 0.1 per tick
+MAX_FORCE = 0.01           # Steering change per tick
+NEIGHBOR_RADIUS = 1.2      # Alignment range, and the hash cell size
+SEPARATION_RADIUS = 0.9
+CONTACT_RANGE = 1.2        # Zombies stop this close to a player
+HIT_RADIUS = 0.6           # Bullet to zombie, in the ground plane
+ZOMBIE_RADIUS = 0.4
+PLAYER_RADIUS = 0.5
+LOOK_AHEAD = 20            # Ticks of velocity a zombie looks ahead for pillars
+RESPAWN_TICKS = 120
+SPAWN_RADIUS = (35.0, 45.0)
+HEADINGS = 64              # Zombies are drawn facing one of this many directions
+
+SEEK_WEIGHT = 1.0
+SEPARATION_WEIGHT = 0.05
+ALIGNMENT_WEIGHT = 0.1
+AVOIDANCE_WEIGHT = 0.03
+
+# (x, z, radius): stone pillars the horde has to flow around
+PILLARS = ((12.0, 0.0, 1.5), (-12.0, 0.0, 1.5), (0.0, 12.0, 1.5), (0.0, -12.0, 1.5),
+           (18.0, 18.0, 2.0), (-18.0, 18.0, 2.0), (18.0, -18.0, 2.0), (-18.0, -18.0, 2.0))
+
+HORDE_HEADER = struct.Struct("<I")   # zombie count; the arrays follow
+
+_CELL_OFFSET = 1 << 15   # Keeps cell coordinates positive for the hash keys
+_ROW = 1 << 16
+# Own cell and the four cells after it: every pair of neighbouring cells once
+_HALF_STENCIL = ((1, -1), (1, 0), (1, 1), (0, 1))
+_HALF_STENCIL_KEYS = np.array([dx * _ROW + dz for dx, dz in _HALF_STENCIL])
+
+def push_out(pos, x, z, radius):
+    """Move positions closer than radius to (x, z) out onto the circle, in place"""
+    away = pos - (x, z)
+    distance = np.sqrt(np.einsum("ij,ij->i", away, away))
+    inside = distance < radius
+    if inside.any():
+        pos[inside] = (x, z) + away[inside] * (radius / np.maximum(distance[inside], 1e-9))[:, None]
+
+class SpatialHash:
+    """Points bucketed by grid cell with one argsort; neighbour queries return index arrays.
+
+    Queries look at the 3x3 cells around each point, so radius must not
+    exceed cell_size.
+    """
+    def __init__(self, cell_size=NEIGHBOR_RADIUS):
+        self.cell_size = cell_size
+        self.points = np.zeros((0, 2))
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int64)
+
+    def key(self, cells):
+        return (cells[:, 0] + _CELL_OFFSET) * _ROW + (cells[:, 1] + _CELL_OFFSET)
+
+    def build(self, points):
+        self.points = points
+        keys = self.key(np.floor(points / self.cell_size).astype(np.int64))
+        self.order = np.argsort(keys, kind="stable").astype(np.int32)
+        self.keys = keys[self.order]
+
+    def expand(self, owners, start, counts):
+        """Flat (owner, index) arrays for the ranges [start, start + count) of each owner"""
+        total = counts.sum()
+        within = np.arange(total, dtype=np.int32) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(owners, counts), np.repeat(start, counts) + within
+
+    def neighbor_pairs(self, radius):
+        """Every pair of points within radius once: (i, j, x and z offset from i to j, squared distance)
+
+        Works in sorted order, where a cell's points are contiguous: a point
+        pairs with the later points of its own cell and with all points of
+        the half stencil cells, so no pair is generated twice.
+        """
+        keys = self.keys
+        order = self.order
+        x = self.points[order, 0]
+        z = self.points[order, 1]
+        ranks = np.arange(len(keys), dtype=np.int32)
+        # All five ranges of every point, expanded in one go
+        neighbors = (keys + _HALF_STENCIL_KEYS[:, None]).ravel()
+        start = np.concatenate([ranks + 1, np.searchsorted(keys, neighbors, "left")])
+        end = np.concatenate([np.searchsorted(keys, keys, "right"), np.searchsorted(keys, neighbors, "right")])
+        i, j = self.expand(np.tile(ranks, len(_HALF_STENCIL) + 1), start.astype(np.int32),
+                           (end - start).astype(np.int32))
+        offset_x = x[j] - x[i]
+        offset_z = z[j] - z[i]
+        distance_sq = offset_x * offset_x + offset_z * offset_z
+        close = distance_sq < radius * radius
+        return order[i[close]], order[j[close]], offset_x[close], offset_z[close], distance_sq[close]
+
+    def pairs(self, queries, radius):
+        """(query index, point index, offset from query to point, squared distance) within radius"""
+        cells = np.floor(queries / self.cell_size).astype(np.int64)
+        found_queries, found_points = [], []
+        for dx in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                keys = self.key(cells + (dx, dz))
+                start = np.searchsorted(self.keys, keys, "left")
+                q, p = self.expand(np.arange(len(queries)), start, np.searchsorted(self.keys, keys, "right") - start)
+                found_queries.append(q)
+                found_points.append(self.order[p])
+        q = np.concatenate(found_queries)
+        p = np.concatenate(found_points)
+        offset = self.points[p] - queries[q]
+        distance_sq = np.einsum("ij,ij->i", offset, offset)
+        close = distance_sq < radius * radius
+        return q[close], p[close], offset[close], distance_sq[close]
+
+class Horde:
+    """count zombies as arrays: ground position, velocity, heading (degrees), health, alive"""
+    def __init__(self, count, seed=1):
+        self.rng = np.random.default_rng(seed)
+        self.count = count
+        self.pos = np.zeros((count, 2))
+        self.vel = np.zeros((count, 2))
+        self.heading = np.zeros(count, dtype=np.float32)
+        self.health = np.full(count, 100, dtype=np.int16)
+        self.alive = np.ones(count, dtype=bool)
+        self.respawn_timer = np.zeros(count, dtype=np.int32)
+        self.hash = SpatialHash()
+        self.kills = 0
+        self.spawn(np.arange(count))
+
+    def spawn(self, which):
+        angle = self.rng.uniform(0, 2 * math.pi, len(which))
+        radius = self.rng.uniform(*SPAWN_RADIUS, len(which))
+        self.pos[which, 0] = np.sin(angle) * radius
+        self.pos[which, 1] = np.cos(angle) * radius
+        self.vel[which] = 0.0
+        self.health[which] = 100
+        self.alive[which] = True
+
+    def step(self, players, dt=1.0):
+        """Advance one tick; players is an array of player ground positions (x, z)"""
+        waiting = ~self.alive
+        if waiting.any():
+            self.respawn_timer[waiting] -= 1
+            self.spawn(np.flatnonzero(waiting & (self.respawn_timer <= 0)))
+
+        live = np.flatnonzero(self.alive)
+        if not len(live):
+            return
+        pos = self.pos[live]
+        vel = self.vel[live]
+        n = len(live)
+
+        # Seek the nearest player, stopping at contact range
+        to_players = players[None, :, :] - pos[:, None, :]
+        distance_sq = np.einsum("ijk,ijk->ij", to_players, to_players)
+        nearest = distance_sq.argmin(axis=1)
+        rows = np.arange(n)
+        to_target = to_players[rows, nearest]
+        distance = np.sqrt(distance_sq[rows, nearest])
+        desired = to_target * (ZOMBIE_SPEED / np.maximum(distance, 1e-9))[:, None]
+        desired[distance < CONTACT_RANGE] = 0.0
+        force = (desired - vel) * SEEK_WEIGHT
+
+        # Separation and alignment from the neighbours within NEIGHBOR_RADIUS
+        # (each pair comes once, so every sum adds both ends)
+        self.hash.build(pos)
+        i, j, offset_x, offset_z, d_sq = self.hash.neighbor_pairs(NEIGHBOR_RADIUS)
+        near = d_sq < SEPARATION_RADIUS * SEPARATION_RADIUS
+        # Push the two apart, harder the closer they are
+        scale = SEPARATION_WEIGHT / np.maximum(d_sq[near], 1e-4)
+        push_x = offset_x[near] * scale
+        push_z = offset_z[near] * scale
+        i_near, j_near = i[near], j[near]
+        force[:, 0] += np.bincount(j_near, push_x, n) - np.bincount(i_near, push_x, n)
+        force[:, 1] += np.bincount(j_near, push_z, n) - np.bincount(i_near, push_z, n)
+        neighbors = np.bincount(i, minlength=n) + np.bincount(j, minlength=n)
+        has = neighbors > 0
+        vel_x, vel_z = vel[:, 0], vel[:, 1]
+        mean_vel = np.stack([np.bincount(i, vel_x[j], n) + np.bincount(j, vel_x[i], n),
+                             np.bincount(i, vel_z[j], n) + np.bincount(j, vel_z[i], n)], axis=1)
+        force[has] += (mean_vel[has] / neighbors[has, None] - vel[has]) * ALIGNMENT_WEIGHT
+
+        # Avoidance: steer sideways from any pillar the look-ahead point is inside
+        ahead = pos + vel * LOOK_AHEAD
+        for x, z, radius in PILLARS:
+            away = ahead - (x, z)
+            away_sq = np.einsum("ij,ij->i", away, away)
+            inside = away_sq < (radius + ZOMBIE_RADIUS + 0.5) ** 2
+            if inside.any():
+                force[inside] += away[inside] / np.sqrt(np.maximum(away_sq[inside], 1e-9))[:, None] * AVOIDANCE_WEIGHT
+
+        # Integrate with bounded force and speed
+        force_len = np.sqrt(np.einsum("ij,ij->i", force, force))
+        force *= np.minimum(1.0, MAX_FORCE / np.maximum(force_len, 1e-12))[:, None]
+        vel += force
+        speed = np.sqrt(np.einsum("ij,ij->i", vel, vel))
+        vel *= np.minimum(1.0, ZOMBIE_SPEED / np.maximum(speed, 1e-12))[:, None]
+        pos += vel * dt
+
+        # Nobody ends up inside a pillar or a player, whatever the crowd behind pushes
+        for x, z, radius in PILLARS:
+            push_out(pos, x, z, radius + ZOMBIE_RADIUS)
+        for x, z in players:
+            push_out(pos, x, z, PLAYER_RADIUS + ZOMBIE_RADIUS)
+
+        moving = speed > 1e-3
+        self.heading[live[moving]] = np.degrees(np.arctan2(vel[moving, 0], vel[moving, 1]))
+        self.pos[live] = pos
+        self.vel[live] = vel
+
+    def hit(self, bullets, damage):
+        """Apply bullets (array of ground positions) to the horde; returns which bullets hit something.
+
+        Each bullet hits the nearest live zombie within HIT_RADIUS, or a pillar.
+        """
+        used = np.zeros(len(bullets), dtype=bool)
+        if not len(bullets):
+            return used
+        for x, z, radius in PILLARS:
+            offset = bullets - (x, z)
+            used |= np.einsum("ij,ij->i", offset, offset) < radius * radius
+
+        live = np.flatnonzero(self.alive)
+        self.hash.build(self.pos[live])
+        q, p, _, d_sq = self.hash.pairs(bullets, HIT_RADIUS)
+        keep = ~used[q]
+        q, p, d_sq = q[keep], p[keep], d_sq[keep]
+        if not len(q):
+            return used
+        order = np.lexsort((d_sq, q))
+        bullet_numbers, first = np.unique(q[order], return_index=True)
+        victims = live[p[order][first]]
+        used[bullet_numbers] = True
+        np.subtract.at(self.health, victims, damage)
+        dead = np.unique(victims[self.health[victims] <= 0])
+        self.alive[dead] = False
+        self.respawn_timer[dead] = RESPAWN_TICKS
+        self.kills += len(dead)
+        return used
+
+    def mesh(self):
+        """(vertices, normals, colors) of quads for every live zombie, for glDrawArrays.
+
+        Vertices are float32; normals are int8 and colors uint8, as GL_BYTE
+        and GL_UNSIGNED_BYTE, which halves what is written every frame.
+
+        Each zombie copies the pre-turned model nearest its heading and the
+        colors for its health, so building the mesh is three gathers and a
+        move, with no per-vertex trigonometry.
+        """
+        live = np.flatnonzero(self.alive)
+        turn = np.rint(self.heading[live] * (HEADINGS / 360.0)).astype(np.intp) % HEADINGS
+        vertices = ZOMBIE_VERTICES[turn]
+        # One column at a time: broadcasting over the length-3 axis is several times slower
+        vertices[:, :, 0] += self.pos[live, 0, None].astype(np.float32)
+        vertices[:, :, 2] += self.pos[live, 1, None].astype(np.float32)
+        return (vertices.reshape(-1, 3), ZOMBIE_NORMALS[turn].reshape(-1, 3),
+                ZOMBIE_COLORS[np.clip(self.health[live], 0, 100)].reshape(-1, 3))
+
+    # Serialization
+    def state_size(self):
+        return HORDE_HEADER.size + self.count * (2 * 4 + 4 + 2 + 1)
+
+    def pack_into(self, buffer, offset):
+        HORDE_HEADER.pack_into(buffer, offset, self.count)
+        offset += HORDE_HEADER.size
+        for array in (self.pos.astype(np.float32), self.heading, self.health, self.alive):
+            data = array.tobytes()
+            buffer[offset:offset + len(data)] = data
+            offset += len(data)
+        return offset
+
+    def unpack_from(self, buffer, offset):
+        count = self.count
+        offset += HORDE_HEADER.size
+        self.pos[:] = np.frombuffer(buffer, np.float32, 2 * count, offset).reshape(count, 2)
+        offset += 8 * count
+        self.heading[:] = np.frombuffer(buffer, np.float32, count, offset)
+        offset += 4 * count
+        self.health[:] = np.frombuffer(buffer, np.int16, count, offset)
+        offset += 2 * count
+        self.alive[:] = np.frombuffer(buffer, bool, count, offset)
+        return offset + count
+
+def cube_quads(cx, cy, cz, width, height, depth):
+    """The 24 vertices and normals of a box as six quads, faces as in draw_minecraft_cube"""
+    w, h, d = width / 2, height / 2, depth / 2
+    corners = [(-w, -h, -d), (w, -h, -d), (w, h, -d), (-w, h, -d),
+               (-w, -h, d), (w, -h, d), (w, h, d), (-w, h, d)]
+    faces = (((0, 1, 2, 3), (0, 0, -1)), ((4, 5, 6, 7), (0, 0, 1)), ((0, 1, 5, 4), (0, -1, 0)),
+             ((2, 3, 7, 6), (0, 1, 0)), ((0, 3, 7, 4), (-1, 0, 0)), ((1, 2, 6, 5), (1, 0, 0)))
+    vertices, normals = [], []
+    for face, normal in faces:
+        for corner in face:
+            x, y, z = corners[corner]
+            vertices.append((cx + x, cy + y, cz + z))
+            normals.append(normal)
+    return vertices, normals
+
+def turned(points):
+    """points rotated about Y to each of the HEADINGS directions; the model faces +z"""
+    angle = np.radians(np.arange(HEADINGS) * (360.0 / HEADINGS))[:, None]
+    c, s = np.cos(angle), np.sin(angle)
+    x, y, z = points[:, 0], points[:, 1], points[:, 2]
+    return np.stack([x * c + z * s, np.broadcast_to(y, (HEADINGS, len(x))), z * c - x * s],
+                    axis=2).astype(np.float32)
+
+def zombie_mesh():
+    """One zombie at the origin, standing on the ground and reaching forward, in every heading"""
+    skin, shirt, trousers = (0.4, 0.8, 0.4), (0.3, 0.6, 0.3), (0.2, 0.4, 0.2)
+    parts = (((0, 1.9, 0), (0.5, 0.5, 0.5), skin),
+             ((0, 1.25, 0), (0.5, 0.75, 0.25), shirt),
+             ((-0.375, 1.5, 0.25), (0.25, 0.25, 0.75), skin),
+             ((0.375, 1.5, 0.25), (0.25, 0.25, 0.75), skin),
+             ((-0.125, 0.45, 0), (0.25, 0.9, 0.25), trousers),
+             ((0.125, 0.45, 0), (0.25, 0.9, 0.25), trousers))
+    vertices, normals, colors = [], [], []
+    for center, size, color in parts:
+        v, n = cube_quads(*center, *size)
+        vertices += v
+        normals += n
+        colors += [color] * len(v)
+    # Green fades with health, like draw_enemy
+    shade = np.ones((101, 1, 3))
+    shade[:, 0, 1] = np.arange(101) / 100.0
+    return (turned(np.array(vertices)), np.rint(turned(np.array(normals)) * 127).astype(np.int8),
+            np.rint(np.array(colors) * shade * 255).astype(np.uint8))
+
+# (HEADINGS, vertices, 3) positions and normals, (health 0-100, vertices, 3) colors
+ZOMBIE_VERTICES, ZOMBIE_NORMALS, ZOMBIE_COLORS = zombie_mesh()
+
+def benchmark(sizes=(500, 1000, 2000, 5000, 10000), ticks=600, probes=64):
+    """Simulation and mesh time per frame against horde size, with both players shooting.
+
+    Also times probes bullets among the horde hit-tested in one batch against
+    the same bullets tested one by one against Enemy objects, the way the
+    fixed enemies are.
+    """
+    from fps_world import BULLET_DAMAGE, Bullet, Enemy, FPSWorld, check_collision_sphere_box
+    from pvp_world import PlayerInput
+    # Both players turn on the spot, firing into the horde as it closes in
+    inputs = [PlayerInput(0, 0, 0.2, shoot=True), PlayerInput(0, 0, -0.2, shoot=True)]
+    idle = [PlayerInput(0, 0, 0.2), PlayerInput(0, 0, -0.2)]
+
+    def ms(samples, p):
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    print(f"{'zombies':>7} {'step ms':>8} {'p99':>7} {'mesh ms':>8} {'p99':>7} {'frame ms':>9} {'kills':>6}"
+          f" {'hits ms':>8} {'object hits ms':>15}")
+    for size in sizes:
+        world = FPSWorld(horde=size)
+        step, mesh = [], []
+        for tick in range(ticks):
+            start = time.perf_counter()
+            world.step(inputs if tick % 4 == 0 else idle)
+            middle = time.perf_counter()
+            world.horde.mesh()
+            end = time.perf_counter()
+            step.append(middle - start)
+            mesh.append(end - middle)
+
+        horde = world.horde
+        rng = np.random.default_rng(size)
+        targets = horde.pos[rng.integers(0, size, probes)] + rng.uniform(-1, 1, (probes, 2))
+        start = time.perf_counter()
+        horde.hit(targets, BULLET_DAMAGE)
+        batched = time.perf_counter() - start
+        bullets = [Bullet((x, 1, z), 0, 1) for x, z in targets]
+        enemies = [Enemy(x, z) for x, z in horde.pos]
+        start = time.perf_counter()
+        for bullet in bullets:
+            for enemy in enemies:
+                if enemy.alive and check_collision_sphere_box(bullet, enemy):
+                    enemy.take_damage(BULLET_DAMAGE)
+                    break
+        objects = time.perf_counter() - start
+
+        frame = [a + b for a, b in zip(step, mesh)]
+        print(f"{size:7d} {sum(step) / ticks * 1000:8.2f} {ms(step, 0.99):7.2f} {sum(mesh) / ticks * 1000:8.2f} "
+              f"{ms(mesh, 0.99):7.2f} {sum(frame) / ticks * 1000:9.2f} {horde.kills:6d}"
+              f" {batched * 1000:8.2f} {objects * 1000:15.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zombie horde frame time against horde size")
+    parser.add_argument("--sizes", default="500,1000,2000,5000,10000")
+    parser.add_argument("--ticks", type=int, default=600, help="long enough for the horde to reach the players")
+    args = parser.parse_args()
+    benchmark([int(size) for size in args.sizes.split(",")], args.ticks)
@@ -0,0 +1,100 @@
+from OpenGL.GL import *
+
+class HudLayer:
+    """Static HUD geometry, compiled into a display list the first time it is drawn"""
+    def __init__(self, build):
+        self.build = build
+        self.display_list = None
+        self.uploads = 0
+
+    def compile(self, *args):
+        if self.display_list is None:
+            self.display_list = glGenLists(1)
+        glNewList(self.display_list, GL_COMPILE)
+        self.build(*args)
+        glEndList()
+        self.uploads += 1
+
+    def draw(self):
+        if self.display_list is None:
+            self.compile()
+        glCallList(self.display_list)
+
+    def invalidate(self):
+        if self.display_list is not None:
+            glDeleteLists(self.display_list, 1)
+            self.display_list = None
+
+class HudWidget(HudLayer):
+    """Dynamic HUD element that is only recompiled when its bound value changes"""
+    def __init__(self, bind, build):
+        HudLayer.__init__(self, build)
+        self.bind = bind
+        self.value = None
+
+    def draw(self):
+        value = self.bind()
+        if self.display_list is None or value != self.value:
+            self.value = value
+            self.compile(value)
+        glCallList(self.display_list)
+
+class HudDynamic:
+    """HUD element drawn in immediate mode every frame, for values that change nearly every frame"""
+    def __init__(self, build):
+        self.build = build
+        self.uploads = 0
+
+    def draw(self):
+        self.build()
+
+    def invalidate(self):
+        pass
+
+class Hud:
+    """Full screen 2D overlay made of static layers, value-bound widgets and dynamic elements"""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.layers = []
+
+    def add_static(self, build):
+        layer = HudLayer(build)
+        self.layers.append(layer)
+        return layer
+
+    def add_widget(self, bind, build):
+        widget = HudWidget(bind, build)
+        self.layers.append(widget)
+        return widget
+
+    def add_dynamic(self, build):
+        layer = HudDynamic(build)
+        self.layers.append(layer)
+        return layer
+
+    @property
+    def uploads(self):
+        """Total number of display list compilations, for verifying the cache"""
+        return sum(layer.uploads for layer in self.layers)
+
+    def draw(self):
+        glDisable(GL_LIGHTING)
+        glDisable(GL_DEPTH_TEST)
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glOrtho(0, self.width, 0, self.height, -1, 1)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+
+        for layer in self.layers:
+            layer.draw()
+
+        glPopMatrix()
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_LIGHTING)
@@ -0,0 +1,102 @@
+import argparse
+import collections
+import threading
+
+# A trigger press ("shoot") or the start of movement ("move"); time is the
+# time.perf_counter() of the event pump that delivered it
+InputEvent = collections.namedtuple("InputEvent", "time player kind")
+
+class InputQueue:
+    """Held input and timestamped input events, handed to the simulation tick.
+
+    SDL only lets the thread that created the window pump events, and
+    keyboard and joystick state only change when it does, so polling from
+    another thread at a higher rate would just re-read the last frame's
+    state. The render loop feeds the queue once per frame instead:
+    set_held() with the input read after the pump, and post() for every
+    trigger press in the event queue, which keeps presses shorter than a
+    frame. pygame does not expose SDL's event timestamps, so events carry
+    the time of the pump that delivered them, the earliest the game can
+    know about them.
+
+    take() hands the newest held input and every event since the last call
+    to the simulation tick, which may run on its own thread.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.held = None
+        self.moving = None
+        self.events = collections.deque()
+        self.frames = 0
+        self.event_count = 0
+
+    def set_held(self, held, when):
+        """Held PlayerInput per player (None for no input) as of the pump at when"""
+        moving = [player_input is not None and player_input.is_moving() for player_input in held]
+        if self.moving is not None:
+            for number, now_moving in enumerate(moving, 1):
+                if now_moving and not self.moving[number - 1]:
+                    self.post(InputEvent(when, number, "move"))
+        self.moving = moving
+        with self.lock:
+            self.held = list(held)
+        self.frames += 1
+
+    def post(self, event):
+        """Add an InputEvent; safe from any thread"""
+        self.events.append(event)
+        self.event_count += 1
+
+    def take(self):
+        """(held inputs, input events since the last call) for one simulation tick"""
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        with self.lock:
+            return self.held, events
+
+    def report(self):
+        return f"input: {self.frames} frames, {self.event_count} events"
+
+def benchmark(seconds=2.0, frame_ms=16.7, tap_ms=4.0, tap_period_ms=37.0):
+    """Short taps kept by the event queue vs seen by a once-per-frame state poll.
+
+    Time is simulated: a tap of tap_ms every tap_period_ms, out of phase with
+    the frames. Also shows how much of each input's latency happens before
+    the pump that stamps it, which stamping at the pump cannot measure.
+    """
+    taps = [i * tap_period_ms / 1000 for i in range(int(seconds * 1000 / tap_period_ms))]
+    queue = InputQueue()
+    frame = frame_ms / 1000
+    polled = 0
+    unseen = []
+    last_pump = -frame
+    pump = frame
+    while pump <= seconds:
+        # What the event queue delivers at this pump, and what a state poll sees
+        for down in taps:
+            if last_pump < down <= pump:
+                queue.post(InputEvent(pump, 1, "shoot"))
+                unseen.append(pump - down)
+        if any(down <= pump < down + tap_ms / 1000 for down in taps):
+            polled += 1
+        queue.set_held([None], pump)
+        queue.take()
+        last_pump = pump
+        pump += frame
+
+    count = len(unseen)
+    print(f"{len(taps)} taps of {tap_ms} ms over {seconds} s at {1000 / frame_ms:.0f} fps")
+    print(f"  per-frame state poll: {polled} seen")
+    print(f"  event queue:          {queue.event_count} seen ({queue.report()})")
+    if count:
+        print(f"  before the pump: mean {sum(unseen) / count * 1000:.1f} ms, "
+              f"max {max(unseen) * 1000:.1f} ms per input, not in the measured latency")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Input queue tap detection")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--frame-ms", type=float, default=16.7)
+    parser.add_argument("--tap-ms", type=float, default=4.0)
+    args = parser.parse_args()
+    benchmark(args.seconds, args.frame_ms, args.tap_ms)
@@ -0,0 +1,202 @@
+import argparse
+import math
+import random
+import struct
+import time
+
+from pvp_server import RandomInput
+from pvp_world import PvPWorld
+
+# Replication messages, one per client per tick:
+#   header  tick, entity count, removal count
+#   PLAYER_UPDATE / BULLET_UPDATE per entity, then REMOVE per entity that
+#   left the client's interest
+UPDATE_HEADER = struct.Struct("<IHH")
+PLAYER_UPDATE = struct.Struct("<BHffhBB")    # kind, number, x, z, rotation (0.1 deg), health, alive | moving << 1
+BULLET_UPDATE = struct.Struct("<BIfffh")     # kind, id, x, y, z, rotation (0.1 deg)
+REMOVE = struct.Struct("<BI")                # kind, id
+PLAYER, BULLET = 1, 2
+
+# (max distance, ticks between updates): near entities every tick, far ones less often
+UPDATE_BANDS = ((15.0, 1), (30.0, 2), (float("inf"), 4))
+
+class SpatialGrid:
+    """Uniform grid over the XZ plane, refilled every tick.
+
+    Entities are bucketed by cell, so a radius query only looks at the
+    cells the circle overlaps instead of every entity in the world.
+    """
+    def __init__(self, cell_size=10.0):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        self.cells.clear()
+
+    def insert(self, key, x, z):
+        cell = (int(math.floor(x / self.cell_size)), int(math.floor(z / self.cell_size)))
+        bucket = self.cells.get(cell)
+        if bucket is None:
+            self.cells[cell] = bucket = []
+        bucket.append((key, x, z))
+
+    def query(self, x, z, radius):
+        """(key, distance) of every entity within radius of (x, z)"""
+        size = self.cell_size
+        x0, x1 = int(math.floor((x - radius) / size)), int(math.floor((x + radius) / size))
+        z0, z1 = int(math.floor((z - radius) / size)), int(math.floor((z + radius) / size))
+        radius_sq = radius * radius
+        for cx in range(x0, x1 + 1):
+            for cz in range(z0, z1 + 1):
+                for key, ex, ez in self.cells.get((cx, cz), ()):
+                    dx = ex - x
+                    dz = ez - z
+                    distance_sq = dx * dx + dz * dz
+                    if distance_sq <= radius_sq:
+                        yield key, math.sqrt(distance_sq)
+
+class InterestManager:
+    """Which players and bullets each client needs, and how often.
+
+    A client sees everything within radius of its player. A portal within
+    radius also shows what is within portal_radius of its destination,
+    counted as the distance to the portal plus the distance from its exit,
+    so e.g. the far side of the ±40 portals is replicated at a reduced rate.
+    """
+    def __init__(self, world, radius=30.0, portal_radius=15.0, cell_size=10.0, bands=UPDATE_BANDS):
+        self.world = world
+        self.radius = radius
+        self.portal_radius = portal_radius
+        self.bands = bands
+        self.grid = SpatialGrid(cell_size)
+        self.entities = {}
+
+    def update(self):
+        """Re-bucket every player and bullet; call once per tick after world.step()"""
+        grid = self.grid
+        grid.clear()
+        entities = self.entities
+        entities.clear()
+        for player in self.world.players:
+            key = (PLAYER, player.number)
+            entities[key] = player
+            grid.insert(key, player.pos[0], player.pos[2])
+        for bullet in self.world.bullets:
+            key = (BULLET, bullet.id)
+            entities[key] = bullet
+            grid.insert(key, bullet.pos[0], bullet.pos[2])
+
+    def relevant(self, player):
+        """{entity key: effective distance} for one client's player"""
+        x, z = player.pos[0], player.pos[2]
+        found = {(PLAYER, player.number): 0.0}
+        for key, distance in self.grid.query(x, z, self.radius):
+            if distance < found.get(key, math.inf):
+                found[key] = distance
+        for portal in self.world.portals:
+            to_portal = math.hypot(portal.x - x, portal.z - z)
+            if to_portal > self.radius:
+                continue
+            for key, distance in self.grid.query(portal.dest_x, portal.dest_z, self.portal_radius):
+                distance += to_portal
+                if distance < found.get(key, math.inf):
+                    found[key] = distance
+        return found
+
+    def interval(self, distance):
+        for max_distance, ticks in self.bands:
+            if distance <= max_distance:
+                return ticks
+        return self.bands[-1][1]
+
+def encode_entity(kind, entity):
+    if kind == PLAYER:
+        flags = entity.alive | (entity.moving << 1)
+        return PLAYER_UPDATE.pack(PLAYER, entity.number, entity.pos[0], entity.pos[2],
+                                  round(entity.rotation * 10) % 3600, max(0, entity.health), flags)
+    return BULLET_UPDATE.pack(BULLET, entity.id, entity.pos[0], entity.pos[1], entity.pos[2],
+                              round(entity.rotation * 10) % 3600)
+
+class ClientView:
+    """Replication state of one client: what it knows and when each entity was last sent"""
+    def __init__(self, player_number):
+        self.player_number = player_number
+        self.sent = {}
+        self.bytes_sent = 0
+        self.entities_sent = 0
+
+    def build_update(self, manager, tick):
+        """This tick's message: entities that are due, and removals for ones that left interest"""
+        player = manager.world.players[self.player_number - 1]
+        relevant = manager.relevant(player)
+        parts = []
+        for key, distance in relevant.items():
+            last = self.sent.get(key)
+            if last is None or tick - last >= manager.interval(distance):
+                parts.append(encode_entity(key[0], manager.entities[key]))
+                self.sent[key] = tick
+        updated = len(parts)
+        for key in [key for key in self.sent if key not in relevant]:
+            parts.append(REMOVE.pack(*key))
+            del self.sent[key]
+        message = UPDATE_HEADER.pack(tick, updated, len(parts) - updated) + b"".join(parts)
+        self.bytes_sent += len(message)
+        self.entities_sent += updated
+        return message
+
+def full_update(world, tick):
+    """Every player and bullet, as replicated without interest management"""
+    parts = [encode_entity(PLAYER, p) for p in world.players]
+    parts += [encode_entity(BULLET, b) for b in world.bullets]
+    return UPDATE_HEADER.pack(tick, len(parts), 0) + b"".join(parts)
+
+def make_large_world(players=32, map_size=200, portal_pairs=6, seed=1):
+    """Players scattered over a map_size * 2 square with portals between random spots"""
+    rng = random.Random(seed)
+    world = PvPWorld(players, map_size)
+    def spot():
+        return rng.uniform(-map_size + 5, map_size - 5), rng.uniform(-map_size + 5, map_size - 5)
+    for player in world.players:
+        player.pos[0], player.pos[2] = spot()
+        player.rotation = rng.uniform(0, 360)
+    for _ in range(portal_pairs):
+        world.add_portal_pair(*spot(), *spot())
+    return world
+
+def benchmark(clients=32, ticks=600, map_size=200, radius=30.0, rate=60, seed=1):
+    """Bytes per client per second with and without interest management"""
+    world = make_large_world(clients, map_size, seed=seed)
+    inputs = RandomInput(clients, seed)
+    manager = InterestManager(world, radius)
+    views = [ClientView(player.number) for player in world.players]
+    full_bytes = 0
+    interest_time = 0.0
+    for _ in range(ticks):
+        world.step(inputs(world), 1000 / rate / 10.0)
+        full_bytes += len(full_update(world, world.tick)) * clients
+
+        start = time.perf_counter()
+        manager.update()
+        for view in views:
+            view.build_update(manager, world.tick)
+        interest_time += time.perf_counter() - start
+
+    seconds = ticks / rate
+    aoi_bytes = sum(view.bytes_sent for view in views)
+    print(f"{clients} clients, {map_size * 2}x{map_size * 2} map, radius {radius}, "
+          f"{len(world.bullets)} bullets at the end, {ticks} ticks")
+    print(f"  full replication:  {full_bytes / clients / seconds / 1024:8.1f} KiB/s per client, "
+          f"{full_bytes / seconds / 1024:8.1f} KiB/s total")
+    print(f"  interest managed:  {aoi_bytes / clients / seconds / 1024:8.1f} KiB/s per client, "
+          f"{aoi_bytes / seconds / 1024:8.1f} KiB/s total ({aoi_bytes / full_bytes:.1%})")
+    print(f"  {sum(view.entities_sent for view in views) / clients / ticks:.1f} entity updates per client per tick, "
+          f"{interest_time / ticks * 1000:.3f} ms per tick for grid and interest")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interest management bandwidth benchmark")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--map-size", type=int, default=200, help="half the map width")
+    parser.add_argument("--radius", type=float, default=30.0)
+    args = parser.parse_args()
+    benchmark(args.clients, args.ticks, args.map_size, args.radius)
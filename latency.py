@@ -0,0 +1,159 @@
+from OpenGL.GL import *
+import argparse
+import collections
+import csv
+import time
+
+CSV_FIELDS = ("settings", "source", "player", "tick", "input_ms", "sim_ms", "flip_ms", "gpu_ms", "latency_ms")
+
+class LatencyRecorder:
+    """Input-to-photon latency, from the input stamp to the flip that shows it.
+
+    Inputs are stamped where they enter the game: stamp() for pygame events
+    read on the render thread, consumed() for queued input events with the tick
+    that applied them. simulated() notes when each tick finished, and
+    after_flip() resolves every input whose tick is now on screen.
+
+    flip() returning only means the swap was queued, so sync bounds the GPU:
+      None     flip time only
+      "finish" glFinish() after every flip; no frames are rendered ahead
+      "fence"  a fence after every flip, waited on at the start of the next
+               frame; one frame may be rendered ahead
+    stamp(), consumed() and simulated() may run on the simulation thread;
+    frame_start() and after_flip() belong to the render thread.
+    """
+    def __init__(self, sync=None, settings=""):
+        if sync == "fence" and not bool(glFenceSync):
+            sync = "finish"
+        self.sync = sync
+        self.settings = settings
+        self.start = time.perf_counter()
+        self.pending = collections.deque()     # (tick, source, player, input time)
+        self.tick_times = {}
+        self.records = []
+        self.fence = None
+        self.awaiting_gpu = []
+
+    def stamp(self, source, player, tick, when=None):
+        """An input that will first be seen by the simulation at tick"""
+        if when is None:
+            when = time.perf_counter()
+        self.pending.append((tick, source, player, when))
+
+    def consumed(self, tick, events):
+        """Queued input events applied by tick"""
+        for event in events:
+            self.pending.append((tick, event.kind, event.player, event.time))
+
+    def simulated(self, tick, when=None):
+        self.tick_times[tick] = time.perf_counter() if when is None else when
+
+    def frame_start(self):
+        """Fence mode: wait for the previous frame to finish on the GPU"""
+        if self.fence is None:
+            return
+        glClientWaitSync(self.fence, GL_SYNC_FLUSH_COMMANDS_BIT, 1000000000)
+        glDeleteSync(self.fence)
+        self.fence = None
+        self.resolve_gpu(time.perf_counter())
+
+    def after_flip(self, tick):
+        """Call right after pygame.display.flip() with the tick that was drawn"""
+        flip = time.perf_counter()
+        gpu = None
+        if self.sync == "finish":
+            glFinish()
+            gpu = time.perf_counter()
+
+        # Only the render thread pops, so entries appended meanwhile are kept
+        ready = []
+        for _ in range(len(self.pending)):
+            entry = self.pending.popleft()
+            if entry[0] <= tick:
+                ready.append(entry)
+            else:
+                self.pending.append(entry)
+        for entry_tick, source, player, when in ready:
+            record = [source, player, entry_tick, when, self.tick_times.get(entry_tick), flip, gpu]
+            self.records.append(record)
+            if self.sync == "fence":
+                self.awaiting_gpu.append(record)
+
+        # Tick times are only needed until the tick is on screen
+        for old in [t for t in list(self.tick_times) if t <= tick]:
+            del self.tick_times[old]
+
+        if self.sync == "fence":
+            self.fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+    def resolve_gpu(self, when):
+        for record in self.awaiting_gpu:
+            record[6] = when
+        self.awaiting_gpu = []
+
+    def rows(self):
+        """CSV rows with times in ms since the recorder was created"""
+        def ms(t):
+            return "" if t is None else f"{(t - self.start) * 1000:.3f}"
+        for source, player, tick, when, sim, flip, gpu in self.records:
+            end = gpu if gpu is not None else flip
+            yield {"settings": self.settings, "source": source, "player": player, "tick": tick,
+                   "input_ms": ms(when), "sim_ms": ms(sim), "flip_ms": ms(flip), "gpu_ms": ms(gpu),
+                   "latency_ms": f"{(end - when) * 1000:.3f}"}
+
+    def write_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def latencies(self):
+        return [float(row["latency_ms"]) for row in self.rows()]
+
+    def report(self):
+        return summary(self.settings or "latency", self.latencies())
+
+def summary(label, samples):
+    if not samples:
+        return f"{label}: no inputs measured"
+    samples = sorted(samples)
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(len(samples) * p))]
+    mean = sum(samples) / len(samples)
+    return (f"{label}: {len(samples)} inputs, mean {mean:.1f} ms, p50 {percentile(0.5):.1f} ms, "
+            f"p95 {percentile(0.95):.1f} ms, p99 {percentile(0.99):.1f} ms, max {samples[-1]:.1f} ms")
+
+def histogram(samples, bucket_ms=4.0, width=50):
+    """Text histogram of latencies, one line per bucket"""
+    if not samples:
+        return []
+    counts = collections.Counter(int(s // bucket_ms) for s in samples)
+    peak = max(counts.values())
+    lines = []
+    for bucket in range(min(counts), max(counts) + 1):
+        count = counts.get(bucket, 0)
+        bar = "#" * round(count / peak * width)
+        lines.append(f"{bucket * bucket_ms:6.0f}-{(bucket + 1) * bucket_ms:<4.0f} ms {count:6d} {bar}")
+    return lines
+
+def read_csv(path, source=None):
+    """Latencies per settings label from one or more runs written by write_csv()"""
+    runs = collections.OrderedDict()
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            if source is None or row["source"] == source:
+                runs.setdefault(row["settings"], []).append(float(row["latency_ms"]))
+    return runs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare input-to-photon latency runs")
+    parser.add_argument("csv", nargs="+", help="files written by FPS_PvP.py --latency-csv")
+    parser.add_argument("--bucket", type=float, default=4.0, help="histogram bucket in ms")
+    parser.add_argument("--source", help="only count one input source (shoot, move, event)")
+    args = parser.parse_args()
+
+    for path in args.csv:
+        for settings, samples in read_csv(path, args.source).items():
+            print(summary(f"{path} [{settings}]", samples))
+            for line in histogram(samples, args.bucket):
+                print("  " + line)
@@ -0,0 +1,223 @@
+import argparse
+import bisect
+import collections
+import gc
+import http.server
+import threading
+import time
+
+# Prometheus text format metrics. Recording is a plain attribute update
+# (plus a bisect for histograms) on the game thread; the text is only built
+# when the HTTP thread is scraped, so reads may be a tick out of date but
+# recording never takes a lock.
+
+TICK_BUCKETS = (0.0005, 0.001, 0.002, 0.004, 0.008, 0.016, 0.033, 0.066)
+GC_BUCKETS = (0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05)
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=None, fn=None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.fn = fn
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        value = self.fn() if self.fn else self.value
+        yield self.name + format_labels(self.labels), value
+
+class Gauge(Counter):
+    """A value that goes up and down; fn makes it computed at scrape time"""
+    kind = "gauge"
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets, labels=None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.bounds = list(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.bounds + ["+Inf"], self.counts):
+            cumulative += count
+            yield self.name + "_bucket" + format_labels(dict(self.labels, le=bound)), cumulative
+        yield self.name + "_sum" + format_labels(self.labels), self.sum
+        yield self.name + "_count" + format_labels(self.labels), cumulative
+
+class Registry:
+    def __init__(self):
+        self.metrics = collections.OrderedDict()
+
+    def add(self, metric):
+        self.metrics.setdefault(metric.name, []).append(metric)
+        return metric
+
+    def counter(self, name, help, labels=None, fn=None):
+        return self.add(Counter(name, help, labels, fn))
+
+    def gauge(self, name, help, labels=None, fn=None):
+        return self.add(Gauge(name, help, labels, fn))
+
+    def histogram(self, name, help, buckets, labels=None):
+        return self.add(Histogram(name, help, buckets, labels))
+
+    def render(self):
+        lines = []
+        for name, metrics in list(self.metrics.items()):
+            lines.append(f"# HELP {name} {metrics[0].help}")
+            lines.append(f"# TYPE {name} {metrics[0].kind}")
+            for metric in metrics:
+                for sample, value in metric.samples():
+                    lines.append(f"{sample} {value}")
+        return "\n".join(lines) + "\n"
+
+def serve(registry, port, host="127.0.0.1"):
+    """Serve registry.render() at /metrics from a daemon thread; returns the server"""
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class GCPauseMonitor:
+    """Times every cyclic garbage collection through gc.callbacks"""
+    def __init__(self, registry):
+        self.pauses = registry.histogram("python_gc_pause_seconds", "Cyclic GC pause", GC_BUCKETS)
+        self.collections = [registry.counter("python_gc_collections_total", "Cyclic GC runs",
+                                             {"generation": generation}) for generation in range(3)]
+        self.start = None
+        gc.callbacks.append(self.callback)
+
+    def callback(self, phase, info):
+        if phase == "start":
+            self.start = time.perf_counter()
+        elif self.start is not None:
+            self.pauses.observe(time.perf_counter() - self.start)
+            self.collections[info["generation"]].inc()
+            self.start = None
+
+    def remove(self):
+        gc.callbacks.remove(self.callback)
+
+class KillRate:
+    """Kills in the last minute, counted from kill timestamps at scrape time"""
+    def __init__(self):
+        self.times = collections.deque()
+
+    def add(self, count):
+        now = time.monotonic()
+        for _ in range(count):
+            self.times.append(now)
+
+    def per_minute(self):
+        cutoff = time.monotonic() - 60
+        while self.times and self.times[0] < cutoff:
+            self.times.popleft()
+        return len(self.times)
+
+class PvPMetrics:
+    """Everything the PvP loops export. Call tick() once per world step.
+
+    Bullet, query and teleport numbers are read off the world at scrape
+    time, so the game itself only pays for tick() on every tick.
+    """
+    def __init__(self, world, registry=None):
+        self.registry = registry = registry or Registry()
+        self.world = world
+        self.tick_seconds = registry.histogram("pvp_tick_seconds", "World step duration", TICK_BUCKETS)
+        self.kills = registry.counter("pvp_kills_total", "Players killed")
+        self.kill_rate = KillRate()
+        registry.gauge("pvp_kills_per_minute", "Kills in the last 60 seconds", fn=self.kill_rate.per_minute)
+        registry.gauge("pvp_bullets", "Live bullets", fn=lambda: len(self.world.bullets))
+        registry.gauge("pvp_tick", "Current world tick", fn=lambda: self.world.tick)
+        registry.counter("pvp_obstacle_queries_total", "Player moves and bullets tested against the obstacles",
+                         fn=lambda: self.world.obstacle_queries)
+        registry.counter("pvp_portal_queries_total", "Player/portal pairs tested for teleports",
+                         fn=lambda: self.world.portal_queries)
+        registry.counter("pvp_teleports_total", "Players sent through a portal",
+                         fn=lambda: self.world.teleports)
+        self.gc = GCPauseMonitor(registry)
+
+    def tick(self, seconds):
+        self.tick_seconds.observe(seconds)
+        kills = len(self.world.kills)
+        if kills:
+            self.kills.inc(kills)
+            self.kill_rate.add(kills)
+
+def benchmark(iterations=1000000):
+    """Nanoseconds per recorded metric"""
+    registry = Registry()
+    counter = registry.counter("bench_total", "Benchmark counter")
+    gauge = registry.gauge("bench_value", "Benchmark gauge")
+    histogram = registry.histogram("bench_seconds", "Benchmark histogram", TICK_BUCKETS)
+    values = [i % 97 / 5000 for i in range(1000)]
+
+    def measure(label, body):
+        start = time.perf_counter()
+        body()
+        elapsed = time.perf_counter() - start
+        print(f"  {label:22} {elapsed / iterations * 1e9:6.0f} ns")
+
+    def loop():
+        for i in range(iterations):
+            pass
+    def inc():
+        for i in range(iterations):
+            counter.inc()
+    def set_value():
+        for i in range(iterations):
+            gauge.set(i)
+    def observe():
+        for i in range(iterations):
+            histogram.observe(values[i % 1000])
+
+    print(f"{iterations} recordings each (loop overhead included)")
+    measure("empty loop", loop)
+    measure("Counter.inc()", inc)
+    measure("Gauge.set()", set_value)
+    measure("Histogram.observe()", observe)
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"  render {len(text)} bytes in {(time.perf_counter() - start) * 1e6:.0f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Metrics recording cost")
+    parser.add_argument("--iterations", type=int, default=1000000)
+    args = parser.parse_args()
+    benchmark(args.iterations)
@@ -0,0 +1,399 @@
+import argparse
+import heapq
+import math
+import time
+
+from pvp_world import IDLE_INPUT, TURN_SPEED, PlayerInput, PvPWorld
+from visibility import VisibilityService
+
+# Bot players for FPS_PvP. Bots produce PlayerInput like a keyboard or a
+# controller does, so they go through the same move_player/shoot rules and
+# replay, stream and spectate like humans.
+#
+# Navigation is a grid over the map with portals as extra edges. Instead of a
+# path search per bot, every target player has one flow field, the distance
+# from each cell to the target's cell, which all bots chasing that player
+# share: a bot just steps to the neighbouring cell with the lowest distance.
+# A target that steps into a neighbouring cell keeps its field: the field
+# still leads bots to the old cell, one step short, and from there they steer
+# straight at the target. Only a target two or more cells from its field's
+# cell starts a new search, which is a full Dijkstra search; a per tick
+# budget of cells spreads its cost over several ticks, while bots keep
+# following the last complete field.
+
+STRAIGHT, DIAGONAL = 10, 14   # Cell step costs (x10, so distances stay integers)
+PORTAL_COST = 10
+UNREACHED = 1 << 30
+
+DIRECT_RANGE = 6.0    # Closer than this a bot steers straight at its target
+FIRE_RANGE = 25.0
+AIM_TOLERANCE = 4.0   # Degrees
+RETARGET_TICKS = 60
+
+class NavGrid:
+    """Walkable cells over the map, plus which cells a portal moves a player out of.
+
+    A cell is walkable if a player can stand at its centre and corners; the
+    corner samples keep paths a little clear of obstacles, since a blocked
+    move does not slide along the wall.
+    """
+    def __init__(self, world, cell_size=2.0):
+        self.cell_size = cell_size
+        self.origin = -world.map_size
+        self.size = size = int(math.ceil(2 * world.map_size / cell_size))
+        edge = world.map_size - 1
+        inset = cell_size / 2 * 0.9
+        samples = ((0, 0), (-inset, -inset), (-inset, inset), (inset, -inset), (inset, inset))
+        # Building the grid is not gameplay; keep it out of the blocked() metrics
+        queries = world.obstacle_queries
+        self.walkable = walkable = bytearray(size * size)
+        for cell in range(size * size):
+            x, z = self.center(cell)
+            if abs(x) <= edge and abs(z) <= edge:
+                walkable[cell] = not any(world.blocked(x + dx, z + dz) for dx, dz in samples)
+        world.obstacle_queries = queries
+
+        # Eight neighbours, diagonals only where both cells beside them are
+        # walkable so paths do not cut obstacle corners
+        self.neighbors = []
+        for cell in range(size * size):
+            col, row = cell % size, cell // size
+            found = []
+            for dc, dr in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)):
+                c, r = col + dc, row + dr
+                if not (0 <= c < size and 0 <= r < size):
+                    continue
+                if dc and dr:
+                    if not (walkable[row * size + c] and walkable[r * size + col]):
+                        continue
+                    found.append((r * size + c, DIAGONAL))
+                else:
+                    found.append((r * size + c, STRAIGHT))
+            self.neighbors.append(found)
+
+        # Portal edges, reversed for the flow field: destination cell -> entry cells
+        self.portal_entries = {}
+        self.portal_centers = {}
+        for portal in world.portals:
+            exit_cell = self.cell_at(portal.dest_x, portal.dest_z)
+            for cell in self.cells_near(portal.x, portal.z, portal.radius):
+                self.portal_entries.setdefault(exit_cell, []).append(cell)
+                self.portal_centers[cell] = (portal.x, portal.z)
+
+    def center(self, cell):
+        col, row = cell % self.size, cell // self.size
+        return self.origin + (col + 0.5) * self.cell_size, self.origin + (row + 0.5) * self.cell_size
+
+    def cell_at(self, x, z):
+        col = min(self.size - 1, max(0, int((x - self.origin) / self.cell_size)))
+        row = min(self.size - 1, max(0, int((z - self.origin) / self.cell_size)))
+        return row * self.size + col
+
+    def cells_near(self, x, z, radius):
+        """The cell containing (x, z) and every walkable cell whose centre is within radius"""
+        cells = {self.cell_at(x, z)}
+        reach = int(radius / self.cell_size) + 1
+        home = self.cell_at(x, z)
+        col, row = home % self.size, home // self.size
+        for r in range(max(0, row - reach), min(self.size, row + reach + 1)):
+            for c in range(max(0, col - reach), min(self.size, col + reach + 1)):
+                cell = r * self.size + c
+                cx, cz = self.center(cell)
+                if self.walkable[cell] and math.hypot(cx - x, cz - z) < radius:
+                    cells.add(cell)
+        return cells
+
+class FlowField:
+    """Distance from every cell to one target cell, shared by all bots chasing it.
+
+    distance is the last complete field (None until the first search is
+    done). request() gives the target's current cell, which only needs a
+    new search if it is not target or a neighbour of it. The Dijkstra
+    search runs in advance() calls of a bounded number of cells, and
+    replaces distance only when it is done, so bots never see a half-built
+    field.
+    """
+    def __init__(self, grid, target):
+        self.grid = grid
+        self.target = target
+        self.wanted = target
+        self.distance = None
+        self.search = None
+        self.searches = 0
+        self.start(target)
+
+    def request(self, cell):
+        self.wanted = cell
+        if self.search is None and not self.covers(cell):
+            self.start(cell)
+
+    def covers(self, cell):
+        """True if the field for target still serves a target in cell"""
+        return cell == self.target or any(neighbor == cell for neighbor, _ in self.grid.neighbors[self.target])
+
+    def start(self, cell):
+        distance = [UNREACHED] * (self.grid.size * self.grid.size)
+        distance[cell] = 0
+        self.search = (cell, distance, [(0, cell)])
+        self.searches += 1
+
+    def advance(self, budget):
+        """Expand up to budget cells of the running search; returns how many were expanded"""
+        if self.search is None:
+            return 0
+        cell, distance, heap = self.search
+        walkable = self.grid.walkable
+        neighbors = self.grid.neighbors
+        portal_entries = self.grid.portal_entries
+        expanded = 0
+        while heap and expanded < budget:
+            d, current = heapq.heappop(heap)
+            if d > distance[current]:
+                continue
+            expanded += 1
+            # Every neighbour gets a distance, so a bot standing in a cell
+            # marked unwalkable can still step out; only walkable cells expand
+            for neighbor, cost in neighbors[current]:
+                if d + cost < distance[neighbor]:
+                    distance[neighbor] = d + cost
+                    if walkable[neighbor]:
+                        heapq.heappush(heap, (d + cost, neighbor))
+            for entry in portal_entries.get(current, ()):
+                if d + PORTAL_COST < distance[entry]:
+                    distance[entry] = d + PORTAL_COST
+                    heapq.heappush(heap, (d + PORTAL_COST, entry))
+        if not heap:
+            self.distance = distance
+            self.target = cell
+            self.search = None
+            if not self.covers(self.wanted):
+                self.start(self.wanted)
+        return expanded
+
+    def step_from(self, cell):
+        """Where to head from cell: a neighbouring cell's centre, a portal, or None at the target"""
+        distance = self.distance
+        # At the old target cell, or the target's, the rest of the way is straight ahead
+        if distance is None or cell == self.wanted or distance[cell] == 0:
+            return None
+        best = distance[cell]
+        best_cell = None
+        for neighbor, _ in self.grid.neighbors[cell]:
+            if distance[neighbor] < best and self.grid.walkable[neighbor]:
+                best = distance[neighbor]
+                best_cell = neighbor
+        if best_cell is not None:
+            return self.grid.center(best_cell)
+        return self.grid.portal_centers.get(cell)
+
+def angle_to(dx, dz):
+    """Player rotation that faces along (dx, dz)"""
+    return math.degrees(math.atan2(dx, dz))
+
+def angle_diff(a, b):
+    return (a - b + 180) % 360 - 180
+
+def steer(player, move_x, move_z, face):
+    """PlayerInput that moves along the unit vector (move_x, move_z) while turning to face"""
+    rotation = math.radians(player.rotation)
+    # Forward is (sin r, cos r) and strafe right is (-cos r, sin r)
+    forward = move_x * math.sin(rotation) + move_z * math.cos(rotation)
+    strafe = -move_x * math.cos(rotation) + move_z * math.sin(rotation)
+    turn = max(-1.0, min(1.0, angle_diff(face, player.rotation) / TURN_SPEED))
+    return PlayerInput(forward, strafe, turn)
+
+class BotPlayers:
+    """Input for the bot-controlled players, called once per tick before world.step().
+
+    Each bot chases the nearest living enemy, keeping a target for
+    RETARGET_TICKS, and shoots when it is in range, in sight and aimed.
+    Only a target in sight is approached head on. Flow fields
+    are kept per target player and share budget cells of search work per
+    tick between them. Once max_fields players are being chased, bots pick
+    the nearest of those, so fields stay shared as the bot count grows.
+    Targets of dead bots and dead targets are dropped every tick, and a
+    field goes as soon as nobody chases its player. If more than max_fields
+    players are still chased, only the most chased keep a field. Bots
+    without a field, or whose field is not done yet, steer straight at
+    their target.
+    """
+    def __init__(self, world, numbers=None, grid=None, visibility=None, budget=1000, max_fields=8,
+                 fire_interval=20):
+        self.grid = grid or NavGrid(world)
+        self.visibility = visibility or VisibilityService(world)
+        self.numbers = sorted(numbers) if numbers else [p.number for p in world.players]
+        self.budget = budget
+        self.max_fields = max_fields
+        self.fire_interval = fire_interval
+        self.fields = {}
+        self.targets = {}      # bot number -> (target number, retarget tick)
+        self.last_shot = {}
+        self.last_pos = {}
+        self.turn = 0          # Which field gets first go at the budget
+        self.expanded = 0
+        self.searches = 0      # Searches of fields that have since been dropped
+        self.peak_fields = 0
+        self.stuck = 0
+
+    def __call__(self, world, inputs=None):
+        """One PlayerInput per player: inputs (or idle) for humans, bot input for bots"""
+        result = list(inputs) if inputs is not None else [IDLE_INPUT] * len(world.players)
+        self.prune(world)
+        targets = {}
+        for number in self.numbers:
+            bot = world.players[number - 1]
+            if bot.alive:
+                targets[number] = self.choose_target(world, bot)
+        self.update_fields(world)
+        for number in self.numbers:
+            result[number - 1] = self.bot_input(world, world.players[number - 1], targets.get(number))
+        return result
+
+    def prune(self, world):
+        """Forget the targets of dead bots and targets that died, so their fields can go"""
+        for number, (target_number, _) in list(self.targets.items()):
+            if not (world.players[number - 1].alive and world.players[target_number - 1].alive):
+                del self.targets[number]
+
+    def choose_target(self, world, bot):
+        target_number, until = self.targets.get(bot.number, (None, 0))
+        if target_number is not None and world.tick < until:
+            return world.players[target_number - 1]
+        enemies = [p for p in world.players if p.alive and p.number != bot.number]
+        if not enemies:
+            self.targets.pop(bot.number, None)
+            return None
+        # This bot's own old target does not count: it is about to be replaced
+        chased = {number for bot_number, (number, _) in self.targets.items() if bot_number != bot.number}
+        if len(chased) >= self.max_fields:
+            enemies = [p for p in enemies if p.number in chased] or enemies
+        target = min(enemies, key=lambda p: (p.pos[0] - bot.pos[0]) ** 2 + (p.pos[2] - bot.pos[2]) ** 2)
+        self.targets[bot.number] = (target.number, world.tick + RETARGET_TICKS)
+        return target
+
+    def update_fields(self, world):
+        chasers = {}
+        for target, _ in self.targets.values():
+            chasers[target] = chasers.get(target, 0) + 1
+        wanted = set(chasers)
+        if len(wanted) > self.max_fields:
+            # Keep the most chased targets, existing fields first on a tie
+            ranked = sorted(chasers, key=lambda n: (chasers[n], n in self.fields), reverse=True)
+            wanted = set(ranked[:self.max_fields])
+        for number in list(self.fields):
+            if number not in wanted:
+                self.searches += self.fields.pop(number).searches
+        for number in wanted:
+            player = world.players[number - 1]
+            cell = self.grid.cell_at(player.pos[0], player.pos[2])
+            field = self.fields.get(number)
+            if field is None:
+                self.fields[number] = FlowField(self.grid, cell)
+            else:
+                field.request(cell)
+        self.peak_fields = max(self.peak_fields, len(self.fields))
+
+        searching = [field for field in self.fields.values() if field.search is not None]
+        if not searching:
+            return
+        self.turn = (self.turn + 1) % len(searching)
+        budget = self.budget
+        for field in searching[self.turn:] + searching[:self.turn]:
+            if budget <= 0:
+                break
+            expanded = field.advance(budget)
+            budget -= expanded
+            self.expanded += expanded
+
+    def bot_input(self, world, bot, target):
+        if not bot.alive or target is None:
+            return IDLE_INPUT
+        x, z = bot.pos[0], bot.pos[2]
+        dx, dz = target.pos[0] - x, target.pos[2] - z
+        distance = math.hypot(dx, dz)
+        in_sight = distance < FIRE_RANGE and self.visibility.can_see(bot, target)
+
+        # A move that was blocked last tick leaves the bot where it was: head
+        # for the middle of its cell, which is clear, before following the field
+        last = self.last_pos.get(bot.number)
+        self.last_pos[bot.number] = (x, z)
+        if last == (x, z) and distance >= DIRECT_RANGE:
+            self.stuck += 1
+            goal = self.grid.center(self.grid.cell_at(x, z))
+        elif distance < DIRECT_RANGE and in_sight:
+            goal = (target.pos[0], target.pos[2])
+        else:
+            field = self.fields.get(target.number)
+            goal = field.step_from(self.grid.cell_at(x, z)) if field else None
+            if goal is None:
+                goal = (target.pos[0], target.pos[2])
+
+        move_x, move_z = goal[0] - x, goal[1] - z
+        length = math.hypot(move_x, move_z)
+        if (distance < DIRECT_RANGE / 2 and in_sight) or length < 1e-6:
+            move_x = move_z = 0.0
+        else:
+            move_x /= length
+            move_z /= length
+        aim = angle_to(dx, dz)
+        face = aim if in_sight or length < 1e-6 else angle_to(move_x, move_z)
+        bot_input = steer(bot, move_x, move_z, face)
+
+        if (in_sight and abs(angle_diff(aim, bot.rotation)) < AIM_TOLERANCE
+                and world.tick - self.last_shot.get(bot.number, -self.fire_interval) >= self.fire_interval):
+            self.last_shot[bot.number] = world.tick
+            bot_input.shoot = True
+        return bot_input
+
+    def report(self):
+        searches = self.searches + sum(field.searches for field in self.fields.values())
+        return (f"bots: {len(self.numbers)}, {len(self.fields)} flow fields live "
+                f"(at most {self.peak_fields}, cap {self.max_fields}), {searches} searches, "
+                f"{self.expanded} cells expanded, {self.stuck} blocked-move recoveries\n  "
+                + self.visibility.report())
+
+def benchmark(bots=64, ticks=1200, budget=1000):
+    """Per-tick cost of 64 bots in the standard arena, against the world step itself"""
+    world = PvPWorld(bots)
+    start = time.perf_counter()
+    players = BotPlayers(world, budget=budget)
+    grid = players.grid
+    setup = time.perf_counter() - start
+    start = time.perf_counter()
+    FlowField(grid, grid.cell_at(0, 30)).advance(UNREACHED)
+    full_field = time.perf_counter() - start
+
+    think, step = [], []
+    teleports = world.teleports
+    kills = 0
+    for _ in range(ticks):
+        start = time.perf_counter()
+        inputs = players(world)
+        middle = time.perf_counter()
+        world.step(inputs)
+        end = time.perf_counter()
+        think.append(middle - start)
+        step.append(end - middle)
+        kills += len(world.kills)
+
+    def ms(samples, p):
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+    walkable = sum(grid.walkable)
+    print(f"{bots} bots, {ticks} ticks; nav grid {grid.size}x{grid.size} cells of {grid.cell_size} "
+          f"({walkable} walkable) built in {setup * 1000:.1f} ms")
+    print(f"  one complete flow field: {full_field * 1000:.2f} ms; search budget {budget} cells per tick")
+    print(f"  bot input: mean {sum(think) / ticks * 1000:.3f} ms, p50 {ms(think, 0.5):.3f} ms, "
+          f"p99 {ms(think, 0.99):.3f} ms per tick")
+    print(f"  world step: mean {sum(step) / ticks * 1000:.3f} ms, p99 {ms(step, 0.99):.3f} ms per tick")
+    print(f"  {kills} kills, {world.teleports - teleports} teleports, {players.expanded / ticks:.0f} cells expanded "
+          f"per tick, {players.stuck / bots / ticks:.1%} of bot ticks recovering from a blocked move")
+    print("  " + players.report())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bot players benchmark in the PvP arena")
+    parser.add_argument("--bots", type=int, default=64)
+    parser.add_argument("--ticks", type=int, default=1200)
+    parser.add_argument("--budget", type=int, default=1000, help="flow field cells searched per tick")
+    args = parser.parse_args()
+    benchmark(args.bots, args.ticks, args.budget)
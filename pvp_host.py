@@ -0,0 +1,235 @@
+import argparse
+import heapq
+import itertools
+import multiprocessing
+import time
+
+from pvp_server import SPIN_SECONDS, MatchServer, RandomInput, TickStats, sleep_until
+from pvp_world import PvPWorld
+
+# Spreads tick phases evenly however many matches have been added so far
+GOLDEN_RATIO = 0.6180339887498949
+
+# Placement guess for a match that has not reported any ticks yet
+DEFAULT_MS_PER_PLAYER = 0.15
+
+class MatchHost:
+    """Many independent PvP matches ticked by one interleaving scheduler.
+
+    Each match runs at the same rate but with its own phase inside the tick
+    period, so their ticks are spread over the period instead of all falling
+    due together. A min-heap of (due time, match id) picks the next one; a
+    late match only delays its own next tick, and an overrun resets that
+    match's schedule instead of making it catch up in a burst.
+    """
+    def __init__(self, rate=60, spin=SPIN_SECONDS, stagger=True):
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.spin = spin
+        self.stagger = stagger
+        self.matches = {}
+        self.lengths = {}
+        self.heap = []
+        self.added = 0
+        self.finished = []
+        self.busy = 0.0
+        self.started = time.perf_counter()
+
+    def add(self, match_id, players=2, seed=1, ticks=None):
+        world = PvPWorld(players)
+        self.matches[match_id] = MatchServer(world, RandomInput(players, seed), self.rate)
+        self.lengths[match_id] = ticks
+        phase = (self.added * GOLDEN_RATIO) % 1.0 if self.stagger else 0.0
+        self.added += 1
+        now = time.perf_counter()
+        due = now - (now - self.started) % self.period + phase * self.period
+        if due < now:
+            due += self.period
+        heapq.heappush(self.heap, (due, match_id))
+
+    def remove(self, match_id):
+        # Its heap entry is dropped when it comes due
+        self.matches.pop(match_id, None)
+        self.lengths.pop(match_id, None)
+
+    def next_due(self):
+        while self.heap and self.heap[0][1] not in self.matches:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def run_due(self):
+        """Tick the next match once it is due"""
+        due, match_id = heapq.heappop(self.heap)
+        match = self.matches[match_id]
+        sleep_until(due, self.spin)
+        start = time.perf_counter()
+        cpu = match.tick()
+        end = time.perf_counter()
+        match.stats.record(cpu, end - start, start - due)
+        self.busy += end - start
+
+        length = self.lengths[match_id]
+        if length is not None and match.world.tick >= length:
+            self.finished.append((match_id, match.score()))
+            self.remove(match_id)
+            return
+        due += self.period
+        if end > due:
+            match.stats.overruns += 1
+            due = end
+        heapq.heappush(self.heap, (due, match_id))
+
+    def metrics(self):
+        """Per-match metrics since the last call, plus host load"""
+        elapsed = time.perf_counter() - self.started
+        matches = {}
+        for match_id, match in self.matches.items():
+            matches[match_id] = dict(match.stats.metrics(), players=len(match.world.players),
+                                     tick=match.world.tick)
+            match.stats = TickStats()
+        host = {"matches": matches, "finished": self.finished,
+                "busy": self.busy / elapsed if elapsed else 0.0}
+        self.finished = []
+        self.busy = 0.0
+        self.started = time.perf_counter() - (elapsed % self.period)
+        return host
+
+def _host(connection, rate, spin, stagger):
+    host = MatchHost(rate, spin, stagger)
+    while True:
+        due = host.next_due()
+        # Wait for commands until the next tick is (almost) due
+        timeout = 0.1 if due is None else due - time.perf_counter() - spin
+        if timeout <= 0 or not connection.poll(timeout):
+            if due is not None:
+                host.run_due()
+            continue
+        command, *arguments = connection.recv()
+        if command == "add":
+            host.add(*arguments)
+        elif command == "remove":
+            host.remove(*arguments)
+        elif command == "metrics":
+            connection.send(host.metrics())
+        elif command == "stop":
+            connection.send(None)
+            return
+
+class MatchSupervisor:
+    """One MatchHost process per core, with each new match placed on the least loaded host.
+
+    Load is the estimated fraction of a core a host's matches need: measured
+    CPU per tick times the tick rate once a match has reported, a per-player
+    guess before that.
+    """
+    def __init__(self, hosts=None, rate=60, spin=SPIN_SECONDS, stagger=True):
+        self.rate = rate
+        self.connections = []
+        self.processes = []
+        self.placement = {}
+        self.costs = {}       # match id -> estimated ms per tick
+        self.metrics = {}     # match id -> latest metrics
+        self.totals = {}      # match id -> (ticks, overruns) since it started
+        self.finished = {}
+        self.busy = []
+        self.ms_per_player = DEFAULT_MS_PER_PLAYER
+        self.match_ids = itertools.count(1)
+        for _ in range(hosts or multiprocessing.cpu_count()):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_host, daemon=True, args=(child, rate, spin, stagger))
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+            self.busy.append(0.0)
+
+    def load(self, host):
+        cost = sum(self.costs[m] for m, h in self.placement.items() if h == host)
+        return cost * self.rate / 1000
+
+    def add_match(self, players=2, seed=None, ticks=None):
+        match_id = next(self.match_ids)
+        host = min(range(len(self.connections)), key=self.load)
+        self.placement[match_id] = host
+        self.costs[match_id] = players * self.ms_per_player
+        self.connections[host].send(("add", match_id, players, match_id if seed is None else seed, ticks))
+        return match_id
+
+    def remove_match(self, match_id):
+        host = self.placement.pop(match_id)
+        self.costs.pop(match_id)
+        self.connections[host].send(("remove", match_id))
+
+    def _collect(self, host, reply):
+        self.busy[host] = reply["busy"]
+        for match_id, score in reply["finished"]:
+            self.finished[match_id] = score
+            self.placement.pop(match_id, None)
+            self.costs.pop(match_id, None)
+        for match_id, metrics in reply["matches"].items():
+            self.metrics[match_id] = metrics
+            ticks, overruns = self.totals.get(match_id, (0, 0))
+            self.totals[match_id] = (ticks + metrics["ticks"], overruns + metrics["overruns"])
+            if metrics["ticks"] and match_id in self.costs:
+                self.costs[match_id] = metrics["cpu_mean"]
+        measured = [(m["cpu_mean"], m["players"]) for m in self.metrics.values() if m["ticks"]]
+        if measured:
+            self.ms_per_player = sum(c for c, _ in measured) / sum(p for _, p in measured)
+
+    def poll(self):
+        """Fetch and reset every host's metrics"""
+        for connection in self.connections:
+            connection.send(("metrics",))
+        for host, connection in enumerate(self.connections):
+            self._collect(host, connection.recv())
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(("stop",))
+        for connection in self.connections:
+            connection.recv()
+        for process in self.processes:
+            process.join()
+
+    def report(self):
+        lines = [f"{'host':>4} {'matches':>7} {'load':>6} {'busy':>6}"]
+        for host in range(len(self.connections)):
+            count = sum(1 for h in self.placement.values() if h == host)
+            lines.append(f"{host:4d} {count:7d} {self.load(host):6.1%} {self.busy[host]:6.1%}")
+        lines.append(f"{'match':>5} {'host':>4} {'players':>7} {'cpu ms':>7} {'p99 ms':>7} "
+                     f"{'late p99':>8} {'overruns':>8}")
+        for match_id in sorted(self.metrics):
+            m = self.metrics[match_id]
+            host = self.placement.get(match_id, "-")
+            overruns = self.totals[match_id][1]
+            lines.append(f"{match_id:5d} {host:>4} {m['players']:7d} {m['cpu_mean']:7.3f} {m['cpu_p99']:7.3f} "
+                         f"{m['late_p99']:8.3f} {overruns:8d}")
+        return "\n".join(lines)
+
+    def worst_lateness(self):
+        return max((m["late_p99"] for m in self.metrics.values() if m["ticks"]), default=0.0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many headless PvP matches per process")
+    parser.add_argument("--matches", type=int, default=32)
+    parser.add_argument("--hosts", type=int, help="host processes (default: one per core)")
+    parser.add_argument("--players", default="2,4", help="player counts, cycled over the matches")
+    parser.add_argument("--rate", type=int, default=60)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--spin-us", type=int, default=int(SPIN_SECONDS * 1e6))
+    parser.add_argument("--no-stagger", action="store_true",
+                        help="tick every match at the same phase, to compare lateness")
+    args = parser.parse_args()
+
+    supervisor = MatchSupervisor(args.hosts, args.rate, args.spin_us / 1e6, not args.no_stagger)
+    player_counts = itertools.cycle(int(p) for p in args.players.split(","))
+    for _ in range(args.matches):
+        supervisor.add_match(next(player_counts))
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.seconds:
+        time.sleep(2.0)
+        supervisor.poll()
+        print(f"{time.perf_counter() - start:5.1f}s: worst match start late p99 "
+              f"{supervisor.worst_lateness():.3f} ms, host busy "
+              + " ".join(f"{busy:.0%}" for busy in supervisor.busy))
+    print(supervisor.report())
+    supervisor.close()
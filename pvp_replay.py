@@ -0,0 +1,210 @@
+import argparse
+import bisect
+import random
+import struct
+import time
+
+from pvp_world import PlayerInput, PvPWorld
+
+# Replay file layout:
+#   header   MAGIC, version, player count, keyframe interval
+#   records  'K' + length + packed world state, before every keyframe_interval-th tick
+#            'T' + frame ms + one 4-byte input per player, for every tick
+#   index    'I' + count + (tick, offset) per keyframe
+#   trailer  INDEX_MAGIC + offset of the index
+# A tick costs 3 + 4 * players bytes, so two players record at 660 bytes/s.
+MAGIC = b"PVPR"
+VERSION = 2
+HEADER = struct.Struct("<4sBBH")
+TICK = struct.Struct("<cH")
+INPUT = struct.Struct("<bbbB")
+KEYFRAME = struct.Struct("<cI")
+INDEX = struct.Struct("<cI")
+INDEX_ENTRY = struct.Struct("<II")
+TRAILER = struct.Struct("<4sI")
+INDEX_MAGIC = b"PVPI"
+
+SHOOT = 1
+PAD = 2
+
+def pack_input(player_input):
+    flags = (SHOOT if player_input.shoot else 0) | (PAD if player_input.pad else 0)
+    return INPUT.pack(round(player_input.forward * 127), round(player_input.strafe * 127),
+                      round(player_input.turn * 127), flags)
+
+def unpack_input(data, offset):
+    forward, strafe, turn, flags = INPUT.unpack_from(data, offset)
+    return PlayerInput(forward / 127, strafe / 127, turn / 127, bool(flags & SHOOT), bool(flags & PAD))
+
+class ReplayRecorder:
+    """Appends every tick's inputs to a replay file, plus periodic keyframes.
+
+    Call record() with the inputs right before world.step() is given them.
+    path may also be an open binary file, e.g. a socket stream for spectators.
+    """
+    def __init__(self, path, world, keyframe_interval=300):
+        self.file = open(path, "wb") if isinstance(path, str) else path
+        self.world = world
+        self.keyframe_interval = keyframe_interval
+        self.index = []
+        self.offset = 0
+        self._write(HEADER.pack(MAGIC, VERSION, len(world.players), keyframe_interval))
+
+    def _write(self, data):
+        self.file.write(data)
+        self.offset += len(data)
+
+    def record(self, frame_ms, inputs):
+        if self.world.tick % self.keyframe_interval == 0:
+            state = self.world.pack_state()
+            self.index.append((self.world.tick, self.offset))
+            self._write(KEYFRAME.pack(b"K", len(state)) + state)
+        self._write(TICK.pack(b"T", min(frame_ms, 0xFFFF)) + b"".join(pack_input(i) for i in inputs))
+
+    def close(self):
+        index_offset = self.offset
+        self._write(INDEX.pack(b"I", len(self.index)))
+        for tick, offset in self.index:
+            self._write(INDEX_ENTRY.pack(tick, offset))
+        self._write(TRAILER.pack(INDEX_MAGIC, index_offset))
+        self.file.close()
+
+class ReplayPlayer:
+    """Plays a replay file back into its own PvPWorld.
+
+    seek() restores the nearest keyframe at or before the target and
+    simulates forward from there, so it costs at most keyframe_interval ticks.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        magic, version, player_count, self.keyframe_interval = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} PvP replay")
+        self.player_count = player_count
+        self.tick_size = TICK.size + INPUT.size * player_count
+
+        trailer_magic, index_offset = TRAILER.unpack_from(self.data, len(self.data) - TRAILER.size)
+        if trailer_magic != INDEX_MAGIC:
+            raise ValueError(f"{path} has no keyframe index (recording did not finish)")
+        _, count = INDEX.unpack_from(self.data, index_offset)
+        self.keyframes = [INDEX_ENTRY.unpack_from(self.data, index_offset + INDEX.size + i * INDEX_ENTRY.size)
+                          for i in range(count)]
+        self.keyframe_ticks = [tick for tick, _ in self.keyframes]
+        self.end = index_offset
+
+        # Every tick after the last keyframe, counted from its record size.
+        # A match quit before its first tick has no keyframe and no ticks.
+        self.ticks = 0
+        if self.keyframes:
+            last_tick, last_offset = self.keyframes[-1]
+            length = KEYFRAME.unpack_from(self.data, last_offset)[1]
+            self.ticks = last_tick + (self.end - last_offset - KEYFRAME.size - length) // self.tick_size
+
+        self.world = PvPWorld(player_count)
+        self.offset = HEADER.size
+
+    def finished(self):
+        return self.offset >= self.end
+
+    def read_tick(self):
+        """(frame ms, inputs) of the next tick, restoring any keyframe on the way"""
+        if self.data[self.offset:self.offset + 1] == b"K":
+            self.restore(self.offset)
+        _, frame_ms = TICK.unpack_from(self.data, self.offset)
+        offset = self.offset + TICK.size
+        inputs = [unpack_input(self.data, offset + i * INPUT.size) for i in range(self.player_count)]
+        self.offset += self.tick_size
+        return frame_ms, inputs
+
+    def restore(self, offset):
+        """Load the keyframe at offset and continue reading after it"""
+        length = KEYFRAME.unpack_from(self.data, offset)[1]
+        self.world.unpack_from(self.data, offset + KEYFRAME.size)
+        self.offset = offset + KEYFRAME.size + length
+
+    def step(self):
+        """Advance one recorded tick; False at the end of the replay"""
+        if self.finished():
+            return False
+        frame_ms, inputs = self.read_tick()
+        self.world.step(inputs, frame_ms / 10.0)
+        return True
+
+    def seek(self, tick):
+        if not self.keyframes:
+            return
+        tick = max(0, min(tick, self.ticks))
+        i = bisect.bisect_right(self.keyframe_ticks, tick) - 1
+        self.restore(self.keyframes[i][1])
+        while self.world.tick < tick and self.step():
+            pass
+
+    def fast_forward(self, ticks=None):
+        """Simulate headless as fast as possible; returns ticks simulated"""
+        count = 0
+        while (ticks is None or count < ticks) and self.step():
+            count += 1
+        return count
+
+def random_inputs(rng, player_count):
+    return [PlayerInput(rng.choice((-1, 0, 1, 1)), rng.choice((-1, 0, 0, 1)), rng.choice((-1, 0, 0, 1)),
+                        rng.random() < 0.05, rng.random() < 0.5)
+            for _ in range(player_count)]
+
+def record_random(path, ticks, players=2, seed=1, keyframe_interval=300):
+    """Record a match driven by random input, for testing and benchmarks"""
+    rng = random.Random(seed)
+    world = PvPWorld(players)
+    recorder = ReplayRecorder(path, world, keyframe_interval)
+    states = {}
+    for _ in range(ticks):
+        inputs = random_inputs(rng, players)
+        frame_ms = rng.choice((16, 17, 17))
+        recorder.record(frame_ms, inputs)
+        world.step(inputs, frame_ms / 10.0)
+        states[world.tick] = world.pack_state()
+    recorder.close()
+    return states
+
+def selftest(path, ticks=6000, seeks=50, seed=1):
+    """Replays must reproduce the recording exactly, from the start and after any seek"""
+    states = record_random(path, ticks, seed=seed)
+    player = ReplayPlayer(path)
+    size = len(player.data)
+    print(f"{ticks} ticks in {size} bytes ({size / ticks:.1f} bytes/tick, {len(player.keyframes)} keyframes)")
+
+    start = time.perf_counter()
+    simulated = player.fast_forward()
+    elapsed = time.perf_counter() - start
+    print(f"fast forward: {simulated / elapsed:.0f} ticks/s, {simulated / elapsed / 60:.0f}x real time")
+    failures = 0 if player.world.pack_state() == states[ticks] else 1
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(seeks):
+        tick = rng.randrange(1, ticks + 1)
+        player.seek(tick)
+        if player.world.pack_state() != states[tick]:
+            failures += 1
+            print(f"mismatch after seeking to tick {tick}")
+    elapsed = time.perf_counter() - start
+    print(f"{seeks} random seeks: {elapsed / seeks * 1000:.2f} ms per seek, {failures} mismatches")
+    return failures == 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FPS_PvP replay tools")
+    parser.add_argument("replay", nargs="?", help="replay to fast-forward (omit for the self test)")
+    parser.add_argument("--ticks", type=int, default=6000, help="self test length")
+    parser.add_argument("--out", default="selftest.pvpr", help="self test replay file")
+    args = parser.parse_args()
+
+    if args.replay:
+        player = ReplayPlayer(args.replay)
+        start = time.perf_counter()
+        player.fast_forward()
+        elapsed = time.perf_counter() - start
+        scores = " - ".join(str(p.score) for p in player.world.players)
+        print(f"{player.ticks} ticks ({player.ticks / 60:.0f}s of play) in {elapsed:.2f}s, final score {scores}")
+    else:
+        raise SystemExit(0 if selftest(args.out, args.ticks) else 1)
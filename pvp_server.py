@@ -0,0 +1,184 @@
+import argparse
+import random
+import socket
+import time
+
+from metrics import PvPMetrics, serve
+from pvp_bots import BotPlayers
+from pvp_replay import ReplayRecorder, random_inputs
+from pvp_world import IDLE_INPUT, PvPWorld
+
+# Headless PvP match loop. Nothing here imports pygame or OpenGL: the rules
+# live in pvp_world, so a server needs neither a display nor the SDL dummy
+# video driver.
+
+SPIN_SECONDS = 0.0005
+
+def sleep_until(deadline, spin=SPIN_SECONDS):
+    """Sleep until time.perf_counter() reaches deadline.
+
+    time.sleep() can overshoot by a scheduler quantum, so it only covers the
+    time up to spin seconds before the deadline and the rest is busy-waited.
+    spin=0 never spins, trading wake-up precision for CPU.
+    """
+    remaining = deadline - time.perf_counter()
+    if remaining > spin:
+        time.sleep(remaining - spin)
+    while time.perf_counter() < deadline:
+        pass
+
+class RandomInput:
+    """Seeded random players, the same ones pvp_replay records for its self test"""
+    def __init__(self, player_count, seed=1):
+        self.rng = random.Random(seed)
+        self.player_count = player_count
+
+    def __call__(self, world):
+        return random_inputs(self.rng, self.player_count)
+
+def idle_input(world):
+    return [IDLE_INPUT] * len(world.players)
+
+class TickStats:
+    """CPU and wall time per tick, and how late each tick started"""
+    def __init__(self):
+        self.cpu = []
+        self.wall = []
+        self.late = []
+        self.overruns = 0
+
+    def record(self, cpu, wall, late):
+        self.cpu.append(cpu)
+        self.wall.append(wall)
+        self.late.append(late)
+
+    def metrics(self):
+        """Plain numbers (times in ms), cheap to send between processes"""
+        def ms(samples, p):
+            ordered = sorted(samples)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000 if ordered else 0.0
+        ticks = len(self.cpu)
+        return {"ticks": ticks,
+                "cpu_mean": sum(self.cpu) / ticks * 1000 if ticks else 0.0,
+                "cpu_p99": ms(self.cpu, 0.99),
+                "wall_p99": ms(self.wall, 0.99),
+                "late_p99": ms(self.late, 0.99),
+                "overruns": self.overruns}
+
+    def summary(self, rate):
+        if not self.cpu:
+            return "no ticks"
+        m = self.metrics()
+        per_core = 1000 / (m["cpu_mean"] * rate) if m["cpu_mean"] else float("inf")
+        return (f"{m['ticks']} ticks, cpu {m['cpu_mean']:.3f} ms mean / {m['cpu_p99']:.3f} ms p99, "
+                f"wall p99 {m['wall_p99']:.3f} ms, start late p99 {m['late_p99']:.3f} ms, "
+                f"{m['overruns']} overruns, ~{per_core:.0f} matches per core at {rate} Hz")
+
+class MatchServer:
+    """One PvPWorld ticked at a fixed rate from an input source.
+
+    inputs(world) returns one PlayerInput per player for the next tick. dt
+    matches what FPS_PvP passes for a frame of 1000 / rate ms. stream is a
+    ReplayRecorder on a socket, flushed every tick (see spectator_relay).
+    """
+    def __init__(self, world, inputs, rate=60, recorder=None, stream=None):
+        self.world = world
+        self.inputs = inputs
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.frame_ms = round(1000 / rate)
+        self.recorder = recorder
+        self.stream = stream
+        self.stats = TickStats()
+        self.metrics = None
+
+    def tick(self):
+        """Simulate one tick; returns the CPU time it took"""
+        cpu_start = time.thread_time()
+        inputs = self.inputs(self.world)
+        if self.recorder:
+            self.recorder.record(self.frame_ms, inputs)
+        if self.stream:
+            self.send_stream(inputs)
+        self.world.step(inputs, self.frame_ms / 10.0)
+        return time.thread_time() - cpu_start
+
+    def send_stream(self, inputs):
+        try:
+            self.stream.record(self.frame_ms, inputs)
+            self.stream.file.flush()
+        except OSError:
+            print("spectator relay disconnected")
+            self.stream = None
+
+    def run(self, ticks, spin=SPIN_SECONDS, status_every=0):
+        next_time = time.perf_counter()
+        for _ in range(ticks):
+            sleep_until(next_time, spin)
+            start = time.perf_counter()
+            cpu = self.tick()
+            end = time.perf_counter()
+            self.stats.record(cpu, end - start, start - next_time)
+            if self.metrics:
+                self.metrics.tick(end - start)
+
+            next_time += self.period
+            if end > next_time:
+                # Behind schedule: start the next tick now rather than bursting
+                self.stats.overruns += 1
+                next_time = end
+            if status_every and self.world.tick % status_every == 0:
+                print(f"tick {self.world.tick}: score {self.score()}, {len(self.world.bullets)} bullets")
+
+    def score(self):
+        return " - ".join(str(p.score) for p in self.world.players)
+
+def accept_stream(port):
+    """Wait for a spectator relay to connect; returns a buffered binary file on the socket"""
+    listener = socket.create_server(("", port))
+    print(f"waiting for a spectator relay on port {port}")
+    connection, _ = listener.accept()
+    listener.close()
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return connection.makefile("wb")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless FPS_PvP match server")
+    parser.add_argument("--rate", type=int, default=60, help="ticks per second")
+    parser.add_argument("--seconds", type=float, default=10.0, help="match length")
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--input", choices=("random", "idle", "bots"), default="random")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--spin-us", type=int, default=int(SPIN_SECONDS * 1e6),
+                        help="busy-wait this long before each tick instead of sleeping (0 to never spin)")
+    parser.add_argument("--record", metavar="PATH", help="record the match for FPS_PvP.py --replay")
+    parser.add_argument("--stream", type=int, metavar="PORT",
+                        help="wait for a spectator relay on PORT and stream the match to it")
+    parser.add_argument("--keyframe-interval", type=int, default=60, help="stream keyframe interval in ticks")
+    parser.add_argument("--metrics", type=int, metavar="PORT",
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    args = parser.parse_args()
+
+    world = PvPWorld(args.players)
+    if args.input == "random":
+        inputs = RandomInput(args.players, args.seed)
+    elif args.input == "bots":
+        inputs = BotPlayers(world)
+    else:
+        inputs = idle_input
+    recorder = ReplayRecorder(args.record, world) if args.record else None
+    stream = None
+    if args.stream:
+        stream = ReplayRecorder(accept_stream(args.stream), world, args.keyframe_interval)
+    server = MatchServer(world, inputs, args.rate, recorder, stream)
+    if args.metrics:
+        server.metrics = PvPMetrics(world)
+        serve(server.metrics.registry, args.metrics)
+    server.run(int(args.seconds * args.rate), args.spin_us / 1e6, status_every=args.rate * 5)
+    if recorder:
+        recorder.close()
+    if server.stream:
+        # The index at the end tells the relay the match is over
+        server.stream.close()
+    print(f"final score {server.score()}")
+    print(server.stats.summary(args.rate))
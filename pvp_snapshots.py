@@ -0,0 +1,122 @@
+import argparse
+import copy
+import threading
+import time
+
+from pvp_world import BULLET_STATE, PLAYER_STATE, STATE_HEADER, Bullet, PvPWorld
+
+class SnapshotRing:
+    """Rolling window of world states for rewind and the kill-cam.
+
+    Every snapshot is packed with struct.pack_into into a fixed-size slot of
+    one preallocated bytearray, indexed by tick, so push() and restore() only
+    copy numbers and allocate nothing. Slots are doubled in size if the
+    bullet count ever outgrows them.
+
+    The simulation thread may push while the render thread restores, so
+    push, growth, clear and restore hold a lock: a restore never sees the
+    new slot size with the old buffer.
+    """
+    def __init__(self, world, capacity=180, max_bullets=64):
+        self.capacity = capacity
+        self.player_count = len(world.players)
+        self.newest = None
+        self.lock = threading.Lock()
+        self._allocate(max_bullets)
+
+    def _allocate(self, max_bullets):
+        self.max_bullets = max_bullets
+        self.slot_size = (STATE_HEADER.size + PLAYER_STATE.size * self.player_count
+                          + BULLET_STATE.size * max_bullets)
+        self.buffer = bytearray(self.slot_size * self.capacity)
+
+    def _grow(self, bullet_count):
+        old_buffer, old_size = self.buffer, self.slot_size
+        max_bullets = self.max_bullets
+        while max_bullets < bullet_count:
+            max_bullets *= 2
+        self._allocate(max_bullets)
+        for slot in range(self.capacity):
+            self.buffer[slot * self.slot_size:slot * self.slot_size + old_size] = \
+                old_buffer[slot * old_size:(slot + 1) * old_size]
+
+    def push(self, world):
+        """Store the world's current state under world.tick"""
+        with self.lock:
+            if len(world.bullets) > self.max_bullets:
+                self._grow(len(world.bullets))
+            world.pack_into(self.buffer, (world.tick % self.capacity) * self.slot_size)
+            self.newest = world.tick
+
+    def clear(self):
+        """Forget every snapshot, e.g. after seeking to another point in time"""
+        with self.lock:
+            self.newest = None
+
+    def oldest(self):
+        if self.newest is None:
+            return None
+        return max(0, self.newest - self.capacity + 1)
+
+    def has(self, tick):
+        return self.newest is not None and self.oldest() <= tick <= self.newest
+
+    def restore(self, tick, world):
+        """Load the snapshot taken at tick into world (not necessarily the one it came from)"""
+        if not self.try_restore(tick, world):
+            raise KeyError(f"tick {tick} is not in the snapshot ring")
+
+    def try_restore(self, tick, world):
+        """restore() if tick is still in the ring; False otherwise.
+
+        Checking and loading under one lock, so another thread's push cannot
+        overwrite the slot in between as with has() followed by restore().
+        """
+        with self.lock:
+            if not self.has(tick):
+                return False
+            world.unpack_from(self.buffer, (tick % self.capacity) * self.slot_size)
+            return True
+
+def make_world(players, bullets):
+    world = PvPWorld(players)
+    for i in range(bullets):
+        owner = world.players[i % players]
+        world.bullets.append(Bullet((owner.pos[0], 1, owner.pos[2]), i * 7 % 360, owner.number))
+    return world
+
+def benchmark(player_counts=(2, 8, 32), bullet_counts=(0, 16, 64, 256, 1024), ticks=2000):
+    """Microseconds per snapshot push and restore, against copy.deepcopy"""
+    print(f"{'players':>7} {'bullets':>7} {'push us':>8} {'restore us':>10} {'deepcopy us':>11}")
+    for players in player_counts:
+        for bullets in bullet_counts:
+            world = make_world(players, bullets)
+            ring = SnapshotRing(world, max_bullets=max(bullets, 1))
+            target = PvPWorld(players)
+
+            start = time.perf_counter()
+            for tick in range(ticks):
+                world.tick = tick
+                ring.push(world)
+            push = (time.perf_counter() - start) / ticks
+
+            start = time.perf_counter()
+            for tick in range(ticks - ring.capacity, ticks):
+                ring.restore(tick, target)
+            restore = (time.perf_counter() - start) / ring.capacity
+
+            repeats = 20
+            start = time.perf_counter()
+            for _ in range(repeats):
+                copy.deepcopy((world.players, world.bullets))
+            deep = (time.perf_counter() - start) / repeats
+
+            if target.pack_state() != world.pack_state():
+                raise AssertionError("restored state differs")
+            print(f"{players:7d} {bullets:7d} {push * 1e6:8.1f} {restore * 1e6:10.1f} {deep * 1e6:11.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot ring cost per tick")
+    parser.add_argument("--ticks", type=int, default=2000)
+    args = parser.parse_args()
+    benchmark(ticks=args.ticks)
@@ -0,0 +1,366 @@
+import math
+import struct
+
+# Match rules for FPS_PvP, kept free of pygame and OpenGL so the same world
+# can be rendered, replayed or run headless.
+
+# Map dimensions
+MAP_SIZE = 60
+SPAWN_DISTANCE = 25
+
+MOVE_SPEED = 0.1
+PAD_SPEED = MOVE_SPEED * 3
+TURN_SPEED = 2
+PLAYER_RADIUS = 0.5
+BULLET_DAMAGE = 34
+RESPAWN_DELAY = 180
+PORTAL_COOLDOWN = 60  # 1 second cooldown at 60fps
+
+class Portal:
+    def __init__(self, x, z, dest_x, dest_z, color=(0.5, 0, 1)):
+        self.x = x
+        self.y = 2.5
+        self.z = z
+        self.dest_x = dest_x
+        self.dest_z = dest_z
+        self.color = color
+        self.radius = 1.5
+        self.height = 5
+
+    def check_teleport(self, player_pos):
+        """Check if player is in portal"""
+        dx = player_pos[0] - self.x
+        dz = player_pos[2] - self.z
+        distance = math.sqrt(dx*dx + dz*dz)
+        return distance < self.radius
+
+class Bullet:
+    def __init__(self, pos, rotation, owner):
+        self.pos = list(pos)
+        self.speed = 0.5
+        self.lifetime = 300
+        self.radius = 0.3
+        self.owner = owner
+        self.id = 0  # replication id, set by PvPWorld.shoot; not part of the packed state
+        self.aim(rotation)
+
+    def aim(self, rotation):
+        """Set the direction; the per-tick step is computed once here, not in update()"""
+        self.rotation = rotation
+        self.dx = math.sin(math.radians(rotation)) * self.speed
+        self.dz = math.cos(math.radians(rotation)) * self.speed
+
+    def update(self):
+        pos = self.pos
+        pos[0] += self.dx
+        pos[2] += self.dz
+        self.lifetime -= 1
+
+    def is_alive(self):
+        return self.lifetime > 0
+
+    def check_hit_player(self, player_pos, player_size=1.0):
+        dx = self.pos[0] - player_pos[0]
+        dy = self.pos[1] - player_pos[1] - 1
+        dz = self.pos[2] - player_pos[2]
+        distance = math.sqrt(dx*dx + dy*dy + dz*dz)
+        return distance < (self.radius + player_size)
+
+    def check_hit_obstacle(self, obstacle):
+        dx = self.pos[0] - obstacle.x
+        dy = self.pos[1] - obstacle.y
+        dz = self.pos[2] - obstacle.z
+        distance = math.sqrt(dx*dx + dy*dy + dz*dz)
+        return distance < (self.radius + obstacle.size)
+
+class Obstacle:
+    def __init__(self, x, y, z, width, height, depth, color):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.color = color
+        self.size = max(width, height, depth) / 2
+
+class PlayerInput:
+    """One tick of input for one player.
+
+    Axes are in [-1, 1]: forward, strafe (right is positive) and turn (left is
+    positive). Keyboard input moves MOVE_SPEED * dt per tick, a controller
+    moves at PAD_SPEED. Axes are quantized to 1/127 so a recorded tick
+    replays exactly.
+    """
+    def __init__(self, forward=0.0, strafe=0.0, turn=0.0, shoot=False, pad=False):
+        self.forward = quantize_axis(forward)
+        self.strafe = quantize_axis(strafe)
+        self.turn = quantize_axis(turn)
+        self.shoot = shoot
+        self.pad = pad
+
+    def is_moving(self):
+        return self.forward != 0 or self.strafe != 0
+
+def quantize_axis(value):
+    return round(max(-1.0, min(1.0, value)) * 127) / 127
+
+IDLE_INPUT = PlayerInput()
+
+class Player:
+    def __init__(self, number, spawn_pos, spawn_rotation):
+        self.number = number
+        self.spawn_pos = list(spawn_pos)
+        self.spawn_rotation = spawn_rotation
+        self.pos = list(spawn_pos)
+        self.rotation = spawn_rotation
+        self.health = 100
+        self.score = 0
+        self.alive = True
+        self.portal_cooldown = 0
+        self.moving = False
+
+    def respawn(self):
+        self.pos[:] = self.spawn_pos
+        self.rotation = self.spawn_rotation
+        self.health = 100
+        self.alive = True
+
+def spawn_points(player_count):
+    """The two classic spawns, then further players on a ring outside the walls"""
+    points = [((-SPAWN_DISTANCE, 0, 0), 0), ((SPAWN_DISTANCE, 0, 0), 180)]
+    extra = player_count - 2
+    for i in range(extra):
+        angle = 2 * math.pi * (i + 0.5) / extra
+        x = math.cos(angle) * (SPAWN_DISTANCE + 7)
+        z = math.sin(angle) * (SPAWN_DISTANCE + 7)
+        # Face the middle of the arena
+        points.append(((x, 0, z), math.degrees(math.atan2(-x, -z))))
+    return points[:player_count]
+
+# Packed world state, used by replay keyframes and the snapshot ring
+STATE_HEADER = struct.Struct("<IhBH")       # tick, respawn delay, players, bullets
+PLAYER_STATE = struct.Struct("<4dhHBH")     # pos, rotation, health, score, alive | moving << 1, portal cooldown
+BULLET_STATE = struct.Struct("<4dHB")       # pos, rotation, lifetime, owner
+
+class PvPWorld:
+    """Players, bullets, obstacles and portals, advanced one tick at a time"""
+    def __init__(self, player_count=2, map_size=MAP_SIZE):
+        self.map_size = map_size
+        self.players = [Player(i + 1, pos, rotation)
+                        for i, (pos, rotation) in enumerate(spawn_points(player_count))]
+        self.bullets = []
+        self.obstacles = []
+        self.portals = []
+        self.respawn_delay = 0
+        self.tick = 0
+        self.kills = []  # (killer, victim) player numbers, for the last step only
+        self.next_bullet_id = 1
+        # Running totals for metrics: blocked() calls and bullet obstacle sweeps,
+        # player/portal pair tests, and teleports
+        self.obstacle_queries = 0
+        self.portal_queries = 0
+        self.teleports = 0
+        build_arena(self)
+
+    # Level building
+    def add_obstacle(self, x, y, z, width, height, depth, color):
+        self.obstacles.append(Obstacle(x, y, z, width, height, depth, color))
+
+    def add_wall(self, x1, z1, x2, z2, height=3, thickness=1):
+        center_x = (x1 + x2) / 2
+        center_z = (z1 + z2) / 2
+        length = math.sqrt((x2-x1)**2 + (z2-z1)**2)
+
+        if abs(x2 - x1) > abs(z2 - z1):
+            self.add_obstacle(center_x, height/2, center_z, length, height, thickness, (0.5, 0.3, 0.2))
+        else:
+            self.add_obstacle(center_x, height/2, center_z, thickness, height, length, (0.5, 0.3, 0.2))
+
+    def add_box_obstacle(self, x, z, size=3):
+        self.add_obstacle(x, size/2, z, size, size, size, (0.6, 0.4, 0.2))
+
+    def add_pillar(self, x, z, height=5, radius=1.5):
+        self.add_obstacle(x, height/2, z, radius*2, height, radius*2, (0.4, 0.4, 0.4))
+
+    def add_portal_pair(self, x1, z1, x2, z2):
+        """Add two linked portals (bidirectional teleport)"""
+        self.portals.append(Portal(x1, z1, x2, z2, (0.5, 0, 1)))
+        self.portals.append(Portal(x2, z2, x1, z1, (1, 0.5, 0)))
+
+    # Rules
+    def blocked(self, x, z):
+        """True if a player standing at (x, z) would overlap an obstacle"""
+        self.obstacle_queries += 1
+        for obs in self.obstacles:
+            if abs(x - obs.x) < obs.width / 2 + PLAYER_RADIUS and abs(z - obs.z) < obs.depth / 2 + PLAYER_RADIUS:
+                return True
+        return False
+
+    def move_player(self, player, player_input, dt):
+        if not player.alive:
+            player.moving = False
+            return
+
+        player.rotation += player_input.turn * TURN_SPEED
+        player.moving = player_input.is_moving()
+        if not player.moving:
+            return
+
+        speed = PAD_SPEED if player_input.pad else MOVE_SPEED * dt
+        forward = player_input.forward * speed
+        strafe = player_input.strafe * speed
+        new_x = player.pos[0] + math.sin(math.radians(player.rotation)) * forward
+        new_z = player.pos[2] + math.cos(math.radians(player.rotation)) * forward
+        new_x += math.sin(math.radians(player.rotation - 90)) * strafe
+        new_z += math.cos(math.radians(player.rotation - 90)) * strafe
+
+        if not self.blocked(new_x, new_z):
+            player.pos[0] = max(-self.map_size + 1, min(self.map_size - 1, new_x))
+            player.pos[2] = max(-self.map_size + 1, min(self.map_size - 1, new_z))
+
+    def shoot(self, player):
+        if player.alive:
+            bullet = Bullet([player.pos[0], player.pos[1] + 1, player.pos[2]], player.rotation, player.number)
+            bullet.id = self.next_bullet_id
+            self.next_bullet_id += 1
+            self.bullets.append(bullet)
+
+    def step(self, inputs, dt=1.0):
+        """Advance one tick. inputs holds one PlayerInput per player; dt scales keyboard movement."""
+        self.kills.clear()
+        # Shots leave from where the shooter ends the tick, for keys and sticks alike;
+        # the old loop fired keyboard shots before moving and controller shots after
+        for player, player_input in zip(self.players, inputs):
+            self.move_player(player, player_input, dt)
+            if player_input.shoot:
+                self.shoot(player)
+
+        # Check portal teleportation with cooldown
+        for player in self.players:
+            if player.portal_cooldown > 0:
+                player.portal_cooldown -= 1
+
+        self.portal_queries += len(self.portals) * len(self.players)
+        for portal in self.portals:
+            for player in self.players:
+                if player.alive and player.portal_cooldown == 0 and portal.check_teleport(player.pos):
+                    player.pos[0] = portal.dest_x
+                    player.pos[2] = portal.dest_z
+                    player.portal_cooldown = PORTAL_COOLDOWN
+                    self.teleports += 1
+
+        # Move bullets and resolve their hits in one pass, keeping the survivors
+        survivors = []
+        for bullet in self.bullets:
+            if bullet.lifetime <= 0:
+                continue
+            bullet.update()
+            self.obstacle_queries += 1
+            if self.bullet_hit(bullet):
+                continue
+            survivors.append(bullet)
+        self.bullets = survivors
+
+        if self.respawn_delay > 0:
+            self.respawn_delay -= 1
+            if self.respawn_delay == 0:
+                for player in self.players:
+                    if not player.alive:
+                        player.respawn()
+
+        self.tick += 1
+
+    def bullet_hit(self, bullet):
+        """Apply a bullet's hit on an obstacle or player; True if it was used up"""
+        for obs in self.obstacles:
+            if bullet.check_hit_obstacle(obs):
+                return True
+
+        for player in self.players:
+            if player.number == bullet.owner or not player.alive:
+                continue
+            if bullet.check_hit_player(player.pos):
+                player.health -= BULLET_DAMAGE
+                if player.health <= 0:
+                    player.alive = False
+                    self.players[bullet.owner - 1].score += 1
+                    self.respawn_delay = RESPAWN_DELAY
+                    self.kills.append((bullet.owner, player.number))
+                return True
+        return False
+
+    # Serialization
+    def state_size(self):
+        return STATE_HEADER.size + PLAYER_STATE.size * len(self.players) + BULLET_STATE.size * len(self.bullets)
+
+    def pack_into(self, buffer, offset=0):
+        """Write the full dynamic state into buffer; returns the offset after it"""
+        STATE_HEADER.pack_into(buffer, offset, self.tick, self.respawn_delay, len(self.players), len(self.bullets))
+        offset += STATE_HEADER.size
+        for player in self.players:
+            PLAYER_STATE.pack_into(buffer, offset, player.pos[0], player.pos[1], player.pos[2], player.rotation,
+                                   player.health, player.score, player.alive | player.moving << 1,
+                                   player.portal_cooldown)
+            offset += PLAYER_STATE.size
+        for bullet in self.bullets:
+            BULLET_STATE.pack_into(buffer, offset, bullet.pos[0], bullet.pos[1], bullet.pos[2], bullet.rotation,
+                                   bullet.lifetime, bullet.owner)
+            offset += BULLET_STATE.size
+        return offset
+
+    def pack_state(self):
+        buffer = bytearray(self.state_size())
+        self.pack_into(buffer)
+        return bytes(buffer)
+
+    def unpack_from(self, buffer, offset=0):
+        """Restore the state written by pack_into; returns the offset after it.
+
+        Existing Bullet objects are reused, so restoring allocates nothing
+        unless the bullet count grew.
+        """
+        self.tick, self.respawn_delay, player_count, bullet_count = STATE_HEADER.unpack_from(buffer, offset)
+        offset += STATE_HEADER.size
+        if player_count != len(self.players):
+            raise ValueError(f"state has {player_count} players, world has {len(self.players)}")
+        for player in self.players:
+            pos = player.pos
+            pos[0], pos[1], pos[2], player.rotation, player.health, player.score, flags, player.portal_cooldown = \
+                PLAYER_STATE.unpack_from(buffer, offset)
+            player.alive = bool(flags & 1)
+            player.moving = bool(flags & 2)
+            offset += PLAYER_STATE.size
+
+        bullets = self.bullets
+        while len(bullets) < bullet_count:
+            bullets.append(Bullet((0, 0, 0), 0, 0))
+        del bullets[bullet_count:]
+        for bullet in bullets:
+            pos = bullet.pos
+            pos[0], pos[1], pos[2], rotation, bullet.lifetime, bullet.owner = \
+                BULLET_STATE.unpack_from(buffer, offset)
+            bullet.aim(rotation)
+            offset += BULLET_STATE.size
+        return offset
+
+def build_arena(world):
+    """The standard FPS_PvP arena"""
+    world.add_box_obstacle(0, 0, 4)
+    world.add_pillar(-10, -10, 6, 1.5)
+    world.add_pillar(10, 10, 6, 1.5)
+    world.add_pillar(-10, 10, 6, 1.5)
+    world.add_pillar(10, -10, 6, 1.5)
+
+    world.add_wall(-20, -15, -10, -15, 3, 1)
+    world.add_wall(10, 15, 20, 15, 3, 1)
+    world.add_wall(-15, -20, -15, -10, 3, 1)
+    world.add_wall(15, 10, 15, 20, 3, 1)
+
+    world.add_box_obstacle(-15, 0, 3)
+    world.add_box_obstacle(15, 0, 3)
+    world.add_box_obstacle(0, -15, 3)
+    world.add_box_obstacle(0, 15, 3)
+
+    world.add_portal_pair(-40, 0, 40, 0)
+    world.add_portal_pair(40, 0, -40, 0)
@@ -0,0 +1,164 @@
+import argparse
+import collections
+import threading
+import time
+
+import numpy as np
+
+from pvp_world import IDLE_INPUT, PlayerInput, PvPWorld
+
+class SnapshotBuffer:
+    """Hands the newest simulation snapshot to the render loop without locks.
+
+    The simulation builds a new immutable snapshot every tick and publish()
+    swaps it in with a single reference assignment, which is atomic in
+    Python. The renderer keeps drawing whatever latest() returned while the
+    next one is being built, so neither side ever waits for the other.
+    """
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot
+        self.published = 0
+
+    def publish(self, snapshot):
+        self.snapshot = snapshot
+        self.published += 1
+
+    def latest(self):
+        return self.snapshot
+
+class InputMailbox:
+    """Render-thread input handed to the simulation thread.
+
+    Held state (sticks, keys) is replaced wholesale each frame; one-shot
+    events (shots, clicks) are queued so a tick never misses one.
+    """
+    def __init__(self, held=None):
+        self.held = held
+        self.events = collections.deque()
+
+    def set_held(self, held):
+        self.held = held
+
+    def post(self, event):
+        self.events.append(event)
+
+    def take_events(self):
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+class SimulationThread(threading.Thread):
+    """Calls tick() at a fixed rate on its own thread and publishes snapshot() after each tick.
+
+    Sleeps until the next tick is due; if the simulation falls more than
+    max_lag ticks behind, the schedule is reset instead of running a burst of
+    catch-up ticks, and the overrun is counted.
+    """
+    def __init__(self, tick, snapshot, buffer, rate=60, max_lag=5):
+        threading.Thread.__init__(self, daemon=True)
+        self.tick = tick
+        self.snapshot = snapshot
+        self.buffer = buffer
+        self.period = 1.0 / rate
+        self.max_lag = max_lag
+        self.running = True
+        self.ticks = 0
+        self.overruns = 0
+        self.busy_time = 0.0
+        self.error = None
+
+    def run(self):
+        next_time = time.perf_counter()
+        try:
+            while self.running:
+                start = time.perf_counter()
+                self.tick()
+                self.buffer.publish(self.snapshot())
+                self.ticks += 1
+                now = time.perf_counter()
+                self.busy_time += now - start
+
+                next_time += self.period
+                if now - next_time > self.max_lag * self.period:
+                    self.overruns += 1
+                    next_time = now
+                delay = next_time - now
+                if delay > 0:
+                    time.sleep(delay)
+        except Exception as e:
+            # Surface the failure to the render loop instead of dying silently
+            self.error = e
+            raise
+
+    def stop(self):
+        self.running = False
+        self.join(1)
+
+    def report(self):
+        busy = self.busy_time / self.ticks * 1000 if self.ticks else 0.0
+        return f"sim: {self.ticks} ticks, {busy:.2f} ms busy per tick, {self.overruns} overruns"
+
+def benchmark(seconds=3.0, render_ms=8.0, sim_ms=8.0):
+    """Frames and ticks per second with a simulated GIL-releasing render cost.
+
+    The render side sleeps and runs NumPy work, both of which release the
+    GIL like PyOpenGL calls into the driver do, so on a multi-core machine
+    the threaded loop should approach max(render, sim) per frame instead of
+    render + sim.
+    """
+    matrix = np.random.default_rng(0).random((160, 160))
+    def render():
+        # Stand-in for driver work: half sleeping (GPU wait), half NumPy
+        time.sleep(render_ms / 2000)
+        deadline = time.perf_counter() + render_ms / 2000
+        while time.perf_counter() < deadline:
+            matrix @ matrix
+
+    def make_world():
+        world = PvPWorld(8)
+        inputs = [PlayerInput(1, 0, 0.3, shoot=True)] + [IDLE_INPUT] * 7
+        return world, inputs
+
+    def simulate(world, inputs):
+        deadline = time.perf_counter() + sim_ms / 1000
+        while time.perf_counter() < deadline:
+            world.step(inputs)
+        if len(world.bullets) > 200:
+            world.bullets.clear()
+
+    world, inputs = make_world()
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        simulate(world, inputs)
+        render()
+        frames += 1
+    serial = frames / (time.perf_counter() - start)
+
+    world, inputs = make_world()
+    buffer = SnapshotBuffer()
+    sim = SimulationThread(lambda: simulate(world, inputs), world.pack_state, buffer, rate=60)
+    sim.start()
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        buffer.latest()
+        render()
+        frames += 1
+    elapsed = time.perf_counter() - start
+    sim.stop()
+    threaded = frames / elapsed
+
+    print(f"render {render_ms} ms + sim {sim_ms} ms per frame")
+    print(f"  serial:   {serial:6.1f} frames/s (one sim tick per frame)")
+    print(f"  threaded: {threaded:6.1f} frames/s, {sim.ticks / elapsed:6.1f} sim ticks/s")
+    return serial, threaded
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serial vs threaded simulation/render throughput")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--render-ms", type=float, default=8.0)
+    parser.add_argument("--sim-ms", type=float, default=8.0)
+    args = parser.parse_args()
+    benchmark(args.seconds, args.render_ms, args.sim_ms)
@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+from pvp_replay import HEADER, INPUT, KEYFRAME, MAGIC, TICK, VERSION, unpack_input
+from pvp_world import PvPWorld
+
+# The game server streams its match in the replay format (pvp_server.py
+# --stream): a header, then a keyframe record every keyframe_interval ticks
+# and one input record per tick. The relay cuts that stream into one message
+# per tick, the tick record plus the keyframe in front of it if there is
+# one, and writes the same bytes object to every spectator. Spectators
+# simulate from the inputs like ReplayPlayer does, so a message is a few
+# bytes per player and only keyframes carry the full state.
+
+# Kernel send buffer per spectator socket; kept small so a stalled spectator
+# backs up into the relay's own buffer, where backpressure can see it
+SEND_BUFFER = 8 * 1024
+
+async def read_message(reader, tick_size):
+    """The next tick message, whether it starts with a keyframe, or None at the end of the match"""
+    kind = await reader.readexactly(1)
+    keyframe = b""
+    if kind == b"K":
+        rest = await reader.readexactly(KEYFRAME.size - 1)
+        length = KEYFRAME.unpack(kind + rest)[1]
+        keyframe = kind + rest + await reader.readexactly(length)
+        kind = await reader.readexactly(1)
+    if kind != b"T":
+        # The keyframe index: the recording was closed
+        return None, False
+    record = kind + await reader.readexactly(TICK.size - 1 + tick_size)
+    return keyframe + record, bool(keyframe)
+
+class Spectator:
+    """One relay connection with its own backpressure state.
+
+    While the socket's write buffer is above high_water new messages are
+    dropped; once it drains below low_water the spectator is resumed at the
+    newest keyframe, so it skips ahead instead of falling further behind.
+    If no keyframe arrived meanwhile, only the missed messages are resent.
+    """
+    def __init__(self, writer):
+        self.writer = writer
+        self.bytes_sent = 0
+        self.messages = 0
+        self.skips = 0
+        self.dropped = 0
+        self.lagging = False
+        self.lag_keyframe = None
+        self.lag_position = 0
+        self.connected = time.perf_counter()
+
+    def write(self, message):
+        self.writer.write(message)
+        self.bytes_sent += len(message)
+        self.messages += 1
+
+    def send(self, message, relay):
+        buffered = self.writer.transport.get_write_buffer_size()
+        if self.lagging:
+            if buffered > relay.low_water:
+                self.dropped += 1
+                return
+            self.lagging = False
+            since_keyframe = relay.since_keyframe
+            start = self.lag_position if since_keyframe and since_keyframe[0] is self.lag_keyframe else 0
+            for queued in since_keyframe[start:]:
+                self.write(queued)
+            return
+        if buffered > relay.high_water:
+            self.lagging = True
+            # publish() already appended message, so this is where it sits
+            self.lag_keyframe = relay.since_keyframe[0] if relay.since_keyframe else None
+            self.lag_position = len(relay.since_keyframe) - 1
+            self.skips += 1
+            self.dropped += 1
+            return
+        self.write(message)
+
+    def throughput(self):
+        elapsed = time.perf_counter() - self.connected
+        return self.bytes_sent / elapsed if elapsed else 0.0
+
+class SpectatorRelay:
+    """Subscribes to a game server's stream and fans it out to any number of spectators"""
+    def __init__(self, high_water=16 * 1024, low_water=4 * 1024):
+        self.high_water = high_water
+        self.low_water = low_water
+        self.header = None
+        self.since_keyframe = []
+        self.spectators = set()
+        self.finished = []
+        self.encoded = 0
+        self.encoded_bytes = 0
+        self.ended = asyncio.Event()
+
+    async def subscribe(self, host, port, retry_seconds=10.0):
+        deadline = time.perf_counter() + retry_seconds
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                break
+            except OSError:
+                if time.perf_counter() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+        self.header = await reader.readexactly(HEADER.size)
+        magic, version, player_count, _ = HEADER.unpack(self.header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a PvP replay stream")
+        tick_size = INPUT.size * player_count
+        try:
+            while True:
+                message, keyframe = await read_message(reader, tick_size)
+                if message is None:
+                    break
+                self.publish(message, keyframe)
+        except asyncio.IncompleteReadError:
+            print("game server disconnected")
+        writer.close()
+        for spectator in list(self.spectators):
+            spectator.writer.close()
+        self.ended.set()
+
+    def publish(self, message, keyframe):
+        # Encoded once here; every spectator is handed this same bytes object
+        self.encoded += 1
+        self.encoded_bytes += len(message)
+        if keyframe:
+            self.since_keyframe = [message]
+        elif self.since_keyframe:
+            self.since_keyframe.append(message)
+        for spectator in list(self.spectators):
+            if spectator.writer.transport.is_closing():
+                self.drop(spectator)
+            else:
+                spectator.send(message, self)
+
+    def drop(self, spectator):
+        if spectator in self.spectators:
+            self.spectators.discard(spectator)
+            self.finished.append(spectator)
+
+    async def handle_spectator(self, reader, writer):
+        writer.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+        spectator = Spectator(writer)
+        if self.header is not None:
+            spectator.write(self.header)
+            for message in self.since_keyframe:
+                spectator.write(message)
+        self.spectators.add(spectator)
+        try:
+            # Spectators never send anything; this only waits for them to leave
+            await reader.read()
+        except ConnectionError:
+            pass
+        self.drop(spectator)
+
+    def report(self):
+        spectators = list(self.spectators) + self.finished
+        fanned = sum(s.messages for s in spectators)
+        lines = [f"relay: {self.encoded} messages ({self.encoded_bytes} bytes) encoded once, "
+                 f"{fanned} writes to {len(spectators)} spectators"]
+        if spectators:
+            rates = sorted(s.throughput() / 1024 for s in spectators)
+            lines.append(f"  throughput per spectator: min {rates[0]:.1f} KiB/s, "
+                         f"median {rates[len(rates) // 2]:.1f} KiB/s, max {rates[-1]:.1f} KiB/s")
+            skipped = [s for s in spectators if s.skips]
+            lines.append(f"  {len(skipped)} spectators skipped to a keyframe "
+                         f"({sum(s.skips for s in skipped)} times, {sum(s.dropped for s in skipped)} messages dropped)")
+        return "\n".join(lines)
+
+async def watch(host, port, stats, stall_every=0.0, stall_seconds=0.0, simulate=False):
+    """A loopback spectator: reads the relay stream, optionally stalling to test backpressure"""
+    sock = socket.socket()
+    if stall_seconds:
+        # A small receive window makes a stalled reader back up into the relay quickly
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, (host, port))
+    # asyncio buffers up to twice limit before it stops reading the socket
+    reader, writer = await asyncio.open_connection(sock=sock, limit=1024 if stall_seconds else 2 ** 16)
+    world = None
+    ticks = keyframes = received = 0
+    next_stall = time.perf_counter() + stall_every
+    try:
+        header = await reader.readexactly(HEADER.size)
+        player_count = HEADER.unpack(header)[2]
+        tick_size = INPUT.size * player_count
+        if simulate:
+            world = PvPWorld(player_count)
+        while True:
+            message, keyframe = await read_message(reader, tick_size)
+            if message is None:
+                break
+            received += len(message)
+            ticks += 1
+            if keyframe:
+                keyframes += 1
+            if world is not None:
+                offset = 0
+                if keyframe:
+                    world.unpack_from(message, KEYFRAME.size)
+                    offset = KEYFRAME.size + KEYFRAME.unpack_from(message, 0)[1]
+                frame_ms = TICK.unpack_from(message, offset)[1]
+                inputs = [unpack_input(message, offset + TICK.size + i * INPUT.size) for i in range(player_count)]
+                world.step(inputs, frame_ms / 10.0)
+            if stall_seconds and time.perf_counter() > next_stall:
+                await asyncio.sleep(stall_seconds)
+                next_stall = time.perf_counter() + stall_every
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    writer.close()
+    stats.append((received, ticks, keyframes, stall_seconds > 0, world))
+
+async def swarm(spectators, seconds, players, slow_fraction, relay_port, server_port):
+    """Game server subprocess, relay and spectators all on loopback"""
+    server = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "pvp_server.py"),
+        "--stream", str(server_port), "--players", str(players), "--seconds", str(seconds),
+        stdout=asyncio.subprocess.DEVNULL)
+    relay = SpectatorRelay()
+    relay_server = await asyncio.start_server(relay.handle_spectator, "127.0.0.1", relay_port)
+    subscription = asyncio.ensure_future(relay.subscribe("127.0.0.1", server_port))
+    while relay.header is None and not subscription.done():
+        await asyncio.sleep(0.05)
+
+    stats = []
+    slow = int(spectators * slow_fraction)
+    tasks = [asyncio.ensure_future(watch("127.0.0.1", relay_port, stats,
+                                         stall_every=2.0 if i < slow else 0.0,
+                                         stall_seconds=4.0 if i < slow else 0.0,
+                                         simulate=i == slow))
+             for i in range(spectators)]
+    await relay.ended.wait()
+    await asyncio.gather(*tasks)
+    await subscription
+    relay_server.close()
+    await server.wait()
+
+    print(relay.report())
+    fast = [s for s in stats if not s[3]]
+    for label, group in (("steady", fast), ("stalling", [s for s in stats if s[3]])):
+        if group:
+            ticks = sorted(s[1] for s in group)
+            print(f"  {label:8} spectators: {len(group)}, ticks received min {ticks[0]} / max {ticks[-1]} "
+                  f"of {relay.encoded}")
+    simulated = [s[4] for s in stats if s[4] is not None]
+    if simulated:
+        scores = " - ".join(str(p.score) for p in simulated[0].players)
+        print(f"  simulating spectator ended on tick {simulated[0].tick}, score {scores}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fan one PvP match out to many spectators")
+    parser.add_argument("--server", default="127.0.0.1:7400", metavar="HOST:PORT",
+                        help="game server started with pvp_server.py --stream PORT")
+    parser.add_argument("--port", type=int, default=7401, help="port spectators connect to")
+    parser.add_argument("--swarm", type=int, metavar="N",
+                        help="loopback test: start a server and N spectators, then report")
+    parser.add_argument("--seconds", type=float, default=15.0, help="swarm test match length")
+    parser.add_argument("--players", type=int, default=32, help="swarm test player count")
+    parser.add_argument("--slow", type=float, default=0.1, help="fraction of swarm spectators that stall")
+    args = parser.parse_args()
+
+    host, port = args.server.rsplit(":", 1)
+    if args.swarm:
+        asyncio.run(swarm(args.swarm, args.seconds, args.players, args.slow, args.port, int(port)))
+    else:
+        async def main():
+            relay = SpectatorRelay()
+            server = await asyncio.start_server(relay.handle_spectator, "", args.port)
+            print(f"relaying {args.server} to spectators on port {args.port}")
+            await relay.subscribe(host, int(port))
+            server.close()
+            print(relay.report())
+        asyncio.run(main())
@@ -0,0 +1,199 @@
+import argparse
+import math
+import multiprocessing
+import random
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ss_physics import FIELD_LENGTH, FIELD_WIDTH, MAX_POWER, Match
+from ss_tournament import load_policy
+
+class SoccerEnv:
+    """Reset/step environment over a Match, the agent always plays player 1.
+
+    An action is (disc index, angle in radians, power in [0, 1]). One step
+    plays the agent's flick and then every opponent flick until it is the
+    agent's turn again, so each observation is a board at rest. The reward is
+    goals scored minus goals conceded during the step.
+    """
+    ACTION_SIZE = 3
+
+    def __init__(self, seed=0, opponent="striker", goals_to_win=3, max_turns=80):
+        self.rng = random.Random(seed)
+        self.opponent = load_policy(opponent)
+        self.goals_to_win = goals_to_win
+        self.max_turns = max_turns
+        self.match = None
+        self.obs_size = 2 * len(Match().pitch.all_discs) + 2
+
+    def reset(self, out=None):
+        self.match = Match()
+        return self.observe(out)
+
+    def observe(self, out=None):
+        """Disc positions scaled to [-1, 1], then both scores"""
+        if out is None:
+            out = np.empty(self.obs_size, dtype=np.float32)
+        discs = self.match.pitch.all_discs
+        out[0:2 * len(discs):2] = [disc.x / FIELD_LENGTH for disc in discs]
+        out[1:2 * len(discs):2] = [disc.z / FIELD_WIDTH for disc in discs]
+        out[-2] = self.match.score_p1
+        out[-1] = self.match.score_p2
+        return out
+
+    def step(self, action, out=None):
+        """Returns (observation, reward, done)"""
+        match = self.match
+        before = match.score_p1 - match.score_p2
+
+        discs = match.discs_for(1)
+        disc_index = min(max(int(action[0]), 0), len(discs) - 1)
+        power = min(max(float(action[2]), 0.0), 1.0) * MAX_POWER
+        match.play_shot(disc_index, math.cos(action[1]) * power, math.sin(action[1]) * power)
+
+        while match.current_player == 2 and not self.done():
+            match.play_shot(*self.opponent(match, self.rng))
+
+        reward = match.score_p1 - match.score_p2 - before
+        return self.observe(out), float(reward), self.done()
+
+    def done(self):
+        match = self.match
+        return match.turn >= self.max_turns or max(match.score_p1, match.score_p2) >= self.goals_to_win
+
+RESET, STEP, CLOSE = b"r", b"s", b"c"
+
+def _worker(connection, names, first, count, seed, opponent):
+    """Steps envs [first, first + count) in place on the shared buffers"""
+    blocks = []
+    obs = rewards = dones = actions = None
+    try:
+        for name in names:
+            blocks.append(shared_memory.SharedMemory(name=name))
+        envs = [SoccerEnv(seed + first + i, opponent) for i in range(count)]
+        obs_size = envs[0].obs_size
+        obs = np.ndarray((first + count, obs_size), np.float32, blocks[0].buf)[first:]
+        rewards = np.ndarray(first + count, np.float32, blocks[1].buf)[first:]
+        dones = np.ndarray(first + count, np.uint8, blocks[2].buf)[first:]
+        actions = np.ndarray((first + count, SoccerEnv.ACTION_SIZE), np.float32, blocks[3].buf)[first:]
+
+        while True:
+            command = connection.recv_bytes()
+            if command == RESET:
+                for i, env in enumerate(envs):
+                    env.reset(obs[i])
+                rewards[:] = 0
+                dones[:] = 0
+            elif command == STEP:
+                for i, env in enumerate(envs):
+                    _, rewards[i], dones[i] = env.step(actions[i], obs[i])
+                    if dones[i]:
+                        # Auto-reset; the final board of the episode is lost,
+                        # as in the usual vector env convention
+                        env.reset(obs[i])
+            elif command == CLOSE:
+                break
+            connection.send_bytes(command)
+    finally:
+        # The views pin the buffers, so drop them before closing the blocks
+        obs = rewards = dones = actions = None
+        for block in blocks:
+            block.close()
+
+class VectorEnv:
+    """num_envs SoccerEnvs stepped in parallel by worker processes.
+
+    Observations, rewards, dones and actions live in shared memory, so a step
+    only sends a one byte command to each worker instead of pickling arrays.
+    The returned arrays are views that the next step overwrites.
+    """
+    def __init__(self, num_envs, workers=None, seed=0, opponent="striker"):
+        workers = min(workers or multiprocessing.cpu_count(), num_envs)
+        self.num_envs = num_envs
+        obs_size = SoccerEnv(opponent=opponent).obs_size
+
+        shapes = [
+            ((num_envs, obs_size), np.float32),
+            ((num_envs,), np.float32),
+            ((num_envs,), np.uint8),
+            ((num_envs, SoccerEnv.ACTION_SIZE), np.float32),
+        ]
+        self.blocks = []
+        arrays = []
+        for shape, dtype in shapes:
+            block = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            self.blocks.append(block)
+            arrays.append(np.ndarray(shape, dtype, block.buf))
+        self.obs, self.rewards, self.dones, self.actions = arrays
+
+        names = [block.name for block in self.blocks]
+        self.connections = []
+        self.processes = []
+        per_worker, extra = divmod(num_envs, workers)
+        first = 0
+        for w in range(workers):
+            count = per_worker + (1 if w < extra else 0)
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker, daemon=True,
+                                              args=(child, names, first, count, seed, opponent))
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+            first += count
+
+    def _broadcast(self, command):
+        for connection in self.connections:
+            connection.send_bytes(command)
+        for connection in self.connections:
+            connection.recv_bytes()
+
+    def reset(self):
+        self._broadcast(RESET)
+        return self.obs
+
+    def step(self, actions):
+        """Returns (observations, rewards, dones); finished envs are reset"""
+        self.actions[:] = actions
+        self._broadcast(STEP)
+        return self.obs, self.rewards, self.dones
+
+    def close(self):
+        for connection in self.connections:
+            connection.send_bytes(CLOSE)
+        for process in self.processes:
+            process.join()
+        del self.obs, self.rewards, self.dones, self.actions
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+def random_actions(rng, num_envs, disc_count=3):
+    actions = np.empty((num_envs, SoccerEnv.ACTION_SIZE), np.float32)
+    actions[:, 0] = rng.integers(0, disc_count, num_envs)
+    actions[:, 1] = rng.uniform(0, 2 * math.pi, num_envs)
+    actions[:, 2] = rng.uniform(0.2, 1.0, num_envs)
+    return actions
+
+def benchmark(worker_counts=(1, 8, 64), envs_per_worker=2, steps=20):
+    """Environment steps/s with random actions"""
+    rng = np.random.default_rng(0)
+    for workers in worker_counts:
+        num_envs = workers * envs_per_worker
+        env = VectorEnv(num_envs, workers)
+        env.reset()
+        start = time.perf_counter()
+        for _ in range(steps):
+            env.step(random_actions(rng, num_envs))
+        elapsed = time.perf_counter() - start
+        env.close()
+        print(f"{workers:3d} workers, {num_envs:4d} envs: {num_envs * steps / elapsed:8.1f} env steps/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soccer Stars vector env benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--envs-per-worker", type=int, default=2)
+    parser.add_argument("--steps", type=int, default=20)
+    args = parser.parse_args()
+    benchmark(args.workers, args.envs_per_worker, args.steps)
@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+import math
+import queue
+import random
+import struct
+import threading
+import time
+
+from ss_physics import MAX_POWER, Match
+
+# A turn is fully determined by the board plus one flick, so peers only
+# exchange shots. Both sides quantize the flick the same way and run the same
+# physics, and each shot carries a hash of the sender's board before the
+# flick so a desync is caught on the very next turn.
+MAGIC = b"SSLS"
+VERSION = 1
+HELLO = struct.Struct("<4sB")
+# type, turn, disc index, angle, power, state hash: 12 bytes per turn
+SHOT = struct.Struct("<BHBHHI")
+SHOT_TYPE = ord("S")
+
+ANGLE_STEPS = 65536
+POWER_STEPS = 65535
+
+def encode_shot(vx, vz):
+    angle = int(round(math.atan2(vz, vx) / (2 * math.pi) * ANGLE_STEPS)) % ANGLE_STEPS
+    power = int(round(min(math.sqrt(vx*vx + vz*vz), MAX_POWER) / MAX_POWER * POWER_STEPS))
+    return angle, power
+
+def decode_shot(angle, power):
+    angle = angle * 2 * math.pi / ANGLE_STEPS
+    power = power * MAX_POWER / POWER_STEPS
+    return math.cos(angle) * power, math.sin(angle) * power
+
+class Shot:
+    def __init__(self, turn, disc_index, vx, vz, state_hash):
+        self.turn = turn
+        self.disc_index = disc_index
+        self.vx = vx
+        self.vz = vz
+        self.state_hash = state_hash
+
+class LockstepPeer:
+    """One end of a two-player lockstep session over plain TCP.
+
+    The asyncio connection runs on a background thread so the game loop only
+    calls send_shot() and poll_shot(). The host is player 1.
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+        self.reader = None
+        self.writer = None
+        self.server = None
+        self.read_task = None
+        self.connected = threading.Event()
+        self.incoming = queue.Queue()
+        self.local_player = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error = None
+
+    def host(self, port, address="0.0.0.0"):
+        """Listen for the other player; returns the bound port"""
+        self.local_player = 1
+        future = asyncio.run_coroutine_threadsafe(self._listen(address, port), self.loop)
+        return future.result()
+
+    def connect(self, address, port, timeout=10):
+        self.local_player = 2
+        future = asyncio.run_coroutine_threadsafe(self._connect(address, port), self.loop)
+        future.result(timeout)
+
+    async def _listen(self, address, port):
+        server = await asyncio.start_server(self._accept, address, port)
+        self.server = server
+        return server.sockets[0].getsockname()[1]
+
+    async def _accept(self, reader, writer):
+        if self.writer is not None:
+            writer.close()
+            return
+        await self._start(reader, writer)
+
+    async def _connect(self, address, port):
+        reader, writer = await asyncio.open_connection(address, port)
+        await self._start(reader, writer)
+
+    async def _start(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._write(HELLO.pack(MAGIC, VERSION))
+        try:
+            magic, version = HELLO.unpack(await reader.readexactly(HELLO.size))
+            self.bytes_received += HELLO.size
+            if magic != MAGIC or version != VERSION:
+                raise ConnectionError("peer speaks a different protocol")
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            self.error = e
+            writer.close()
+            # Free the slot so a host can still accept the real player
+            self.reader = None
+            self.writer = None
+            return
+        self.connected.set()
+        self.read_task = self.loop.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        try:
+            while True:
+                data = await self.reader.readexactly(SHOT.size)
+                self.bytes_received += SHOT.size
+                kind, turn, disc_index, angle, power, state_hash = SHOT.unpack(data)
+                if kind != SHOT_TYPE:
+                    raise ConnectionError("unexpected message type %d" % kind)
+                vx, vz = decode_shot(angle, power)
+                self.incoming.put(Shot(turn, disc_index, vx, vz, state_hash))
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            self.error = e
+            self.incoming.put(None)
+
+    def _write(self, data):
+        self.writer.write(data)
+        self.bytes_sent += len(data)
+
+    def wait_connected(self, timeout=None):
+        return self.connected.wait(timeout)
+
+    def send_shot(self, turn, disc_index, vx, vz, state_hash):
+        """Send the local flick. Returns the quantized velocity to apply locally."""
+        angle, power = encode_shot(vx, vz)
+        data = SHOT.pack(SHOT_TYPE, turn & 0xFFFF, disc_index, angle, power, state_hash)
+        self.loop.call_soon_threadsafe(self._write, data)
+        return decode_shot(angle, power)
+
+    def disconnect(self, error):
+        """Drop the connection after the peer broke the protocol; error says why"""
+        self.error = error
+        def drop():
+            if self.read_task is not None:
+                self.read_task.cancel()
+            if self.writer is not None:
+                self.writer.close()
+        self.loop.call_soon_threadsafe(drop)
+
+    def poll_shot(self, timeout=None):
+        """Next remote Shot, or None if nothing arrived (or the peer left)"""
+        try:
+            if timeout is None:
+                return self.incoming.get_nowait()
+            return self.incoming.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        def shutdown():
+            if self.read_task is not None:
+                self.read_task.cancel()
+            if self.writer is not None:
+                self.writer.close()
+            if self.server is not None:
+                self.server.close()
+            # Let the cancellation run before the loop stops
+            self.loop.call_soon(self.loop.stop)
+        self.loop.call_soon_threadsafe(shutdown)
+        self.thread.join(1)
+        if not self.thread.is_alive():
+            self.loop.close()
+
+def check_shot(match, shot):
+    """True if the remote board matched ours when the shot was taken"""
+    return shot.turn == match.turn & 0xFFFF and shot.state_hash == match.state_hash()
+
+def valid_disc(match, shot):
+    """True if the shot names one of the current player's discs; the index is an unchecked byte"""
+    return 0 <= shot.disc_index < len(match.discs_for(match.current_player))
+
+def selftest(turns=40, seed=1):
+    """Two peers on loopback play random shots and must stay in sync"""
+    host = LockstepPeer()
+    port = host.host(0, "127.0.0.1")
+    client = LockstepPeer()
+    client.connect("127.0.0.1", port)
+    host.wait_connected(5)
+
+    peers = {1: host, 2: client}
+    matches = {1: Match(), 2: Match()}
+    rng = random.Random(seed)
+    desyncs = 0
+
+    start = time.perf_counter()
+    for _ in range(turns):
+        shooter = matches[1].current_player
+        receiver = 2 if shooter == 1 else 1
+        match = matches[shooter]
+
+        disc_index = rng.randrange(len(match.discs_for(shooter)))
+        angle = rng.uniform(0, 2 * math.pi)
+        power = rng.uniform(0.5, MAX_POWER)
+        vx, vz = peers[shooter].send_shot(match.turn, disc_index, math.cos(angle) * power,
+                                          math.sin(angle) * power, match.state_hash())
+        turn_start = match.turn
+        match.play_shot(disc_index, vx, vz)
+
+        shot = peers[receiver].poll_shot(timeout=5)
+        if shot is None:
+            raise ConnectionError("no shot received: %s" % peers[receiver].error)
+        if not check_shot(matches[receiver], shot):
+            desyncs += 1
+        matches[receiver].play_shot(shot.disc_index, shot.vx, shot.vz)
+
+        if matches[1].state_hash() != matches[2].state_hash():
+            desyncs += 1
+            print(f"desync after turn {turn_start}")
+    elapsed = time.perf_counter() - start
+
+    sent = host.bytes_sent + client.bytes_sent
+    # What streaming disc positions (x, z as float32) every frame would cost
+    disc_count = len(matches[1].pitch.all_discs)
+    print(f"{turns} turns in {elapsed:.2f}s, {desyncs} desyncs, score {matches[1].score_p1}-{matches[1].score_p2}")
+    print(f"lockstep traffic: {sent} bytes ({sent / turns:.1f} bytes/turn incl. handshake)")
+    streamed = matches[1].frames * disc_count * 8
+    print(f"state streaming would send {disc_count * 8} bytes/frame, {streamed} bytes "
+          f"({streamed / turns:.0f} bytes/turn) over the same {matches[1].frames} frames")
+
+    host.close()
+    client.close()
+    return desyncs == 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soccer Stars lockstep protocol loopback test")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    raise SystemExit(0 if selftest(args.turns, args.seed) else 1)
@@ -0,0 +1,576 @@
+import math
+import struct
+import time
+import zlib
+
+# Field dimensions: 22:15 ratio (similar to 110m x 75m)
+FIELD_LENGTH = 11.0  # Half-length (22 units total)
+FIELD_WIDTH = 7.5    # Half-width (15 units total)
+GOAL_WIDTH = 2.4     # Goal width (scaled from 7.32m)
+
+# Physics constants
+FRICTION = 0.96
+BOUNCE = 0.8
+MIN_VELOCITY = 0.05
+
+# Shots
+MAX_POWER = 2.5
+MIN_DRAG = 0.5
+
+# Continuous collision: discs moving more than their own radius in one frame
+# are swept to their exact time of impact, at most this many events per frame
+MAX_CCD_EVENTS = 16
+
+# Team setup
+DISC_RADIUS = 0.45
+BALL_RADIUS = 0.35
+PLAYER1_COLOR = (0.12, 0.56, 1)
+PLAYER2_COLOR = (0.86, 0.08, 0.24)
+BALL_COLOR = (1, 0.84, 0)
+PLAYER1_START = [(6, -2), (6, 0), (6, 2)]
+PLAYER2_START = [(-6, -2), (-6, 0), (-6, 2)]
+
+# 11-a-side 4-4-2 for player 1 (right half); player 2 is mirrored
+FORMATION_11 = [
+    (10.0, 0.0),
+    (7.5, -4.5), (7.5, -1.5), (7.5, 1.5), (7.5, 4.5),
+    (4.5, -4.5), (4.5, -1.5), (4.5, 1.5), (4.5, 4.5),
+    (1.5, -1.5), (1.5, 1.5),
+]
+
+class Disc3D:
+    def __init__(self, x, z, radius, color, is_ball=False):
+        self.x = x
+        self.y = 0.3 if is_ball else 0.4
+        self.z = z
+        self.radius = radius
+        self.vx = 0
+        self.vz = 0
+        self.color = color
+        self.is_ball = is_ball
+        self.mass = 2 if is_ball else 1
+        self.asleep = False
+        self.index = 0
+        self.time = 0.0  # How far into the current frame the position is
+
+    def update(self):
+        self.apply_friction()
+        self.x += self.vx
+        self.z += self.vz
+        return self.collide_walls()
+
+    def apply_friction(self):
+        self.vx *= FRICTION
+        self.vz *= FRICTION
+
+        if abs(self.vx) < MIN_VELOCITY:
+            self.vx = 0
+        if abs(self.vz) < MIN_VELOCITY:
+            self.vz = 0
+
+    def advance(self, time):
+        """Move along the current velocity up to a point in the frame"""
+        dt = time - self.time
+        self.x += self.vx * dt
+        self.z += self.vz * dt
+        self.time = time
+
+    def collide_walls(self):
+        # Wall collisions (touchlines - sides)
+        if self.z - self.radius <= -FIELD_WIDTH:
+            self.z = -FIELD_WIDTH + self.radius
+            self.vz = -self.vz * BOUNCE
+        elif self.z + self.radius >= FIELD_WIDTH:
+            self.z = FIELD_WIDTH - self.radius
+            self.vz = -self.vz * BOUNCE
+
+        # Goal lines (ends)
+        goal_left = -GOAL_WIDTH / 2
+        goal_right = GOAL_WIDTH / 2
+
+        if self.x - self.radius <= -FIELD_LENGTH:
+            if self.is_ball and goal_left <= self.z <= goal_right:
+                return "player2_scores"
+            else:
+                self.x = -FIELD_LENGTH + self.radius
+                self.vx = -self.vx * BOUNCE
+
+        elif self.x + self.radius >= FIELD_LENGTH:
+            if self.is_ball and goal_left <= self.z <= goal_right:
+                return "player1_scores"
+            else:
+                self.x = FIELD_LENGTH - self.radius
+                self.vx = -self.vx * BOUNCE
+
+        return None
+
+    def in_bounds(self):
+        """True if collide_walls would leave the disc where it is"""
+        return (-FIELD_LENGTH + self.radius <= self.x <= FIELD_LENGTH - self.radius and
+                -FIELD_WIDTH + self.radius <= self.z <= FIELD_WIDTH - self.radius)
+
+    def is_moving(self):
+        return abs(self.vx) > MIN_VELOCITY or abs(self.vz) > MIN_VELOCITY
+
+def check_collision(disc1, disc2):
+    dx = disc1.x - disc2.x
+    dz = disc1.z - disc2.z
+    distance = math.sqrt(dx * dx + dz * dz)
+    return distance <= (disc1.radius + disc2.radius)
+
+def check_overlap(disc1, disc2):
+    """True if two discs interpenetrate (resting contact does not count)"""
+    dx = disc1.x - disc2.x
+    dz = disc1.z - disc2.z
+    return math.sqrt(dx * dx + dz * dz) < (disc1.radius + disc2.radius) - 1e-9
+
+def resolve_collision(disc1, disc2):
+    dx = disc1.x - disc2.x
+    dz = disc1.z - disc2.z
+    distance = math.sqrt(dx * dx + dz * dz)
+
+    if distance == 0:
+        distance = 0.1
+        dx = 0.1
+
+    # Collision normal, pointing from disc2 to disc1
+    nx = dx / distance
+    nz = dz / distance
+
+    overlap = (disc1.radius + disc2.radius) - distance
+    if overlap > 0:
+        separation = overlap / 2
+        disc1.x += nx * separation
+        disc1.z += nz * separation
+        disc2.x -= nx * separation
+        disc2.z -= nz * separation
+
+    # 1D elastic collision along the normal, tangential velocity unchanged.
+    # Same result as rotating into the collision frame, without atan2/cos/sin.
+    v1n = disc1.vx * nx + disc1.vz * nz
+    v2n = disc2.vx * nx + disc2.vz * nz
+
+    m1 = disc1.mass
+    m2 = disc2.mass
+    impulse = 2 * (v1n - v2n) / (m1 + m2)
+
+    disc1.vx -= impulse * m2 * nx
+    disc1.vz -= impulse * m2 * nz
+    disc2.vx += impulse * m1 * nx
+    disc2.vz += impulse * m1 * nz
+
+def disc_time_of_impact(disc1, disc2):
+    """Frame time at which two discs moving linearly first touch, or None"""
+    start = max(disc1.time, disc2.time)
+    px = (disc1.x + disc1.vx * (start - disc1.time)) - (disc2.x + disc2.vx * (start - disc2.time))
+    pz = (disc1.z + disc1.vz * (start - disc1.time)) - (disc2.z + disc2.vz * (start - disc2.time))
+    vx = disc1.vx - disc2.vx
+    vz = disc1.vz - disc2.vz
+
+    b = px * vx + pz * vz
+    if b >= 0:
+        return None  # Not approaching
+
+    radii = disc1.radius + disc2.radius
+    c = px * px + pz * pz - radii * radii
+    if c <= 0:
+        return start  # Already touching and closing in
+
+    a = vx * vx + vz * vz
+    discriminant = b * b - a * c
+    if discriminant < 0:
+        return None
+
+    t = start + (-b - math.sqrt(discriminant)) / a
+    return t if t <= 1.0 else None
+
+def wall_time_of_impact(disc):
+    """Earliest frame time at which a disc reaches a touchline or goal line.
+
+    Returns (time, axis) with axis "x" or "z", or (None, None).
+    """
+    best_time = None
+    best_axis = None
+
+    if disc.vx:
+        limit = FIELD_LENGTH - disc.radius if disc.vx > 0 else -FIELD_LENGTH + disc.radius
+        best_time = disc.time + max(0.0, (limit - disc.x) / disc.vx)
+        best_axis = "x"
+    if disc.vz:
+        limit = FIELD_WIDTH - disc.radius if disc.vz > 0 else -FIELD_WIDTH + disc.radius
+        t = disc.time + max(0.0, (limit - disc.z) / disc.vz)
+        if best_time is None or t < best_time:
+            best_time = t
+            best_axis = "z"
+
+    if best_time is None or best_time > 1.0:
+        return None, None
+    return best_time, best_axis
+
+def bounce_wall(disc, axis):
+    """Bounce a disc that is exactly at a wall, or report a goal"""
+    if axis == "z":
+        disc.z = FIELD_WIDTH - disc.radius if disc.vz > 0 else -FIELD_WIDTH + disc.radius
+        disc.vz = -disc.vz * BOUNCE
+        return None
+
+    if disc.is_ball and -GOAL_WIDTH / 2 <= disc.z <= GOAL_WIDTH / 2:
+        return "player1_scores" if disc.vx > 0 else "player2_scores"
+    disc.x = FIELD_LENGTH - disc.radius if disc.vx > 0 else -FIELD_LENGTH + disc.radius
+    disc.vx = -disc.vx * BOUNCE
+    return None
+
+def shot_velocity(dx, dz):
+    """Velocity for a flick dragged by (dx, dz), or None if the drag is too short"""
+    distance = math.sqrt(dx*dx + dz*dz)
+    if distance <= MIN_DRAG:
+        return None
+    power = min(distance * 0.8, MAX_POWER)
+    return (dx / distance) * power, (dz / distance) * power
+
+class Pitch:
+    """All discs on the field and the per-frame physics step.
+
+    Discs that come to rest with no moving disc touching them are put to sleep
+    and skipped by the step. A sleeping disc is woken, together with every
+    sleeping disc resting against it (its contact island), when a moving disc
+    hits it or when it is given a velocity.
+    """
+    def __init__(self, player1_start=PLAYER1_START, player2_start=PLAYER2_START):
+        self.player1_start = list(player1_start)
+        self.player2_start = list(player2_start)
+
+        self.ball = Disc3D(0, 0, BALL_RADIUS, BALL_COLOR, is_ball=True)
+        self.player1_discs = [Disc3D(x, z, DISC_RADIUS, PLAYER1_COLOR) for x, z in self.player1_start]
+        self.player2_discs = [Disc3D(x, z, DISC_RADIUS, PLAYER2_COLOR) for x, z in self.player2_start]
+        self.all_discs = self.player1_discs + self.player2_discs + [self.ball]
+        for i, disc in enumerate(self.all_discs):
+            disc.index = i
+
+        self.sleeping = True
+        self.ccd = True
+        self.ccd_events = 0
+        self.max_speed = 0.0
+        self.max_radius = max(disc.radius for disc in self.all_discs)
+
+    def clone(self):
+        """Independent copy of the current board, for look-ahead simulation"""
+        copy = Pitch(self.player1_start, self.player2_start)
+        copy.sleeping = self.sleeping
+        copy.ccd = self.ccd
+        for src, dst in zip(self.all_discs, copy.all_discs):
+            dst.x, dst.z = src.x, src.z
+            dst.vx, dst.vz = src.vx, src.vz
+            dst.asleep = src.asleep
+        return copy
+
+    def reset_positions(self):
+        self.ball.x, self.ball.z = 0, 0
+        self.ball.vx, self.ball.vz = 0, 0
+
+        for i, disc in enumerate(self.player1_discs):
+            disc.x, disc.z = self.player1_start[i]
+            disc.vx, disc.vz = 0, 0
+
+        for i, disc in enumerate(self.player2_discs):
+            disc.x, disc.z = self.player2_start[i]
+            disc.vx, disc.vz = 0, 0
+
+        for disc in self.all_discs:
+            disc.asleep = False
+
+    def all_stopped(self):
+        return all(not disc.is_moving() for disc in self.all_discs)
+
+    def settle(self, max_steps=60):
+        """Step a board at rest until every disc is asleep.
+
+        Afterwards further steps are no-ops, so two copies of the board stay
+        identical however many idle frames each one runs between turns.
+        """
+        if not self.sleeping:
+            return
+        for _ in range(max_steps):
+            if all(disc.asleep for disc in self.all_discs):
+                return
+            self.step()
+
+    def state_bytes(self):
+        return struct.pack("<%dd" % (2 * len(self.all_discs)),
+                           *[v for disc in self.all_discs for v in (disc.x, disc.z)])
+
+    def wake(self, disc):
+        """Wake a disc and every sleeping disc resting against it"""
+        stack = [disc]
+        disc.asleep = False
+        while stack:
+            current = stack.pop()
+            for other in self.all_discs:
+                if other.asleep and check_collision(current, other):
+                    other.asleep = False
+                    stack.append(other)
+
+    def step(self):
+        """Advance one frame. Returns "player1_scores"/"player2_scores" or None."""
+        goal_scored = None
+        discs = self.all_discs
+        awake = 0
+        fast = []
+        max_speed = 0.0
+
+        for disc in discs:
+            disc.time = 0.0
+            if disc.asleep:
+                if not (disc.vx or disc.vz):
+                    continue
+                self.wake(disc)
+            awake += 1
+            disc.apply_friction()
+            # Cheap upper bound on the speed, used by the sweep broadphase
+            speed = abs(disc.vx) + abs(disc.vz)
+            if speed > max_speed:
+                max_speed = speed
+            if self.ccd and disc.vx * disc.vx + disc.vz * disc.vz > disc.radius * disc.radius:
+                fast.append(disc)
+        self.max_speed = max_speed
+
+        if not awake:
+            return None
+
+        # Only discs that could tunnel this frame (and whatever they hit) are swept
+        resolved = set()
+        if fast:
+            goal_scored = self.sweep(fast, resolved)
+            if goal_scored:
+                return goal_scored
+
+        for disc in discs:
+            if disc.asleep:
+                continue
+            disc.advance(1.0)
+            result = disc.collide_walls()
+            if result:
+                goal_scored = result
+
+        count = len(discs)
+        for i in range(count):
+            disc1 = discs[i]
+            for j in range(i + 1, count):
+                disc2 = discs[j]
+                if disc1.asleep and disc2.asleep:
+                    continue
+                if resolved and (i, j) in resolved:
+                    continue
+                if check_collision(disc1, disc2):
+                    if disc1.asleep:
+                        self.wake(disc1)
+                    elif disc2.asleep:
+                        self.wake(disc2)
+                    resolve_collision(disc1, disc2)
+
+        if self.sleeping:
+            for disc in discs:
+                if disc.asleep or disc.is_moving():
+                    continue
+                # A disc this slow will not move on its next update anyway.
+                # Keep it awake while it was pushed past a wall, still overlaps
+                # another disc or rests against a mover, so the next update and
+                # discrete pass can finish the job.
+                if not disc.in_bounds():
+                    continue
+                if any(check_overlap(disc, other) or (other.is_moving() and check_collision(disc, other))
+                       for other in discs if other is not disc):
+                    continue
+                disc.vx = disc.vz = 0
+                disc.asleep = True
+
+        return goal_scored
+
+    def next_impact(self, disc):
+        """Earliest (time, other, axis) event for a swept disc, or None"""
+        best = None
+        t, axis = wall_time_of_impact(disc)
+        if t is not None:
+            best = (t, None, axis)
+
+        # Broadphase: nothing outside this box can be reached before the frame ends
+        x, z = disc.x, disc.z
+        reach = ((abs(disc.vx) + abs(disc.vz)) * (1.0 - disc.time)
+                 + self.max_speed + disc.radius + self.max_radius)
+        for other in self.all_discs:
+            if other is disc or abs(other.x - x) > reach or abs(other.z - z) > reach:
+                continue
+            t = disc_time_of_impact(disc, other)
+            if t is not None and (best is None or t < best[0]):
+                best = (t, other, None)
+        return best
+
+    def sweep(self, fast, resolved):
+        """Process impacts of fast discs in time order within the frame.
+
+        Each event moves only the discs involved up to the time of impact, and
+        only the predictions those discs can affect are recomputed. Pairs
+        resolved here are added to `resolved` so the discrete pass does not
+        bounce them a second time.
+        """
+        upcoming = {disc: self.next_impact(disc) for disc in fast}
+
+        for _ in range(MAX_CCD_EVENTS):
+            disc = None
+            for candidate, event in upcoming.items():
+                if event is not None and (disc is None or event[0] < upcoming[disc][0]):
+                    disc = candidate
+            if disc is None:
+                break
+            self.ccd_events += 1
+
+            time, other, axis = upcoming[disc]
+            disc.advance(time)
+            if other is None:
+                result = bounce_wall(disc, axis)
+                if result:
+                    return result
+                involved = (disc,)
+            else:
+                if other.asleep:
+                    self.wake(other)
+                other.advance(time)
+                resolve_collision(disc, other)
+                resolved.add((min(disc.index, other.index), max(disc.index, other.index)))
+                involved = (disc, other)
+
+            for changed in involved:
+                upcoming[changed] = self.next_impact(changed)
+            for candidate, event in upcoming.items():
+                if candidate in involved:
+                    continue
+                if event is not None and event[1] in involved:
+                    upcoming[candidate] = self.next_impact(candidate)
+                    continue
+                for changed in involved:
+                    t = disc_time_of_impact(candidate, changed)
+                    if t is not None and (event is None or t < event[0]):
+                        event = (t, changed, None)
+                upcoming[candidate] = event
+
+        return None
+
+class Match:
+    """Turn rules on top of a Pitch: whose turn it is, goals and scores.
+
+    A player scoring keeps the turn; otherwise the turn passes once every
+    disc has stopped.
+    """
+    def __init__(self, pitch=None):
+        self.pitch = pitch if pitch is not None else Pitch()
+        self.score_p1 = 0
+        self.score_p2 = 0
+        self.current_player = 1
+        self.turn_taken = False
+        self.turn = 0
+        self.frames = 0
+
+    def discs_for(self, player):
+        return self.pitch.player1_discs if player == 1 else self.pitch.player2_discs
+
+    def shoot(self, disc_index, vx, vz):
+        """Flick one of the current player's discs"""
+        disc = self.discs_for(self.current_player)[disc_index]
+        disc.vx, disc.vz = vx, vz
+        self.turn_taken = True
+
+    def update(self):
+        """One frame of physics plus the turn rules. Returns the goal result."""
+        goal_scored = self.pitch.step()
+        self.frames += 1
+
+        if goal_scored:
+            if goal_scored == "player1_scores":
+                self.score_p1 += 1
+            elif goal_scored == "player2_scores":
+                self.score_p2 += 1
+            self.pitch.reset_positions()
+            self.turn_taken = False
+            self.finish_turn()
+        elif self.turn_taken and self.pitch.all_stopped():
+            self.current_player = 2 if self.current_player == 1 else 1
+            self.turn_taken = False
+            self.finish_turn()
+
+        return goal_scored
+
+    def finish_turn(self):
+        self.pitch.settle()
+        self.turn += 1
+
+    def play_shot(self, disc_index, vx, vz, max_steps=3000):
+        """Flick and simulate headless until the turn is over"""
+        self.shoot(disc_index, vx, vz)
+        goal_scored = None
+        for _ in range(max_steps):
+            goal_scored = self.update()
+            if not self.turn_taken:
+                break
+        return goal_scored
+
+    def state_hash(self):
+        """Cheap 32-bit digest of the board and score, for desync detection"""
+        header = struct.pack("<HHBI", self.score_p1, self.score_p2, self.current_player, self.turn)
+        return zlib.crc32(header + self.pitch.state_bytes())
+
+    def snapshot(self):
+        """Immutable copy of everything a renderer needs, see load_snapshot()"""
+        motion = tuple(v for disc in self.pitch.all_discs for v in (disc.x, disc.z, disc.vx, disc.vz))
+        return (self.score_p1, self.score_p2, self.current_player, self.turn_taken, self.turn, motion)
+
+    def load_snapshot(self, snapshot):
+        """Make this match (usually a render-side copy) show the given snapshot"""
+        self.score_p1, self.score_p2, self.current_player, self.turn_taken, self.turn, motion = snapshot
+        for i, disc in enumerate(self.pitch.all_discs):
+            disc.x, disc.z, disc.vx, disc.vz = motion[4 * i:4 * i + 4]
+
+def make_formation_pitch():
+    """22 discs (11-a-side) plus the ball"""
+    player1 = list(FORMATION_11)
+    player2 = [(-x, z) for x, z in FORMATION_11]
+    return Pitch(player1, player2)
+
+BENCHMARK_CONFIGS = [
+    ("baseline", False, False),
+    ("sleeping", True, False),
+    ("sleeping + ccd", True, True),
+]
+
+def benchmark_step(frames=None, repeats=5):
+    """Average step cost on the 11-a-side formation after one hard shot"""
+    results = {}
+    for label, sleeping, ccd in BENCHMARK_CONFIGS:
+        best = None
+        for _ in range(repeats):
+            pitch = make_formation_pitch()
+            pitch.sleeping = sleeping
+            pitch.ccd = ccd
+            # Striker shoots at the ball from the kickoff spot
+            striker = pitch.player1_discs[9]
+            striker.vx, striker.vz = shot_velocity(-10.0, 1.5)
+
+            steps = 0
+            start = time.perf_counter()
+            while True:
+                pitch.step()
+                steps += 1
+                if (frames is not None and steps >= frames) or (frames is None and pitch.all_stopped()):
+                    break
+            elapsed = time.perf_counter() - start
+            per_step = elapsed / steps
+            if best is None or per_step < best[0]:
+                best = (per_step, steps, pitch.ccd_events)
+        results[label] = best
+
+    for label, _, _ in BENCHMARK_CONFIGS:
+        per_step, steps, events = results[label]
+        print(f"{label:>15}: {per_step * 1e6:8.1f} us/step over {steps} steps, {events} ccd events")
+    return results
+
+if __name__ == "__main__":
+    benchmark_step()
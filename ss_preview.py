@@ -0,0 +1,123 @@
+import math
+from collections import OrderedDict
+
+class TrajectoryPreview:
+    """Predicted path of a flick while the player is aiming.
+
+    The flick is simulated on a copy of the board with the normal Pitch.step,
+    so friction, bounces and the first contacts match what will really happen.
+    Aims are quantized to (angle, power) cells and finished paths are memoized
+    per cell, so nothing is recomputed until the aim moves past a cell. A path
+    is built at most `steps_per_frame` physics steps per call, which spreads
+    long previews over several frames. A path being built is finished even if
+    the aim moves on, then the latest aim is started, so a moving mouse still
+    gets complete paths a few frames behind it instead of none at all.
+    """
+    def __init__(self, angle_step=1.0, power_step=0.05, max_steps=150,
+                 max_contacts=2, steps_per_frame=30, cache_size=128):
+        self.angle_step = math.radians(angle_step)
+        self.power_step = power_step
+        self.max_steps = max_steps
+        self.max_contacts = max_contacts
+        self.steps_per_frame = steps_per_frame
+        self.cache_size = cache_size
+
+        self.pitch = None
+        self.disc_index = None
+        self.cache = OrderedDict()
+        self.job = None
+        self.shown = None
+        self.simulated_steps = 0
+
+    def begin(self, pitch, disc):
+        """Start aiming with `disc`; previews are only valid for this board"""
+        self.pitch = pitch
+        self.disc_index = pitch.all_discs.index(disc)
+        self.cache.clear()
+        self.job = None
+        self.shown = None
+
+    def end(self):
+        self.pitch = None
+        self.cache.clear()
+        self.job = None
+        self.shown = None
+
+    @property
+    def pending(self):
+        """True while a preview is still being built over several frames"""
+        return self.job is not None
+
+    def quantize(self, vx, vz):
+        angle = round(math.atan2(vz, vx) / self.angle_step)
+        power = round(math.sqrt(vx*vx + vz*vz) / self.power_step)
+        return angle, power
+
+    def update(self, vx, vz):
+        """Paths for a flick of (vx, vz): {disc index: [(x, z), ...]}, maybe partial"""
+        key = self.quantize(vx, vz)
+        paths = self.cache.get(key)
+        if paths is not None:
+            self.cache.move_to_end(key)
+            self.job = None
+            self.shown = paths
+            return paths
+
+        if self.job is None:
+            self.job = PreviewJob(self, key)
+
+        job = self.job
+        if job.run(self.steps_per_frame):
+            self.cache[job.key] = job.paths
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            self.shown = job.paths
+            self.job = PreviewJob(self, key) if job.key != key else None
+            return job.paths
+        # Until the latest aim has a path, show the last finished one
+        if job.key != key and self.shown is not None:
+            return self.shown
+        return job.paths
+
+class PreviewJob:
+    """One flick being simulated incrementally"""
+    def __init__(self, preview, key):
+        self.preview = preview
+        self.key = key
+        self.pitch = preview.pitch.clone()
+        self.steps = 0
+        self.contacts = 0
+
+        angle = key[0] * preview.angle_step
+        power = key[1] * preview.power_step
+        disc = self.pitch.all_discs[preview.disc_index]
+        disc.vx = math.cos(angle) * power
+        disc.vz = math.sin(angle) * power
+        self.disc = disc
+
+        self.paths = {preview.disc_index: [(disc.x, disc.z)]}
+
+    def run(self, budget):
+        """Advance up to `budget` steps. Returns True when the path is complete."""
+        preview = self.preview
+        discs = self.pitch.all_discs
+        for _ in range(budget):
+            was_moving = [disc.is_moving() for disc in discs]
+            goal = self.pitch.step()
+            self.steps += 1
+            preview.simulated_steps += 1
+
+            for i, disc in enumerate(discs):
+                if i in self.paths:
+                    self.paths[i].append((disc.x, disc.z))
+                elif disc.is_moving() and not was_moving[i]:
+                    # First contact: follow the struck disc as well
+                    self.contacts += 1
+                    self.paths[i] = [(disc.x, disc.z)]
+
+            if (goal or self.steps >= preview.max_steps or self.contacts > preview.max_contacts
+                    or not self.disc.is_moving() and len(self.paths) == 1):
+                return True
+            if self.pitch.all_stopped():
+                return True
+        return False
@@ -0,0 +1,200 @@
+import argparse
+import importlib
+import math
+import multiprocessing
+import os
+import random
+import struct
+import time
+
+from ss_physics import BALL_RADIUS, DISC_RADIUS, FIELD_LENGTH, MAX_POWER, Match
+
+# A shot policy is a function (match, rng) -> (disc_index, vx, vz) that plays
+# for match.current_player. Built-ins are listed here; any other policy can be
+# given on the command line as "module:function".
+def random_policy(match, rng):
+    """Random disc, random direction, random power"""
+    discs = match.discs_for(match.current_player)
+    angle = rng.uniform(0, 2 * math.pi)
+    power = rng.uniform(0.5, MAX_POWER)
+    return rng.randrange(len(discs)), math.cos(angle) * power, math.sin(angle) * power
+
+def chaser_policy(match, rng):
+    """Closest disc hits the ball head on at full power"""
+    ball = match.pitch.ball
+    discs = match.discs_for(match.current_player)
+    index = min(range(len(discs)),
+                key=lambda i: (discs[i].x - ball.x) ** 2 + (discs[i].z - ball.z) ** 2)
+    return (index,) + aim(discs[index], ball.x, ball.z, MAX_POWER, rng)
+
+def striker_policy(match, rng):
+    """Disc best lined up behind the ball shoots it towards the opponent goal"""
+    ball = match.pitch.ball
+    goal_x = FIELD_LENGTH if match.current_player == 1 else -FIELD_LENGTH
+    dx, dz = goal_x - ball.x, -ball.z
+    length = math.sqrt(dx*dx + dz*dz) or 1.0
+    # Contact point: where the disc centre must be to push the ball at the goal
+    contact = DISC_RADIUS + BALL_RADIUS
+    target_x = ball.x - dx / length * contact
+    target_z = ball.z - dz / length * contact
+
+    discs = match.discs_for(match.current_player)
+    def cost(i):
+        disc = discs[i]
+        to_x, to_z = target_x - disc.x, target_z - disc.z
+        distance = math.sqrt(to_x*to_x + to_z*to_z) or 1.0
+        # Prefer discs already moving towards the goal through the ball
+        alignment = (to_x * dx + to_z * dz) / (distance * length)
+        return distance * (2.0 - alignment)
+    index = min(range(len(discs)), key=cost)
+    return (index,) + aim(discs[index], target_x, target_z, MAX_POWER, rng)
+
+def aim(disc, x, z, power, rng, spread=0.05):
+    angle = math.atan2(z - disc.z, x - disc.x) + rng.gauss(0, spread)
+    return math.cos(angle) * power, math.sin(angle) * power
+
+POLICIES = {
+    "random": random_policy,
+    "chaser": chaser_policy,
+    "striker": striker_policy,
+}
+
+def load_policy(name):
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, function = name.partition(":")
+    if not function:
+        raise ValueError(f"unknown policy {name!r}, use one of {sorted(POLICIES)} or module:function")
+    return getattr(importlib.import_module(module), function)
+
+def play_match(policy1, policy2, seed, goals_to_win=3, max_turns=80):
+    """One headless match. Returns (score_p1, score_p2, turns, frames)."""
+    rng = random.Random(seed)
+    match = Match()
+    policies = {1: policy1, 2: policy2}
+    while match.turn < max_turns and max(match.score_p1, match.score_p2) < goals_to_win:
+        disc_index, vx, vz = policies[match.current_player](match, rng)
+        match.play_shot(disc_index, vx, vz)
+    return match.score_p1, match.score_p2, match.turn, match.frames
+
+# Compact results file: a header with the policy names, then one fixed-size
+# record per match. 16 bytes per match keeps million-match runs small.
+RESULTS_MAGIC = b"SSTR"
+RESULT = struct.Struct("<HHIBBHI")  # policy 1, policy 2, seed, score 1, score 2, turns, frames
+
+def write_results(path, names, results):
+    with open(path, "wb") as f:
+        f.write(RESULTS_MAGIC + struct.pack("<HI", len(names), len(results)))
+        for name in names:
+            encoded = name.encode("utf-8")
+            f.write(struct.pack("<B", len(encoded)) + encoded)
+        for result in results:
+            f.write(RESULT.pack(*result))
+
+def read_results(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != RESULTS_MAGIC:
+        raise ValueError(f"{path} is not a tournament results file")
+    name_count, result_count = struct.unpack_from("<HI", data, 4)
+    offset = 10
+    names = []
+    for _ in range(name_count):
+        length = data[offset]
+        names.append(data[offset + 1:offset + 1 + length].decode("utf-8"))
+        offset += 1 + length
+    results = [RESULT.unpack_from(data, offset + i * RESULT.size) for i in range(result_count)]
+    return names, results
+
+def elo_ratings(names, results, k=16, start=1500.0):
+    """Sequential Elo over the results in schedule order"""
+    ratings = [start] * len(names)
+    for p1, p2, _, score1, score2, _, _ in results:
+        expected = 1.0 / (1.0 + 10 ** ((ratings[p2] - ratings[p1]) / 400))
+        actual = 1.0 if score1 > score2 else 0.0 if score1 < score2 else 0.5
+        ratings[p1] += k * (actual - expected)
+        ratings[p2] -= k * (actual - expected)
+    return ratings
+
+def schedule(policy_count, rounds, seed):
+    """Round robin with both colours; each match gets its own seed"""
+    matches = []
+    for r in range(rounds):
+        for p1 in range(policy_count):
+            for p2 in range(policy_count):
+                if p1 != p2:
+                    matches.append((p1, p2, (seed * 1000003 + len(matches)) & 0xFFFFFFFF))
+    return matches
+
+# Each worker resolves the policy names once; tasks then only carry indices
+# and seeds, and results come back as small tuples, so nothing is shared
+# between processes and throughput scales with the number of cores.
+_worker_policies = None
+
+def _init_worker(names):
+    global _worker_policies
+    _worker_policies = [load_policy(name) for name in names]
+
+def _run(task):
+    p1, p2, seed = task
+    score1, score2, turns, frames = play_match(_worker_policies[p1], _worker_policies[p2], seed)
+    return p1, p2, seed, score1, score2, turns, frames
+
+def run_tournament(names, rounds, workers, seed=1):
+    tasks = schedule(len(names), rounds, seed)
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(names)
+        results = [_run(task) for task in tasks]
+    else:
+        chunksize = max(1, len(tasks) // (workers * 8))
+        with multiprocessing.Pool(workers, _init_worker, (names,)) as pool:
+            results = list(pool.imap(_run, tasks, chunksize))
+    return results, time.perf_counter() - start
+
+def report(names, results, elapsed):
+    ratings = elo_ratings(names, results)
+    wins = [0] * len(names)
+    played = [0] * len(names)
+    for p1, p2, _, score1, score2, _, _ in results:
+        played[p1] += 1
+        played[p2] += 1
+        if score1 > score2:
+            wins[p1] += 1
+        elif score2 > score1:
+            wins[p2] += 1
+    frames = sum(result[6] for result in results)
+    print(f"{len(results)} matches in {elapsed:.2f}s: {len(results) / elapsed:.1f} matches/s, "
+          f"{frames / elapsed:.0f} frames/s")
+    for i in sorted(range(len(names)), key=lambda i: -ratings[i]):
+        print(f"{names[i]:>20}  elo {ratings[i]:7.1f}  won {wins[i]}/{played[i]}")
+
+def scaling(names, rounds, max_workers):
+    """Matches/s as the pool grows; should be close to linear in the core count"""
+    workers = 1
+    base = None
+    while workers <= max_workers:
+        results, elapsed = run_tournament(names, rounds * workers, workers)
+        rate = len(results) / elapsed
+        base = base or rate
+        print(f"{workers:3d} workers: {rate:8.1f} matches/s ({rate / base:5.1f}x)")
+        workers *= 2
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless Soccer Stars AI-vs-AI tournament")
+    parser.add_argument("policies", nargs="*", default=sorted(POLICIES),
+                        help="built-in policy names or module:function")
+    parser.add_argument("--rounds", type=int, default=10, help="round robins to play")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="tournament.bin", help="results file")
+    parser.add_argument("--scaling", action="store_true",
+                        help="measure matches/s at 1, 2, 4... workers instead")
+    args = parser.parse_args()
+
+    if args.scaling:
+        scaling(args.policies, args.rounds, args.workers)
+    else:
+        results, elapsed = run_tournament(args.policies, args.rounds, args.workers, args.seed)
+        write_results(args.out, args.policies, results)
+        report(args.policies, results, elapsed)
@@ -0,0 +1,5 @@
+def pytest_addoption(parser):
+    parser.addoption("--bench-baseline", metavar="JSON",
+                     help="bench.py baseline the kernel benchmarks must not regress against")
+    parser.addoption("--bench-threshold", type=float, default=0.25,
+                     help="fractional slowdown against --bench-baseline that fails a kernel")
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from bench import KERNELS, SWEEP, calibrated, compare, reference, run_kernel
+
+# bench.py's kernels as pytest-benchmark tests, so CI collects them with the
+# rest of the suite. Each round loops a kernel for about MIN_TIME, like
+# bench.py, and pytest-benchmark reports and saves the timings as usual.
+#
+# Raw times drift by tens of percent between runs on shared machines, so the
+# regression check uses bench.py's figures relative to its reference loop,
+# against the committed baseline:
+#
+#   python -m pytest tests/test_bench.py --bench-baseline=tests/benchmarks/baseline.json
+#
+# --bench-threshold sets the allowed slowdown (default 0.25); kernels whose
+# recorded spread between baseline runs is larger are allowed that instead.
+# Record a new baseline with
+# `python bench.py --runs 5 --save tests/benchmarks/baseline.json`.
+
+ROUNDS = 5
+MIN_TIME = 0.01
+CHECK_MIN_TIME = 0.05   # As bench.py, which records the baseline
+
+@pytest.fixture(scope="session")
+def baseline(request):
+    path = request.config.getoption("--bench-baseline")
+    if path is None:
+        return None
+    with open(path) as f:
+        return json.load(f)["results"]
+
+def run(benchmark, function, count=1):
+    _, number = calibrated(function, MIN_TIME)
+    benchmark.extra_info["count"] = count
+    benchmark.pedantic(function, rounds=ROUNDS, iterations=number, warmup_rounds=1)
+
+def test_reference(benchmark):
+    benchmark.group = "reference"
+    run(benchmark, reference)
+
+@pytest.mark.parametrize("count", SWEEP)
+@pytest.mark.parametrize("kernel", KERNELS)
+def test_kernel(benchmark, baseline, request, kernel, count):
+    benchmark.group = kernel
+    run(benchmark, KERNELS[kernel](count), count)
+    if baseline is None:
+        return
+    key = f"{kernel}[{count}]"
+    if key not in baseline:
+        pytest.skip(f"{key} is not in the baseline")
+    results = {key: run_kernel(KERNELS[kernel], count, ROUNDS, CHECK_MIN_TIME)}
+    threshold = request.config.getoption("--bench-threshold")
+    benchmark.extra_info["relative"] = results[key]["relative"]
+    assert not compare(results, baseline, threshold, repeats=ROUNDS, min_time=CHECK_MIN_TIME), \
+        f"{key} is slower than the baseline by more than {threshold:.0%} and its recorded spread"
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from camera import Camera
+
+WIDTH, HEIGHT = 800, 600
+
+def perspective_camera(eye=(0, 10, 10), target=(0, 0, 0)):
+    camera = Camera((0, 0, WIDTH, HEIGHT))
+    camera.set_perspective(60, WIDTH / HEIGHT, 0.1, 100)
+    camera.look_at(eye, target)
+    return camera
+
+def ortho_camera():
+    camera = Camera((0, 0, WIDTH, HEIGHT))
+    camera.set_ortho(-10, 10, -10, 10, 1, 100)
+    camera.look_at((0, 0, 10), (0, 0, 0))
+    return camera
+
+@pytest.mark.parametrize("point", [(0, 0, 0), (3, 0, -2), (-4, 2.5, 1), (1, -1, 5)])
+def test_unproject_inverts_project(point):
+    camera = perspective_camera()
+    assert np.allclose(camera.unproject(*camera.project(point)), point, atol=1e-6)
+
+def test_project_with_an_offset_viewport():
+    camera = perspective_camera()
+    camera.viewport = (100, 50, WIDTH, HEIGHT)
+    x, y, depth = camera.project((0, 0, 0))
+    assert (x, y) == pytest.approx((100 + WIDTH / 2, 50 + HEIGHT / 2))
+    assert 0 < depth < 1
+    assert np.allclose(camera.unproject(x, y, depth), (0, 0, 0), atol=1e-6)
+
+def test_pick_plane_hits_the_point_under_the_mouse():
+    camera = perspective_camera()
+    assert camera.pick_plane(WIDTH / 2, HEIGHT / 2, HEIGHT) == pytest.approx((0, 0), abs=1e-6)
+    x, y, _ = camera.project((3, 0, -2))
+    assert camera.pick_plane(x, HEIGHT - y, HEIGHT) == pytest.approx((3, -2), abs=1e-6)
+    x, y, _ = camera.project((1, 2, 1))
+    assert camera.pick_plane(x, HEIGHT - y, HEIGHT, plane_y=2) == pytest.approx((1, 1), abs=1e-6)
+
+def test_pick_plane_misses_parallel_and_behind():
+    camera = perspective_camera(eye=(0, 5, 0), target=(0, 5, -10))
+    # Straight ahead runs parallel to the ground; above the horizon never reaches it
+    assert camera.pick_plane(WIDTH / 2, HEIGHT / 2, HEIGHT) is None
+    assert camera.pick_plane(WIDTH / 2, 10, HEIGHT) is None
+    assert camera.pick_plane(WIDTH / 2, HEIGHT - 10, HEIGHT) is not None
+
+def test_sphere_visible_inside_and_outside():
+    camera = perspective_camera()
+    assert camera.sphere_visible((0, 0, 0), 0.5)
+    assert not camera.sphere_visible((0, 20, 20), 0.5)     # Behind the camera
+    assert not camera.sphere_visible((0, -100, -100), 1)   # Beyond the far plane
+    assert not camera.sphere_visible((50, 0, 0), 1)
+
+@pytest.mark.parametrize("center", [(-11, 0, 0), (11, 0, 0), (0, -11, 0), (0, 11, 0),
+                                    (0, 0, 10), (0, 0, -91)])
+def test_sphere_visible_at_each_plane(center):
+    # Every center sits one unit outside a plane of the ortho frustum
+    camera = ortho_camera()
+    assert not camera.sphere_visible(center, 0.999)
+    assert camera.sphere_visible(center, 1.001)
+
+def test_spheres_visible_matches_sphere_visible():
+    camera = perspective_camera()
+    rng = np.random.default_rng(1)
+    centers = rng.uniform(-30, 30, (200, 3))
+    radii = rng.uniform(0.1, 3, 200)
+    expected = [camera.sphere_visible(c, r) for c, r in zip(centers, radii)]
+    assert list(camera.spheres_visible(centers, radii)) == expected
+    assert any(expected) and not all(expected)
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from capture import FrameWriter
+
+def frame(width, height, value=0):
+    return bytes([value]) * (width * height * 3)
+
+def test_y4m_frames_are_written(tmp_path):
+    path = str(tmp_path / "out.y4m")
+    writer = FrameWriter(path, 4, 2)
+    writer.start()
+    for value in (0, 255):
+        while not writer.put(frame(4, 2, value)):
+            pass
+    writer.close()
+    assert writer.written == 2
+    header = len("YUV4MPEG2 W4 H2 F60:1 Ip A1:1 C444\n")
+    assert os.path.getsize(path) == header + 2 * (len("FRAME\n") + 4 * 2 * 3)
+
+def test_bad_path_fails_before_starting(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        FrameWriter(str(tmp_path / "missing" / "out.y4m"), 4, 4, queue_size=2)
+
+def test_failed_writer_raises_instead_of_hanging(tmp_path):
+    writer = FrameWriter(str(tmp_path / "out.rgb"), 4, 4, queue_size=2)
+    writer.start()
+    # A frame of the wrong size kills the writer thread
+    writer.put(b"short")
+    writer.join(5)
+    assert not writer.is_alive()
+    with pytest.raises(ValueError):
+        writer.put(frame(4, 4))
+    # The queue can be full with nobody emptying it; close() must still return
+    writer.frames.put_nowait(frame(4, 4))
+    writer.frames.put_nowait(frame(4, 4))
+    with pytest.raises(ValueError):
+        writer.close()
@@ -0,0 +1,21 @@
+from input_queue import InputEvent, InputQueue
+from pvp_world import PlayerInput
+
+def test_take_returns_every_event_since_the_last_tick():
+    queue = InputQueue()
+    idle = [PlayerInput(), PlayerInput()]
+    queue.set_held(idle, 1.0)
+    queue.post(InputEvent(1.5, 1, "shoot"))
+    queue.post(InputEvent(1.5, 2, "shoot"))
+    held, events = queue.take()
+    assert held == idle
+    assert [(e.player, e.kind) for e in events] == [(1, "shoot"), (2, "shoot")]
+    assert queue.take() == (idle, [])
+
+def test_start_of_movement_is_stamped_with_the_pump():
+    queue = InputQueue()
+    queue.set_held([PlayerInput(), None], 1.0)
+    queue.set_held([PlayerInput(forward=1), None], 2.0)
+    queue.set_held([PlayerInput(forward=1), None], 3.0)
+    _, events = queue.take()
+    assert events == [InputEvent(2.0, 1, "move")]
@@ -0,0 +1,38 @@
+from pvp_bots import UNREACHED, BotPlayers, FlowField, NavGrid
+from pvp_world import PvPWorld
+
+def test_live_fields_never_exceed_max_fields():
+    world = PvPWorld(32)
+    bots = BotPlayers(world, max_fields=3)
+    for _ in range(200):
+        world.step(bots(world))
+        assert len(bots.fields) <= 3
+    assert bots.peak_fields == 3
+
+def test_dead_targets_and_dead_bots_are_forgotten():
+    world = PvPWorld(4)
+    bots = BotPlayers(world, numbers=[1, 2])
+    world.step(bots(world))
+    target = bots.targets[1][0]
+    assert target in bots.fields
+
+    world.players[target - 1].alive = False
+    world.players[1].alive = False
+    bots(world)
+    assert 2 not in bots.targets
+    assert bots.targets[1][0] != target
+    assert target not in bots.fields
+
+def test_field_is_reused_while_the_target_is_one_cell_away():
+    grid = NavGrid(PvPWorld(2))
+    home = grid.cell_at(0, -30)
+    field = FlowField(grid, home)
+    field.advance(UNREACHED)
+    beside = home + 1
+    field.request(beside)
+    assert field.search is None and field.searches == 1
+    assert field.step_from(home) is None
+    assert field.step_from(beside) is None
+
+    field.request(home + 2)
+    assert field.search is not None and field.searches == 2
@@ -0,0 +1,20 @@
+from pvp_replay import ReplayPlayer, record_random
+
+def test_empty_recording_is_a_zero_length_replay(tmp_path):
+    path = str(tmp_path / "empty.pvpr")
+    record_random(path, 0)
+    player = ReplayPlayer(path)
+    assert player.ticks == 0
+    assert player.keyframes == []
+    assert not player.step()
+    player.seek(100)
+    assert player.world.tick == 0
+
+def test_seek_reproduces_the_recording(tmp_path):
+    path = str(tmp_path / "match.pvpr")
+    states = record_random(path, 700, keyframe_interval=300)
+    player = ReplayPlayer(path)
+    assert player.ticks == 700
+    for tick in (650, 1, 300, 700):
+        player.seek(tick)
+        assert player.world.pack_state() == states[tick]
@@ -0,0 +1,40 @@
+import threading
+
+from pvp_snapshots import SnapshotRing, make_world
+from pvp_world import PvPWorld
+
+def test_restore_returns_the_pushed_state():
+    world = make_world(2, 5)
+    ring = SnapshotRing(world, capacity=8, max_bullets=2)
+    world.tick = 3
+    ring.push(world)
+    target = PvPWorld(2)
+    assert ring.try_restore(3, target)
+    assert target.pack_state() == world.pack_state()
+    assert not ring.try_restore(4, target)
+
+def test_restore_while_another_thread_pushes_and_grows():
+    ring = SnapshotRing(make_world(2, 0), capacity=16, max_bullets=1)
+    errors = []
+
+    def push():
+        try:
+            for tick in range(1, 400):
+                world = make_world(2, tick // 4)
+                world.tick = tick
+                ring.push(world)
+        except Exception as e:
+            errors.append(e)
+
+    pusher = threading.Thread(target=push)
+    pusher.start()
+    target = PvPWorld(2)
+    while pusher.is_alive():
+        newest = ring.newest
+        if newest is not None:
+            for tick in range(newest - 15, newest + 1):
+                if ring.try_restore(tick, target):
+                    assert target.tick == tick
+    pusher.join()
+    assert not errors
+    assert ring.max_bullets >= 99
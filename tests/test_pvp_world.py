@@ -0,0 +1,30 @@
+import math
+
+import pytest
+
+from pvp_world import PlayerInput, PvPWorld
+
+def open_world():
+    world = PvPWorld(1)
+    world.obstacles = []
+    world.portals = []
+    player = world.players[0]
+    player.pos[:] = [0.0, 0.0, 0.0]
+    player.rotation = 30.0
+    return world, player
+
+def test_positive_strafe_moves_right():
+    world, player = open_world()
+    world.step([PlayerInput(strafe=1.0, pad=True)])
+    right = math.radians(30.0 - 90)
+    length = math.hypot(player.pos[0], player.pos[2])
+    assert player.pos[0] / length == pytest.approx(math.sin(right))
+    assert player.pos[2] / length == pytest.approx(math.cos(right))
+
+def test_shot_leaves_from_where_the_shooter_moved_to():
+    world, player = open_world()
+    world.step([PlayerInput(forward=1.0, shoot=True, pad=True)])
+    assert player.pos[2] != 0.0
+    bullet, = world.bullets
+    assert bullet.pos[0] - bullet.dx == pytest.approx(player.pos[0])
+    assert bullet.pos[2] - bullet.dz == pytest.approx(player.pos[2])
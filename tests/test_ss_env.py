@@ -0,0 +1,21 @@
+from multiprocessing import shared_memory
+
+import pytest
+
+from ss_env import _worker
+
+@pytest.fixture
+def block():
+    block = shared_memory.SharedMemory(create=True, size=64)
+    yield block
+    block.close()
+    block.unlink()
+
+def test_worker_reports_a_failed_attach(block):
+    with pytest.raises(FileNotFoundError):
+        _worker(None, [block.name, "ss_env_missing_block"], 0, 1, 0, "striker")
+
+def test_worker_reports_a_failed_env(block):
+    names = [block.name] * 4
+    with pytest.raises(ValueError, match="unknown policy"):
+        _worker(None, names, 0, 1, 0, "no-such-policy")
@@ -0,0 +1,82 @@
+import socket
+
+import pytest
+
+from ss_net import HELLO, LockstepPeer, Shot, check_shot, valid_disc
+from ss_physics import Match
+
+@pytest.fixture
+def peers():
+    host = LockstepPeer()
+    client = LockstepPeer()
+    yield host, client
+    client.close()
+    host.close()
+
+def connect(host, client):
+    port = host.host(0, "127.0.0.1")
+    client.connect("127.0.0.1", port)
+    assert host.wait_connected(5)
+    assert client.wait_connected(5)
+    return port
+
+def test_handshake_connects_both_ends(peers):
+    host, client = peers
+    connect(host, client)
+    assert host.local_player == 1
+    assert client.local_player == 2
+    assert host.error is None and client.error is None
+
+def test_shot_arrives_as_sent(peers):
+    host, client = peers
+    connect(host, client)
+    match = Match()
+    vx, vz = host.send_shot(match.turn, 2, 3.0, -1.5, match.state_hash())
+
+    shot = client.poll_shot(timeout=5)
+    assert shot is not None
+    assert (shot.turn, shot.disc_index) == (match.turn, 2)
+    # Both ends apply the same quantized flick
+    assert (shot.vx, shot.vz) == (vx, vz)
+    assert check_shot(Match(), shot)
+
+def test_shots_flow_both_ways(peers):
+    host, client = peers
+    connect(host, client)
+    client.send_shot(1, 0, 1.0, 0.0, 7)
+    host.send_shot(2, 1, 0.0, 1.0, 8)
+    assert host.poll_shot(timeout=5).state_hash == 7
+    assert client.poll_shot(timeout=5).state_hash == 8
+
+def test_failed_handshake_leaves_host_listening(peers):
+    host, client = peers
+    port = host.host(0, "127.0.0.1")
+    with socket.create_connection(("127.0.0.1", port)) as stranger:
+        stranger.sendall(HELLO.pack(b"HTTP", 1))
+        stranger.recv(HELLO.size)
+        for _ in range(50):
+            if host.error is not None:
+                break
+            host.wait_connected(0.1)
+    assert isinstance(host.error, ConnectionError)
+    assert not host.connected.is_set()
+
+    host.error = None
+    client.connect("127.0.0.1", port)
+    assert host.wait_connected(5)
+    assert client.wait_connected(5)
+
+def test_disconnect_reaches_the_other_end(peers):
+    host, client = peers
+    connect(host, client)
+    host.disconnect(ConnectionError("bad shot"))
+    assert client.poll_shot(timeout=5) is None
+    assert client.error is not None
+
+def test_valid_disc_rejects_out_of_range_indexes():
+    match = Match()
+    count = len(match.discs_for(match.current_player))
+    assert valid_disc(match, Shot(0, 0, 0.0, 0.0, 0))
+    assert valid_disc(match, Shot(0, count - 1, 0.0, 0.0, 0))
+    assert not valid_disc(match, Shot(0, count, 0.0, 0.0, 0))
+    assert not valid_disc(match, Shot(0, 255, 0.0, 0.0, 0))
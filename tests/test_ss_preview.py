@@ -0,0 +1,30 @@
+import math
+
+from ss_physics import Pitch
+from ss_preview import TrajectoryPreview
+
+def aim(frame, power=6.0):
+    angle = math.radians(frame * 3)
+    return math.cos(angle) * power, math.sin(angle) * power
+
+def test_paths_finish_while_the_aim_keeps_moving():
+    pitch = Pitch()
+    preview = TrajectoryPreview(steps_per_frame=10)
+    preview.begin(pitch, pitch.player1_discs[0])
+    for frame in range(60):
+        paths = preview.update(*aim(frame))
+        assert preview.disc_index in paths
+    assert len(preview.cache) >= 3
+    assert preview.shown is not None
+
+def test_held_aim_gets_its_own_path():
+    pitch = Pitch()
+    preview = TrajectoryPreview(steps_per_frame=10)
+    preview.begin(pitch, pitch.player1_discs[0])
+    preview.update(*aim(0))
+    for _ in range(100):
+        paths = preview.update(*aim(5))
+        if not preview.pending:
+            break
+    assert not preview.pending
+    assert preview.cache[preview.quantize(*aim(5))] is paths
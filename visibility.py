@@ -0,0 +1,236 @@
+import argparse
+import math
+import random
+import time
+
+from pvp_world import PvPWorld
+
+# Line of sight between players through the obstacles, for bot aiming,
+# interest management and kill-cam framing.
+#
+# Obstacles are indexed in a uniform grid and a segment walks the grid cells
+# it crosses (Amanatides & Woo DDA), so it is only tested against the
+# obstacles along its way instead of all of them.
+#
+# Results are also cached per pair of cache cells. Every segment between two
+# points in cells A and B lies in the convex hull of the two cells, which is
+# the segment between their centres swept by one cell. An obstacle can only
+# cut such a segment if it touches that hull, that is if the centre segment
+# crosses the obstacle grown by half a cell on every side. The cache keeps
+# those candidates per cell pair: an empty list answers "visible" at once,
+# otherwise only the few candidates are tested exactly. The obstacles are
+# static, so entries never go stale.
+
+EYE_HEIGHT = 1.0   # Bullets fly at player height + 1; lower obstacles do not block sight
+
+def segment_hits_box(x0, z0, dx, dz, box):
+    """True if the segment (x0, z0) + t * (dx, dz), t in [0, 1], touches box (min x, max x, min z, max z)"""
+    min_x, max_x, min_z, max_z = box
+    t0, t1 = 0.0, 1.0
+    if dx:
+        a = (min_x - x0) / dx
+        b = (max_x - x0) / dx
+        if a > b:
+            a, b = b, a
+        t0 = max(t0, a)
+        t1 = min(t1, b)
+    elif not min_x <= x0 <= max_x:
+        return False
+    if dz:
+        a = (min_z - z0) / dz
+        b = (max_z - z0) / dz
+        if a > b:
+            a, b = b, a
+        t0 = max(t0, a)
+        t1 = min(t1, b)
+    elif not min_z <= z0 <= max_z:
+        return False
+    return t0 <= t1
+
+class VisibilityService:
+    """Segment occlusion queries against a world's obstacles.
+
+    visible() answers one query and visible_many() a batch of them, e.g.
+    every player pair in a tick. occluded_dda() is the uncached grid walk.
+    """
+    def __init__(self, world, cell_size=2.0, index_cell=4.0, max_entries=200000):
+        self.cell_size = cell_size
+        self.index_cell = index_cell
+        self.max_entries = max_entries
+        self.margin = cell_size / 2
+        self.boxes = []
+        self.grown = []
+        for obs in world.obstacles:
+            if obs.y + obs.height / 2 <= EYE_HEIGHT:
+                continue
+            box = (obs.x - obs.width / 2, obs.x + obs.width / 2, obs.z - obs.depth / 2, obs.z + obs.depth / 2)
+            self.boxes.append(box)
+            m = self.margin
+            self.grown.append((box[0] - m, box[1] + m, box[2] - m, box[3] + m))
+
+        # Index by the grown boxes, which cover the exact ones, so one walk
+        # serves both the cache candidates and exact queries
+        self.index = {}
+        for number, box in enumerate(self.grown):
+            for cx in range(math.floor(box[0] / index_cell), math.floor(box[1] / index_cell) + 1):
+                for cz in range(math.floor(box[2] / index_cell), math.floor(box[3] / index_cell) + 1):
+                    self.index.setdefault((cx, cz), []).append(number)
+
+        self.cache = {}
+        self.queries = 0
+        self.misses = 0
+
+    def walk(self, x0, z0, x1, z1):
+        """Index cells the segment passes through, in order"""
+        size = self.index_cell
+        cx, cz = math.floor(x0 / size), math.floor(z0 / size)
+        end_x, end_z = math.floor(x1 / size), math.floor(z1 / size)
+        dx, dz = x1 - x0, z1 - z0
+        step_x = 1 if dx > 0 else -1
+        step_z = 1 if dz > 0 else -1
+        # Segment parameter t at the next cell boundary on each axis, and per cell
+        next_x = ((cx + (dx > 0)) * size - x0) / dx if dx else math.inf
+        next_z = ((cz + (dz > 0)) * size - z0) / dz if dz else math.inf
+        delta_x = size / abs(dx) if dx else math.inf
+        delta_z = size / abs(dz) if dz else math.inf
+        yield cx, cz
+        for _ in range(abs(end_x - cx) + abs(end_z - cz)):
+            if next_x < next_z:
+                cx += step_x
+                next_x += delta_x
+            else:
+                cz += step_z
+                next_z += delta_z
+            yield cx, cz
+
+    def blockers(self, x0, z0, x1, z1, boxes, first=False):
+        """Obstacle numbers whose box in boxes the segment touches; stops at the first one if first"""
+        found = []
+        seen = set()
+        dx, dz = x1 - x0, z1 - z0
+        index = self.index
+        for cell in self.walk(x0, z0, x1, z1):
+            for number in index.get(cell, ()):
+                if number in seen:
+                    continue
+                seen.add(number)
+                if segment_hits_box(x0, z0, dx, dz, boxes[number]):
+                    found.append(number)
+                    if first:
+                        return found
+        return found
+
+    def occluded_dda(self, x0, z0, x1, z1):
+        return bool(self.blockers(x0, z0, x1, z1, self.boxes, first=True))
+
+    def occluded_naive(self, x0, z0, x1, z1):
+        """Every obstacle against the segment, for comparison"""
+        dx, dz = x1 - x0, z1 - z0
+        return any(segment_hits_box(x0, z0, dx, dz, box) for box in self.boxes)
+
+    def cell(self, x, z):
+        return math.floor(x / self.cell_size), math.floor(z / self.cell_size)
+
+    def candidates(self, a, b):
+        """Obstacles that can cut a segment between cache cells a and b"""
+        key = (a, b) if a <= b else (b, a)
+        found = self.cache.get(key)
+        if found is None:
+            self.misses += 1
+            if len(self.cache) >= self.max_entries:
+                self.cache.clear()
+            size = self.cell_size
+            found = self.cache[key] = tuple(self.blockers((a[0] + 0.5) * size, (a[1] + 0.5) * size,
+                                                          (b[0] + 0.5) * size, (b[1] + 0.5) * size, self.grown))
+        return found
+
+    def visible(self, x0, z0, x1, z1):
+        self.queries += 1
+        found = self.candidates(self.cell(x0, z0), self.cell(x1, z1))
+        if not found:
+            return True
+        dx, dz = x1 - x0, z1 - z0
+        boxes = self.boxes
+        for number in found:
+            if segment_hits_box(x0, z0, dx, dz, boxes[number]):
+                return False
+        return True
+
+    def visible_many(self, segments):
+        """[visible] for a list of (x0, z0, x1, z1).
+
+        Same answers as visible(), with the cache, boxes and cell size bound
+        once per batch instead of looked up per query.
+        """
+        size = self.cell_size
+        cache = self.cache
+        boxes = self.boxes
+        floor = math.floor
+        results = []
+        for x0, z0, x1, z1 in segments:
+            a = (floor(x0 / size), floor(z0 / size))
+            b = (floor(x1 / size), floor(z1 / size))
+            found = cache.get((a, b) if a <= b else (b, a))
+            if found is None:
+                found = self.candidates(a, b)
+            clear = True
+            if found:
+                dx, dz = x1 - x0, z1 - z0
+                for number in found:
+                    if segment_hits_box(x0, z0, dx, dz, boxes[number]):
+                        clear = False
+                        break
+            results.append(clear)
+        self.queries += len(segments)
+        return results
+
+    def can_see(self, player, other):
+        return self.visible(player.pos[0], player.pos[2], other.pos[0], other.pos[2])
+
+    def report(self):
+        hit_rate = 1 - self.misses / self.queries if self.queries else 0.0
+        return (f"visibility: {self.queries} queries, {len(self.cache)} cell pairs cached, "
+                f"{hit_rate:.1%} cache hits")
+
+def add_clutter(world, boxes, seed=1):
+    """Scatter extra crates over the map, for scaling tests"""
+    rng = random.Random(seed)
+    edge = world.map_size - 5
+    for _ in range(boxes):
+        world.add_box_obstacle(rng.uniform(-edge, edge), rng.uniform(-edge, edge), rng.uniform(1.5, 4))
+
+def benchmark(queries=20000, clutter=(0, 200), points=400, seed=1):
+    """Queries per second for every method, on the arena alone and with extra crates"""
+    for extra in clutter:
+        world = PvPWorld(2)
+        add_clutter(world, extra, seed)
+        service = VisibilityService(world)
+        rng = random.Random(seed)
+        edge = world.map_size - 1
+        # Queries between a fixed set of spots, like players that move around
+        # but keep meeting in the same places
+        spots = [(rng.uniform(-edge, edge), rng.uniform(-edge, edge)) for _ in range(points)]
+        segments = [(*rng.choice(spots), *rng.choice(spots)) for _ in range(queries)]
+
+        def timed(label, run):
+            start = time.perf_counter()
+            results = run()
+            elapsed = time.perf_counter() - start
+            print(f"  {label:24} {queries / elapsed:12,.0f} queries/s")
+            return results
+
+        print(f"{len(service.boxes)} occluding obstacles, {queries} queries between {points} spots:")
+        naive = timed("naive, every obstacle", lambda: [not service.occluded_naive(*s) for s in segments])
+        dda = timed("grid DDA", lambda: [not service.occluded_dda(*s) for s in segments])
+        cold = timed("cached, cold", lambda: [service.visible(*s) for s in segments])
+        warm = timed("cached, warm", lambda: [service.visible(*s) for s in segments])
+        batch = timed("cached, batched", lambda: service.visible_many(segments))
+        assert naive == dda == cold == warm == batch, "visibility methods disagree"
+        print(f"  {sum(naive) / queries:.0%} of segments clear; " + service.report())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Line-of-sight query benchmark")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--clutter", default="0,200", help="extra crates per run, comma separated")
+    args = parser.parse_args()
+    benchmark(args.queries, [int(n) for n in args.clutter.split(",")])